@@ -0,0 +1,305 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from google import genai
+from google.genai import types
+from rest_framework.renderers import BaseRenderer
+
+from .ai_cache import response_cache
+from .ai_context import ConversationContext
+from .models import ChatMessage
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+# Strict prompt to keep the AI on topic. Sent once per call as the system
+# instruction rather than being prepended to every user turn.
+SYSTEM_PROMPT = (
+    "You are SoulTalk AI, a compassionate mental wellness companion. "
+    "Your purpose is strictly limited to providing emotional support and mental health guidance. "
+    "STRICT RULE: You must ONLY answer questions directly related to mental health, wellness, and emotional well-being. "
+    "If the user asks about ANY unrelated topic (e.g., coding, math, general knowledge, recipes, technology, etc.), "
+    "you must politely refuse to answer. State that you are specifically designed to support their mental health "
+    "and ask if they would like to share how they are feeling or discuss a wellness topic instead. "
+    "Maintain a supportive, professional, and empathetic tone at all times."
+)
+
+
+class AIServiceBusy(Exception):
+    pass
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+    def grant(self):
+        if self.cancelled:
+            return False
+        if self.loop is None:
+            self.granted = True
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            # Event loop already closed
+            return False
+        self.granted = True
+        return True
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class ModelCallGate:
+    """
+    Process-wide limit on in-flight model calls.
+
+    Calls over the limit wait in FIFO order (sync and async callers share the
+    same queue) for up to `timeout` seconds before AIServiceBusy is raised.
+    """
+
+    def __init__(self, limit, timeout):
+        self.limit = limit
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.in_flight = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_queue_depth = 0
+
+    def _try_acquire(self):
+        # Caller holds self._lock
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _enqueue(self, waiter):
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+    def _record(self, started):
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def _give_up(self, waiter):
+        # Returns True if the slot was granted before we could withdraw.
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+            self.timeouts += 1
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._lock:
+            if self._try_acquire():
+                self._record(started)
+                return
+            waiter = _Waiter()
+            self._enqueue(waiter)
+
+        if not waiter.event.wait(self.timeout) and not self._give_up(waiter):
+            raise AIServiceBusy(f"AI service is busy, no slot freed within {self.timeout}s")
+        with self._lock:
+            self._record(started)
+
+    async def acquire_async(self):
+        started = time.monotonic()
+        with self._lock:
+            if self._try_acquire():
+                self._record(started)
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._enqueue(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+        except asyncio.TimeoutError:
+            if not self._give_up(waiter):
+                raise AIServiceBusy(f"AI service is busy, no slot freed within {self.timeout}s")
+        except BaseException:
+            # Request cancelled while queued; hand back the slot if we got one
+            if self._give_up(waiter):
+                self.release()
+            raise
+        with self._lock:
+            self._record(started)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                # Hand the slot straight to the next waiter
+                if self._waiters.popleft().grant():
+                    return
+            self.in_flight -= 1
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queue_depth': len(self._waiters),
+                'max_queue_depth': self.max_queue_depth,
+                'acquired': self.acquired,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+            }
+
+
+ai_gate = ModelCallGate(
+    limit=settings.AI_MAX_CONCURRENT_CALLS,
+    timeout=settings.AI_QUEUE_TIMEOUT,
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Shared Gemini client, created on first use.
+
+    Reusing one client keeps its HTTP connection pools (and TLS sessions)
+    alive across requests; `client.aio` shares the same configuration.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                limits = httpx.Limits(
+                    max_connections=settings.AI_MAX_CONCURRENT_CALLS,
+                    max_keepalive_connections=settings.AI_MAX_CONCURRENT_CALLS,
+                    keepalive_expiry=60,
+                )
+                _client = genai.Client(
+                    api_key=settings.GEMINI_API_KEY,
+                    http_options=types.HttpOptions(
+                        client_args={'limits': limits},
+                        async_client_args={'limits': limits},
+                    ),
+                )
+    return _client
+
+
+def build_request(session):
+    """
+    Keyword arguments for generate_content: the session's token-budgeted
+    context window (ending with the user's latest message) plus the system
+    instruction. Also returns the response cache key, which is None unless
+    this is a cacheable first turn.
+    """
+    context = ConversationContext.load(session)
+    system_instruction = context.system_instruction(SYSTEM_PROMPT)
+    request_kwargs = {
+        'contents': context.contents(),
+        'config': types.GenerateContentConfig(system_instruction=system_instruction),
+    }
+    return request_kwargs, response_cache.key_for(context, MODEL_NAME, system_instruction)
+
+
+class EventStreamRenderer(BaseRenderer):
+    # Lets DRF content negotiation accept `Accept: text/event-stream`;
+    # the stream itself is written by StreamingHttpResponse.
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event('error', data).encode(self.charset)
+
+
+def can_stream(request):
+    """
+    Server-sent events only reach the client as they are written under an
+    ASGI server. WSGI servers (runserver, gunicorn's sync workers, the
+    Vercel build) buffer a streaming body until it ends, so the reply would
+    arrive in one piece anyway while holding the worker for the whole
+    generation.
+    """
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_reply(session, request_kwargs, cache_key=None):
+    """
+    Yield the Gemini reply as server-sent events and store the assistant
+    message once the stream has finished.
+    """
+    yield sse_event('session', {'session_id': session.id, 'title': session.title})
+
+    chunks = []
+    cached_reply = response_cache.get(cache_key)
+    try:
+        if cached_reply:
+            chunks.append(cached_reply)
+            yield sse_event('token', {'text': cached_reply})
+        else:
+            async with ai_gate.aslot():
+                stream = await get_client().aio.models.generate_content_stream(
+                    model=MODEL_NAME, **request_kwargs
+                )
+                async for chunk in stream:
+                    text = chunk.text
+                    if text:
+                        chunks.append(text)
+                        yield sse_event('token', {'text': text})
+    except AIServiceBusy as e:
+        yield sse_event('error', {'error': str(e)})
+        return
+    except Exception as e:
+        print(f"Gemini API Error Detail: {str(e)}")
+        yield sse_event('error', {'error': f"AI Service Error: {str(e)}"})
+        return
+
+    ai_reply = ''.join(chunks)
+    if not cached_reply:
+        response_cache.set(cache_key, ai_reply)
+    message = await ChatMessage.objects.acreate(session=session, role='assistant', content=ai_reply)
+    # Bump updated_at so the session moves to the top of the list
+    await session.asave(update_fields=['updated_at'])
+
+    yield sse_event('done', {'message_id': message.id, 'session_id': session.id, 'title': session.title})
@@ -0,0 +1,83 @@
+import hashlib
+import re
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+
+_non_word = re.compile(r'[^\w\s]')
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    # "I feel anxious!!" and "i feel  anxious" share a cache entry
+    text = _non_word.sub(' ', text.lower())
+    return _whitespace.sub(' ', text).strip()
+
+
+class ResponseCache:
+    """
+    In-process LRU + TTL cache of model replies to first-turn prompts.
+
+    Keys combine the normalized prompt with a fingerprint of everything else
+    that shapes the reply (model and system instruction), so changing either
+    never serves an old answer.
+    """
+
+    def __init__(self, enabled, maxsize, ttl, max_prompt_chars):
+        self.enabled = enabled
+        self.max_prompt_chars = max_prompt_chars
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def key_for(self, context, model, system_instruction):
+        """Cache key for this request, or None if it must not be cached."""
+        if not self.enabled or len(context.turns) != 1 or context.summary:
+            return None
+        role, prompt, _ = context.turns[0]
+        if role != 'user' or len(prompt) > self.max_prompt_chars:
+            return None
+        fingerprint = hashlib.sha256(f"{model}\n{system_instruction}".encode()).hexdigest()[:16]
+        return f"{fingerprint}:{normalize_prompt(prompt)}"
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            reply = self._cache.get(key)
+            if reply is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return reply
+
+    def set(self, key, reply):
+        if key is None or not reply:
+            return
+        with self._lock:
+            self._cache[key] = reply
+            self.stores += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._cache),
+                'maxsize': self._cache.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+response_cache = ResponseCache(
+    enabled=settings.AI_RESPONSE_CACHE_ENABLED,
+    maxsize=settings.AI_RESPONSE_CACHE_SIZE,
+    ttl=settings.AI_RESPONSE_CACHE_TTL,
+    max_prompt_chars=settings.AI_RESPONSE_CACHE_MAX_PROMPT_CHARS,
+)
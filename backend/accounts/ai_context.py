@@ -0,0 +1,119 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ChatMessage
+
+CACHE_TTL = 60 * 60 * 24
+# Rows read when a session's window is rebuilt from the database
+REBUILD_LIMIT = 200
+SUMMARY_LINE_CHARS = 160
+
+_sentence_end = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+def _cache_key(session):
+    # created_at guards against a reused id (SQLite) picking up stale state
+    return f"ai_context:{session.id}:{int(session.created_at.timestamp())}"
+
+
+def _summary_line(role, text):
+    first_sentence = _sentence_end.split(text.strip(), maxsplit=1)[0]
+    if len(first_sentence) > SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:SUMMARY_LINE_CHARS].rstrip() + '...'
+    speaker = 'User' if role == 'user' else 'SoulTalk AI'
+    return f"- {speaker}: {first_sentence}"
+
+
+class ConversationContext:
+    """
+    Rolling, token-budgeted window over one ChatSession.
+
+    The window lives in the cache and is brought up to date by reading only
+    the messages newer than the last one it has seen. Turns that no longer
+    fit the budget are folded into a short extractive summary, which is sent
+    with the system instruction instead of being dropped.
+    """
+
+    def __init__(self, session, state=None):
+        self.session = session
+        self.budget = settings.AI_CONTEXT_TOKEN_BUDGET
+        self.summary_budget = settings.AI_SUMMARY_TOKEN_BUDGET
+        state = state or {}
+        self.last_id = state.get('last_id', 0)
+        self.turns = [tuple(turn) for turn in state.get('turns', [])]
+        self.summary = state.get('summary', [])
+
+    @classmethod
+    def load(cls, session):
+        state = cache.get(_cache_key(session))
+        if state is None:
+            context = cls(session)
+            context._rebuild()
+        else:
+            context = cls(session, state)
+            context._catch_up()
+        context.save()
+        return context
+
+    def save(self):
+        cache.set(_cache_key(self.session), {
+            'last_id': self.last_id,
+            'turns': self.turns,
+            'summary': self.summary,
+        }, CACHE_TTL)
+
+    @property
+    def tokens(self):
+        return sum(tokens for _, _, tokens in self.turns)
+
+    def _rebuild(self):
+        recent = list(
+            ChatMessage.objects.filter(session=self.session)
+            .order_by('-timestamp', '-id')
+            .values_list('id', 'role', 'content')[:REBUILD_LIMIT]
+        )
+        for message_id, role, content in reversed(recent):
+            self.append(message_id, role, content)
+
+    def _catch_up(self):
+        newer = (
+            ChatMessage.objects.filter(session=self.session, id__gt=self.last_id)
+            .order_by('timestamp', 'id')
+            .values_list('id', 'role', 'content')
+        )
+        for message_id, role, content in newer:
+            self.append(message_id, role, content)
+
+    def append(self, message_id, role, content):
+        self.last_id = max(self.last_id, message_id)
+        # Gemini expects valid non-empty content
+        if not content or not content.strip():
+            return
+        self.turns.append((role, content, estimate_tokens(content)))
+        # Always keep the newest turn, even if it alone exceeds the budget
+        while len(self.turns) > 1 and self.tokens > self.budget:
+            old_role, old_content, _ = self.turns.pop(0)
+            self._summarize(old_role, old_content)
+
+    def _summarize(self, role, content):
+        self.summary.append(_summary_line(role, content))
+        while len(self.summary) > 1 and estimate_tokens('\n'.join(self.summary)) > self.summary_budget:
+            self.summary.pop(0)
+
+    def contents(self):
+        return [
+            {'role': 'user' if role == 'user' else 'model', 'parts': [{'text': content}]}
+            for role, content, _ in self.turns
+        ]
+
+    def system_instruction(self, base_prompt):
+        if not self.summary:
+            return base_prompt
+        return base_prompt + "\n\nSummary of the earlier part of this conversation:\n" + '\n'.join(self.summary)
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Appointment
+
+ACTIVE_STATUSES = ('pending', 'upcoming')
+
+
+def expire_past_appointments(now=None, bucket_days=7):
+    """
+    Cancel active appointments whose slot has already passed.
+
+    Past days are swept in date buckets so each UPDATE (and the row locks it
+    takes) stays small, and every bucket commits on its own.
+    """
+    now = now or timezone.now()
+    today = now.date()
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+
+    cancelled = 0
+    bucket_start = active.filter(date__lt=today).aggregate(oldest=Min('date'))['oldest']
+    while bucket_start is not None and bucket_start < today:
+        bucket_end = min(bucket_start + timedelta(days=bucket_days), today)
+        with transaction.atomic():
+            cancelled += active.filter(
+                date__gte=bucket_start,
+                date__lt=bucket_end
+            ).update(status='cancelled')
+        bucket_start = bucket_end
+
+    # Appointments from today that have passed
+    with transaction.atomic():
+        cancelled += active.filter(date=today, time__lt=now.time()).update(status='cancelled')
+
+    return cancelled
+
+
+def sweep_appointments(now=None, bucket_days=7):
+    # Duplicate active bookings are refused by the database when they are
+    # made (see accounts/availability.py), so only expiry is left to sweep.
+    return {'expired': expire_past_appointments(now=now, bucket_days=bucket_days)}
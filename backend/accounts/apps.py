@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        # Connect the signal receivers for real-time push, search and matching indexes, counters, rollups and reminders
+        from . import matching, mood, notifications, realtime, reminders, search, stats  # noqa: F401
@@ -0,0 +1,125 @@
+"""
+Professional working hours, free slots and double-booking protection.
+
+Every appointment carries a start_at/end_at range derived from its date,
+time and duration. Migration 0040_appointment_overlap_guards makes the
+database refuse overlapping active (pending/upcoming) appointments for the
+same professional or the same client:
+
+* Postgres: btree_gist exclusion constraints on tstzrange(start_at, end_at).
+* SQLite: BEFORE INSERT/UPDATE triggers. SQLite allows one writer at a time,
+  so the check and the write cannot interleave with another booking.
+
+A partial unique index also allows one active appointment per client and
+professional pair. Booking is therefore a single insert; guarded() turns a
+violated guard into SlotUnavailable.
+
+free_slots() expands AvailabilityWindow rows into slots and drops the busy
+ones, read with one range scan over (professional, start_at, end_at).
+"""
+from datetime import date, datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .appointment_sweeper import ACTIVE_STATUSES
+from .models import Appointment, AvailabilityWindow
+
+MAX_SLOT_DAYS = 31
+
+CONFLICT_MESSAGES = {
+    'appointment_professional_no_overlap': "The professional already has a session at that time.",
+    'appointment_client_no_overlap': "You already have a session at that time.",
+    'unique_active_appointment_pair': "You already have an active appointment with this professional.",
+}
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def conflict_message(error):
+    text = str(error)
+    for name, message in CONFLICT_MESSAGES.items():
+        if name in text:
+            return message
+    # SQLite reports partial unique index violations by column, not by name
+    if 'UNIQUE constraint failed: accounts_appointment.client_id, accounts_appointment.professional_id' in text:
+        return CONFLICT_MESSAGES['unique_active_appointment_pair']
+    raise error
+
+
+def guarded(write):
+    """Run write() in a savepoint; a violated booking guard raises SlotUnavailable."""
+    try:
+        with transaction.atomic():
+            return write()
+    except IntegrityError as e:
+        raise SlotUnavailable(conflict_message(e)) from e
+
+
+def within_availability(professional_id, start_at, end_at):
+    """True if the range fits one of the professional's windows, or they have not set any."""
+    windows = list(AvailabilityWindow.objects.filter(professional_id=professional_id).values_list(
+        'weekday', 'start_time', 'end_time'
+    ))
+    if not windows:
+        return True
+    start, end = timezone.localtime(start_at), timezone.localtime(end_at)
+    # Windows never cross midnight, so neither can a session booked into one
+    if start.date() != end.date():
+        return False
+    return any(
+        weekday == start.weekday() and window_start <= start.time() and end.time() <= window_end
+        for weekday, window_start, window_end in windows
+    )
+
+
+def free_slots(professional_id, start_date, days=7, now=None):
+    """
+    Return [{'date', 'slots': [{'start_at', 'end_at'}]}] for each day from
+    start_date, skipping past and booked slots.
+    """
+    now = now or timezone.now()
+    days = max(1, min(days, MAX_SLOT_DAYS))
+    windows = {}
+    for window in AvailabilityWindow.objects.filter(professional_id=professional_id):
+        windows.setdefault(window.weekday, []).append(window)
+
+    range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    range_end = range_start + timedelta(days=days)
+    busy = list(
+        Appointment.objects.filter(
+            professional_id=professional_id,
+            status__in=ACTIVE_STATUSES,
+            start_at__lt=range_end,
+            end_at__gt=range_start,
+        ).order_by('start_at').values_list('start_at', 'end_at')
+    )
+
+    result = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        slots = []
+        for window in windows.get(day.weekday(), []):
+            slot_start = timezone.make_aware(datetime.combine(day, window.start_time))
+            window_end = timezone.make_aware(datetime.combine(day, window.end_time))
+            step = timedelta(minutes=window.slot_minutes)
+            while slot_start + step <= window_end:
+                slot_end = slot_start + step
+                if slot_start >= now and not any(start < slot_end and end > slot_start for start, end in busy):
+                    slots.append({'start_at': slot_start, 'end_at': slot_end})
+                slot_start = slot_end
+        slots.sort(key=lambda slot: slot['start_at'])
+        result.append({'date': day, 'slots': slots})
+    return result
+
+
+def parse_start_date(value, today=None):
+    today = today or timezone.localdate()
+    if not value:
+        return today
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError('start must be a date in YYYY-MM-DD format')
@@ -0,0 +1,67 @@
+"""
+Cached copy of Chapa's bank list (GET /v1/banks).
+
+A copy younger than BANK_LIST_TTL is served as is. An older one is still
+served while a background thread fetches a replacement, and it stays
+available as the last good copy for BANK_LIST_STALE_TTL if Chapa is down.
+Only a cold cache makes the caller wait on Chapa. `manage.py
+warm_bank_list` fills the cache ahead of time.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .chapa import ChapaError, chapa
+
+CACHE_KEY = 'chapa_banks'
+REFRESH_LOCK_KEY = 'chapa_banks:refreshing'
+REFRESH_LOCK_TTL = 60
+
+
+class BankCatalogUnavailable(Exception):
+    pass
+
+
+def fetch_banks():
+    try:
+        payload = chapa.banks()
+    except ChapaError as e:
+        raise BankCatalogUnavailable(str(e))
+    if not isinstance(payload.get('data'), list):
+        raise BankCatalogUnavailable(payload.get('message', 'Unexpected bank list response'))
+    return payload
+
+
+def refresh_banks():
+    """Fetch the list from Chapa and store it; the previous copy is kept if this fails."""
+    payload = fetch_banks()
+    cache.set(CACHE_KEY, {'payload': payload, 'fetched_at': time.time()}, settings.BANK_LIST_STALE_TTL)
+    return payload
+
+
+def _refresh_in_background():
+    # One refresh at a time across all workers sharing the cache
+    if not cache.add(REFRESH_LOCK_KEY, True, REFRESH_LOCK_TTL):
+        return
+
+    def _run():
+        try:
+            refresh_banks()
+        except BankCatalogUnavailable as e:
+            # Keep the lock so a failing upstream is retried at most once per REFRESH_LOCK_TTL
+            print(f"Bank list refresh failed, serving the last good copy: {e}")
+        else:
+            cache.delete(REFRESH_LOCK_KEY)
+
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def get_banks():
+    entry = cache.get(CACHE_KEY)
+    if entry is None:
+        return refresh_banks()
+    if time.time() - entry['fetched_at'] > settings.BANK_LIST_TTL:
+        _refresh_in_background()
+    return entry['payload']
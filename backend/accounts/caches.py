@@ -0,0 +1,12 @@
+"""
+Helpers for code that keeps state in the default cache.
+
+Counters and announcements kept in the cache are only trustworthy when
+every worker reads the same cache (Redis when REDIS_URL is set). The
+per-process local-memory and dummy backends are not shared.
+"""
+from django.conf import settings
+
+
+def cache_is_shared():
+    return not settings.CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache'))
@@ -0,0 +1,236 @@
+"""
+Outbound client for the Chapa API, shared by every payment code path.
+
+* One requests.Session with a bounded keep-alive pool (CHAPA_POOL_SIZE).
+* A (connect, read) timeout per operation, so a slow Chapa cannot hold a
+  worker indefinitely.
+* Idempotent operations (verify, banks, verify_transfer) are retried on network errors,
+  429 and 5xx with full-jitter exponential backoff. initialize and
+  transfer are only retried when the connection was never established.
+* A circuit breaker opens after CHAPA_BREAKER_THRESHOLD consecutive
+  failures and fails fast for CHAPA_BREAKER_RESET seconds before letting
+  a trial call through.
+* Per-operation call, error, retry and latency metrics (chapa.stats()).
+
+Methods return Chapa's JSON body for any response below 500 (Chapa
+reports business errors in the body) and raise ChapaUnavailable when
+Chapa could not be reached or is failing.
+"""
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+BASE_URL = "https://api.chapa.co/v1"
+
+# name -> (method, path, (connect timeout, read timeout), idempotent)
+OPERATIONS = {
+    'initialize': ('POST', '/transaction/initialize', (3.05, 15), False),
+    'verify': ('GET', '/transaction/verify/{tx_ref}', (3.05, 10), True),
+    'banks': ('GET', '/banks', (3.05, 5), True),
+    'transfer': ('POST', '/transfer', (3.05, 20), False),
+    'verify_transfer': ('GET', '/transfers/verify/{reference}', (3.05, 10), True),
+}
+
+BACKOFF_BASE = 0.25
+BACKOFF_MAX = 2.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ChapaError(Exception):
+    pass
+
+
+class ChapaNotConfigured(ChapaError):
+    pass
+
+
+class ChapaUnavailable(ChapaError):
+    pass
+
+
+def _never_sent(error):
+    # Failing to connect means Chapa never saw the request
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            # Half open: let a single trial request through
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Free the half-open trial slot after a call that ended without an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class _OperationMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'short_circuited': self.short_circuited,
+            'avg_ms': round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 1),
+        }
+
+
+class ChapaClient:
+    def __init__(self, pool_size, max_retries, breaker):
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self._metrics = {name: _OperationMetrics() for name in OPERATIONS}
+        self._metrics_lock = threading.Lock()
+
+    def _headers(self):
+        key = getattr(settings, 'CHAPA_SECRET_KEY', None)
+        if not key:
+            raise ChapaNotConfigured('Chapa Secret Key missing')
+        key = key.strip().strip('"').strip("'")
+        return {'Authorization': f'Bearer {key}'}
+
+    def _record(self, operation, elapsed_ms=None, error=False, retry=False, short_circuited=False):
+        with self._metrics_lock:
+            metrics = self._metrics[operation]
+            if elapsed_ms is not None:
+                metrics.calls += 1
+                metrics.total_ms += elapsed_ms
+                metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+            metrics.errors += int(error)
+            metrics.retries += int(retry)
+            metrics.short_circuited += int(short_circuited)
+
+    def request(self, operation, json=None, **path_args):
+        method, path, timeout, idempotent = OPERATIONS[operation]
+        headers = self._headers()
+        url = BASE_URL + path.format(**path_args)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._record(operation, short_circuited=True)
+                raise ChapaUnavailable('Chapa is temporarily unavailable, please try again shortly')
+
+            started = time.monotonic()
+            error = None
+            outcome_known = False
+            try:
+                try:
+                    response = self.session.request(method, url, json=json, headers=headers, timeout=timeout)
+                except requests.RequestException as e:
+                    retryable = idempotent or _never_sent(e)
+                    error = e
+                else:
+                    retryable = idempotent
+                    if response.status_code >= 500 or (idempotent and response.status_code in RETRY_STATUSES):
+                        error = ChapaUnavailable(f"Chapa returned HTTP {response.status_code}")
+                outcome_known = True
+            finally:
+                # Anything else (a bug, a KeyboardInterrupt) must not leave a
+                # half-open breaker waiting forever on its trial call
+                if not outcome_known:
+                    self.breaker.release_trial()
+            elapsed_ms = (time.monotonic() - started) * 1000
+
+            if error is None:
+                self.breaker.record_success()
+                self._record(operation, elapsed_ms)
+                try:
+                    return response.json()
+                except ValueError:
+                    return {'message': response.text}
+
+            self.breaker.record_failure()
+            self._record(operation, elapsed_ms, error=True)
+            if not retryable or attempt >= self.max_retries:
+                raise ChapaUnavailable(f"Chapa {operation} failed: {error}")
+            attempt += 1
+            self._record(operation, retry=True)
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)))
+
+    def initialize(self, payload):
+        return self.request('initialize', json=payload)
+
+    def verify(self, tx_ref):
+        return self.request('verify', tx_ref=tx_ref)
+
+    def banks(self):
+        return self.request('banks')
+
+    def transfer(self, payload):
+        return self.request('transfer', json=payload)
+
+    def verify_transfer(self, reference):
+        return self.request('verify_transfer', reference=reference)
+
+    def stats(self):
+        with self._metrics_lock:
+            operations = {name: metrics.as_dict() for name, metrics in self._metrics.items()}
+        return {'circuit': self.breaker.state, 'operations': operations}
+
+
+chapa = ChapaClient(
+    pool_size=settings.CHAPA_POOL_SIZE,
+    max_retries=settings.CHAPA_MAX_RETRIES,
+    breaker=CircuitBreaker(settings.CHAPA_BREAKER_THRESHOLD, settings.CHAPA_BREAKER_RESET),
+)
@@ -0,0 +1,155 @@
+"""
+Earnings ledger for professionals.
+
+Every balance change is a LedgerEntry. Entries are keyed to the
+appointment, payment or withdrawal that caused them, and the keys are
+unique per kind, so booking the same document twice fails. A balance is
+the latest BalanceSnapshot plus the entries posted after it. The
+`snapshot_balances` command takes new snapshots, so that tail stays short
+and reads stay O(1).
+
+ProfessionalProfile.balance and total_earnings stay authoritative: the
+payout pipeline reserves funds with a conditional UPDATE on them, and the
+earnings endpoint reports them. Every write to them posts its entry in the
+same transaction (credit_earning for earnings, accounts/payouts.py for
+withdrawals and refunds), so the ledger explains each change and serves
+the history and period totals. snapshot_balances reports any drift between
+the two; with --fix it posts correcting entries so the ledger matches the
+profile, and never rewrites the profile itself.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import BalanceSnapshot, LedgerEntry, ProfessionalProfile
+
+# Entries younger than this are left out of new snapshots, so a transaction
+# that took a lower id but commits late is never skipped
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+ZERO = Decimal('0.00')
+
+
+def record(professional_id, kind, amount, description='', **sources):
+    """Append an entry. Call inside the transaction that changes the profile balance."""
+    return LedgerEntry.objects.create(
+        professional_id=professional_id, kind=kind, amount=amount, description=description, **sources
+    )
+
+
+def credit_earning(professional_id, amount, description='', **sources):
+    """Book an earning and add it to the profile balance in one transaction."""
+    with transaction.atomic():
+        entry = record(professional_id, 'earning', amount, description, **sources)
+        ProfessionalProfile.objects.filter(user_id=professional_id).update(
+            balance=F('balance') + amount,
+            total_earnings=F('total_earnings') + amount,
+        )
+    return entry
+
+
+def _totals(entries):
+    totals = entries.aggregate(
+        balance=Sum('amount'),
+        earned=Sum('amount', filter=Q(kind='earning')),
+        last_id=Max('id'),
+    )
+    return totals['balance'] or ZERO, totals['earned'] or ZERO, totals['last_id']
+
+
+def latest_snapshot(professional_id):
+    return BalanceSnapshot.objects.filter(professional_id=professional_id).order_by('-last_entry_id').first()
+
+
+def balance_for(professional_id):
+    """Return {'balance', 'total_earnings'} from the latest snapshot plus the entries after it."""
+    snapshot = latest_snapshot(professional_id)
+    tail = LedgerEntry.objects.filter(professional_id=professional_id)
+    if snapshot:
+        tail = tail.filter(id__gt=snapshot.last_entry_id)
+    balance, earned, _ = _totals(tail)
+    if snapshot:
+        balance += snapshot.balance
+        earned += snapshot.total_earnings
+    return {'balance': balance, 'total_earnings': earned}
+
+
+def take_snapshots(now=None):
+    """Snapshot every professional with entries since their last snapshot; returns how many were taken."""
+    cutoff = (now or timezone.now()) - SNAPSHOT_LAG
+    professional_ids = (
+        LedgerEntry.objects.filter(created_at__lt=cutoff)
+        .values_list('professional_id', flat=True).distinct()
+    )
+    snapshots = []
+    for professional_id in professional_ids:
+        previous = latest_snapshot(professional_id)
+        entries = LedgerEntry.objects.filter(professional_id=professional_id, created_at__lt=cutoff)
+        if previous:
+            entries = entries.filter(id__gt=previous.last_entry_id)
+        balance, earned, last_id = _totals(entries)
+        if last_id is None:
+            continue
+        snapshots.append(BalanceSnapshot(
+            professional_id=professional_id,
+            last_entry_id=last_id,
+            balance=balance + (previous.balance if previous else ZERO),
+            total_earnings=earned + (previous.total_earnings if previous else ZERO),
+        ))
+    BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def _reconcile(professional_id, balance, total_earnings, ledger):
+    """Post the entries that bring the ledger in line with the profile."""
+    earned = total_earnings - ledger['total_earnings']
+    adjustment = balance - ledger['balance'] - earned
+    if earned:
+        record(professional_id, 'earning', earned, 'Reconciled to profile earnings')
+    if adjustment:
+        record(professional_id, 'adjustment', adjustment, 'Reconciled to profile balance')
+
+
+def find_drift(fix=False):
+    """
+    Compare each profile's balance with the ledger; returns
+    {professional_id: (profile, ledger)}. With fix, correcting entries are
+    posted; the profile is left alone.
+    """
+    drift = {}
+    profiles = ProfessionalProfile.objects.values_list('user_id', 'balance', 'total_earnings')
+    for professional_id, balance, total_earnings in profiles.iterator():
+        ledger = balance_for(professional_id)
+        if (balance, total_earnings) != (ledger['balance'], ledger['total_earnings']):
+            drift[professional_id] = ((balance, total_earnings), (ledger['balance'], ledger['total_earnings']))
+            if fix:
+                _reconcile(professional_id, balance, total_earnings, ledger)
+    return drift
+
+
+def period_totals(professional_id, now=None):
+    """Earned and withdrawn amounts for this month, the last 30 days and this year, in one range scan."""
+    now = now or timezone.now()
+    periods = {
+        'this_month': now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+        'last_30_days': now - timedelta(days=30),
+        'this_year': now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0),
+    }
+    aggregates = {}
+    for name, start in periods.items():
+        aggregates[f'{name}_earned'] = Sum('amount', filter=Q(kind='earning', created_at__gte=start))
+        # Withdrawals net of their refunds
+        aggregates[f'{name}_withdrawn'] = Sum('amount', filter=Q(kind__in=('withdrawal', 'refund'), created_at__gte=start))
+    totals = LedgerEntry.objects.filter(
+        professional_id=professional_id, created_at__gte=min(periods.values())
+    ).aggregate(**aggregates)
+    return {
+        name: {
+            'earned': totals[f'{name}_earned'] or ZERO,
+            'withdrawn': -(totals[f'{name}_withdrawn'] or ZERO),
+        }
+        for name in periods
+    }
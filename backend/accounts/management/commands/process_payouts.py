@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.payouts import process_payouts
+
+
+class Command(BaseCommand):
+    help = 'Send queued withdrawals to Chapa, retry failed attempts and confirm approved transfers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='Maximum number of withdrawals sent per run.')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and process every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_payouts(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Processed {result['processed']} withdrawals: {result['approved']} approved, "
+                f"{result['failed']} failed, {result['retrying']} retrying; "
+                f"{result['completed']} settled, {result['released']} stale claims released"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
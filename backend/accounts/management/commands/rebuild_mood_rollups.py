@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.mood import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily mood rollups from the raw mood updates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user (repeatable). Default: every user with mood updates.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Number of users recomputed per transaction.')
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options['users'], chunk_size=options['chunk_size'])
+        self.stdout.write(f"Wrote {written} daily mood rollups")
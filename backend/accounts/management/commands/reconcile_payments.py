@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.payment_reconciler import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Verify pending Chapa payments in the background and expire abandoned ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Maximum number of payments verified per run.')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Concurrent Chapa requests (default: PAYMENT_VERIFY_CONCURRENCY).')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and reconcile every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            result = reconcile_payments(batch_size=options['batch_size'], concurrency=options['concurrency'])
+            self.stdout.write(
+                f"Checked {result['checked']} payments: {result['success']} succeeded, "
+                f"{result['failed']} failed, {result['pending']} still pending; {result['expired']} expired"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the public stats counters and correct any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and reconcile every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            drift = reconcile_stats()
+            self.stdout.write(', '.join(f"{name}: {delta:+d}" for name, delta in drift.items()))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.reminders import scheduler, send_due
+
+
+class Command(BaseCommand):
+    help = 'Send appointment reminder notifications that are due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running as a scheduler, checking at least every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        if not options['interval']:
+            self.stdout.write(f"Sent {send_due()} reminder notifications")
+            return
+        while True:
+            sent, delay = scheduler.tick(max_sleep=options['interval'])
+            if sent:
+                self.stdout.write(f"Sent {sent} reminder notifications")
+            time.sleep(delay)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.ledger import find_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot professional balances from the earnings ledger and report drift from the profile balances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Post correcting ledger entries so the ledger matches drifted profile balances.')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and snapshot every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            taken = take_snapshots()
+            drift = find_drift(fix=options['fix'])
+            self.stdout.write(f"Took {taken} snapshots; {len(drift)} profiles drifted from the ledger")
+            for professional_id, (mirror, actual) in drift.items():
+                self.stdout.write(f"  professional {professional_id}: profile {mirror}, ledger {actual}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
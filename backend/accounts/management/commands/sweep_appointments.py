@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.appointment_sweeper import sweep_appointments
+
+
+class Command(BaseCommand):
+    help = 'Cancel active appointments whose slot has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bucket-days', type=int, default=7,
+                            help='Number of past days cancelled per UPDATE batch.')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sweep every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            result = sweep_appointments(bucket_days=options['bucket_days'])
+            self.stdout.write(f"Cancelled {result['expired']} expired appointments")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
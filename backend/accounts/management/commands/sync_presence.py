@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.presence import sync_presence
+
+
+class Command(BaseCommand):
+    help = 'Mark professionals whose presence heartbeat has expired as offline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running and sync every N seconds (0 = run once).')
+
+    def handle(self, *args, **options):
+        while True:
+            changed = sync_presence()
+            self.stdout.write(f"Marked {changed} professionals offline (heartbeat TTL {settings.PRESENCE_TTL}s)")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.bank_catalog import BankCatalogUnavailable, refresh_banks
+
+
+class Command(BaseCommand):
+    help = "Fetch Chapa's bank list into the cache so payout screens never wait on it."
+
+    def handle(self, *args, **options):
+        try:
+            payload = refresh_banks()
+        except BankCatalogUnavailable as e:
+            raise CommandError(f"Could not fetch the bank list: {e}")
+        self.stdout.write(f"Cached {len(payload['data'])} banks")
@@ -0,0 +1,307 @@
+"""
+Ranking verified professionals against a service request.
+
+Each process keeps a MatchingIndex in memory: one sparse row per verified
+professional (the hashed term columns of the specialization, counted
+twice, bio and languages, with their sublinear frequencies), alongside
+document frequencies, ratings and a language bitmask. Memory grows with
+the number of distinct terms per profile, not with N_FEATURES.
+
+The TF-IDF weighted, L2-normalised rows are kept column-sorted, so each
+term has a contiguous posting list. Ranking a request reads only the
+postings of its (few) terms, blends the cosine similarity with rating and
+language, then uses argpartition for the top K. Live online status
+(accounts/presence.py) is looked up for the few rows that could still
+reach the top K.
+
+Hashing the terms keeps the column space fixed, so the index changes one
+row at a time. A profile save updates its row in the saving process right
+away; every process picks up profiles whose updated_at moved within
+SYNC_INTERVAL seconds of its next query, and rebuilds from scratch every
+REBUILD_INTERVAL seconds to drop deleted profiles.
+"""
+import re
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import presence
+from .models import ProfessionalProfile
+
+N_FEATURES = 2 ** 12
+SPECIALIZATION_WEIGHT = 2
+
+TEXT_WEIGHT = 0.6
+RATING_WEIGHT = 0.2
+LANGUAGE_WEIGHT = 0.1
+ONLINE_WEIGHT = 0.1
+
+SYNC_INTERVAL = 5
+# Re-read profiles saved this long before the last sync, in case their transaction committed late
+SYNC_OVERLAP = timedelta(seconds=60)
+REBUILD_INTERVAL = 600
+# Online status is looked up for at most this many candidates
+MAX_PRESENCE_LOOKUPS = 500
+
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have i in is it its me my of on or so that the '
+    'this to was we with you your am been do im not help need looking want'.split()
+)
+_word = re.compile(r'[^\W\d_]{2,}')
+
+PROFILE_FIELDS = ('id', 'user_id', 'specialization', 'bio', 'languages', 'rating', 'verified', 'updated_at')
+
+
+def terms(text):
+    return [term for term in _word.findall((text or '').lower()) if term not in STOP_WORDS]
+
+
+def _hash(term):
+    return zlib.crc32(term.encode()) % N_FEATURES
+
+
+def term_vector(*weighted_texts):
+    """
+    Sublinear (1 + log tf) hashed term frequencies of the given (text,
+    weight) pairs, as sorted (columns, values) arrays.
+    """
+    buckets, weights = [], []
+    for text, weight in weighted_texts:
+        hashed = [_hash(term) for term in terms(text)]
+        buckets += hashed
+        weights += [weight] * len(hashed)
+    columns, inverse = np.unique(np.array(buckets, dtype=np.int32), return_inverse=True)
+    counts = np.bincount(inverse, weights=weights, minlength=len(columns))
+    return columns.astype(np.int32), (1 + np.log(counts)).astype(np.float32)
+
+
+def language_bit(name):
+    return np.int64(1) << np.int64(zlib.crc32(name.strip().lower().encode()) % 63)
+
+
+def language_mask(languages):
+    mask = np.int64(0)
+    for name in (languages or '').split(','):
+        if name.strip():
+            mask |= language_bit(name)
+    return mask
+
+
+def profile_vector(specialization, bio, languages):
+    return term_vector((specialization, SPECIALIZATION_WEIGHT), (bio, 1), (languages, 1))
+
+
+class MatchingIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._checked_at = 0.0
+        self._synced_to = None
+        self._reset(np.empty(0, np.int64), np.empty(0, np.int64), [],
+                    np.empty(0, np.float32), np.empty(0, np.int64), np.empty(0, np.float64))
+
+    def _reset(self, profile_ids, user_ids, rows, ratings, languages, updated):
+        self.profile_ids = profile_ids
+        self.user_ids = user_ids
+        # (columns, values) per position
+        self.rows = rows
+        self.ratings = ratings
+        self.languages = languages
+        self.updated = updated
+        self.df = np.zeros(N_FEATURES, np.int64)
+        for columns, _ in rows:
+            self.df[columns] += 1
+        self._positions = {int(profile_id): i for i, profile_id in enumerate(profile_ids)}
+        self._weighted = None
+
+    def __len__(self):
+        return len(self.profile_ids)
+
+    def build(self):
+        """Load every verified professional; returns the number of rows."""
+        started = timezone.now()
+        rows = list(ProfessionalProfile.objects.filter(verified=True).values_list(*PROFILE_FIELDS))
+        with self._lock:
+            self._reset(
+                np.array([row[0] for row in rows], dtype=np.int64),
+                np.array([row[1] for row in rows], dtype=np.int64),
+                [profile_vector(row[2], row[3], row[4]) for row in rows],
+                np.array([float(row[5]) for row in rows], dtype=np.float32),
+                np.array([language_mask(row[4]) for row in rows], dtype=np.int64),
+                np.array([row[7].timestamp() for row in rows], dtype=np.float64),
+            )
+            self._built_at = self._checked_at = time.monotonic()
+            self._synced_to = started
+            return len(rows)
+
+    def sync(self):
+        """Apply profiles saved since the last build or sync; returns how many rows changed."""
+        started = timezone.now()
+        rows = list(
+            ProfessionalProfile.objects.filter(updated_at__gte=self._synced_to - SYNC_OVERLAP).values_list(*PROFILE_FIELDS)
+        )
+        with self._lock:
+            changed = self.apply(rows)
+            self._checked_at = time.monotonic()
+            self._synced_to = started
+            return changed
+
+    def apply(self, rows):
+        """Insert, replace or drop rows given PROFILE_FIELDS tuples; unchanged rows are skipped."""
+        changed = 0
+        with self._lock:
+            for profile_id, user_id, specialization, bio, languages, rating, verified, updated_at in rows:
+                position = self._positions.get(profile_id)
+                if position is not None and self.updated[position] >= updated_at.timestamp():
+                    continue
+                if position is not None:
+                    self.df[self.rows[position][0]] -= 1
+                if not verified:
+                    if position is not None:
+                        self._remove(position)
+                        changed += 1
+                    continue
+                vector = profile_vector(specialization, bio, languages)
+                if position is None:
+                    # Appending copies the 1-D arrays; new verified professionals are rare
+                    position = len(self.profile_ids)
+                    self._positions[profile_id] = position
+                    self.profile_ids = np.append(self.profile_ids, profile_id)
+                    self.user_ids = np.append(self.user_ids, user_id)
+                    self.rows.append(vector)
+                    self.ratings = np.append(self.ratings, np.float32(float(rating)))
+                    self.languages = np.append(self.languages, language_mask(languages))
+                    self.updated = np.append(self.updated, updated_at.timestamp())
+                else:
+                    self.rows[position] = vector
+                    self.ratings[position] = float(rating)
+                    self.languages[position] = language_mask(languages)
+                    self.updated[position] = updated_at.timestamp()
+                self.df[vector[0]] += 1
+                changed += 1
+            if changed:
+                self._weighted = None
+        return changed
+
+    def remove(self, profile_id):
+        with self._lock:
+            position = self._positions.get(profile_id)
+            if position is not None:
+                self.df[self.rows[position][0]] -= 1
+                self._remove(position)
+                self._weighted = None
+
+    def _remove(self, position):
+        # Move the last row into the hole so removal costs one row copy
+        last = len(self.profile_ids) - 1
+        del self._positions[int(self.profile_ids[position])]
+        if position != last:
+            for array in (self.profile_ids, self.user_ids, self.rows, self.ratings, self.languages, self.updated):
+                array[position] = array[last]
+            self._positions[int(self.profile_ids[position])] = position
+        self.rows.pop()
+        self.profile_ids, self.user_ids = self.profile_ids[:last], self.user_ids[:last]
+        self.ratings, self.languages, self.updated = self.ratings[:last], self.languages[:last], self.updated[:last]
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at > REBUILD_INTERVAL:
+            self.build()
+        elif now - self._checked_at > SYNC_INTERVAL:
+            self.sync()
+
+    def _matrix(self):
+        """
+        The weighted, normalised entries sorted by column: (row positions,
+        weights, column pointers, idf). Column c's postings are
+        [pointers[c], pointers[c + 1]). Rebuilt after a change, never
+        modified in place.
+        """
+        if self._weighted is None:
+            count = len(self.rows)
+            idf = (np.log((1 + count) / (1 + self.df)) + 1).astype(np.float32)
+            lengths = np.fromiter((len(columns) for columns, _ in self.rows), dtype=np.int64, count=count)
+            columns = np.concatenate([columns for columns, _ in self.rows]) if count else np.empty(0, np.int32)
+            values = np.concatenate([values for _, values in self.rows]) if count else np.empty(0, np.float32)
+            positions = np.repeat(np.arange(count), lengths)
+            weights = values * idf[columns]
+            norms = np.sqrt(np.bincount(positions, weights=weights ** 2, minlength=count))
+            norms[norms == 0] = 1
+            weights = (weights / norms[positions]).astype(np.float32)
+            order = np.argsort(columns, kind='stable')
+            pointers = np.searchsorted(columns[order], np.arange(N_FEATURES + 1))
+            self._weighted = (positions[order], weights[order], pointers, idf)
+        return self._weighted
+
+    def rank(self, text, k=10, language=None, exclude_user_ids=()):
+        """
+        Return up to k (user_id, score, text_similarity) tuples, best first.
+        Scores blend TF-IDF cosine similarity with rating, language and
+        online status using the *_WEIGHT constants.
+        """
+        with self._lock:
+            self._refresh()
+            if not len(self.profile_ids):
+                return []
+            positions, weights, pointers, idf = self._matrix()
+            # apply() and _remove() write these in place once the lock is released
+            user_ids, ratings, languages = self.user_ids.copy(), self.ratings.copy(), self.languages.copy()
+
+        columns, values = term_vector((text, 1))
+        query = values * idf[columns]
+        similarity = np.zeros(len(user_ids), np.float32)
+        if len(columns):
+            query /= np.linalg.norm(query)
+            # A request has a handful of terms: only their postings contribute to the dot products
+            for column, weight in zip(columns, query):
+                start, end = pointers[column], pointers[column + 1]
+                similarity[positions[start:end]] += weights[start:end] * weight
+
+        scores = TEXT_WEIGHT * similarity + RATING_WEIGHT * (ratings / 5)
+        if language:
+            scores += LANGUAGE_WEIGHT * ((languages & language_bit(language)) != 0)
+        if exclude_user_ids:
+            scores[np.isin(user_ids, list(exclude_user_ids))] = -np.inf
+
+        k = min(k, len(scores))
+        kth_best = np.partition(scores, len(scores) - k)[len(scores) - k]
+        # Only rows within ONLINE_WEIGHT of the k-th best can still reach the top k
+        candidates = np.flatnonzero(np.isfinite(scores) & (scores >= kth_best - ONLINE_WEIGHT))
+        if len(candidates) > MAX_PRESENCE_LOOKUPS:
+            candidates = candidates[np.argpartition(-scores[candidates], MAX_PRESENCE_LOOKUPS)[:MAX_PRESENCE_LOOKUPS]]
+        online = presence.online_among(user_ids[candidates].tolist())
+        final = scores[candidates] + ONLINE_WEIGHT * np.isin(user_ids[candidates], list(online))
+        order = np.argsort(-final, kind='stable')[:k]
+        return [
+            (int(user_ids[candidates[i]]), round(float(final[i]), 4), round(float(similarity[candidates[i]]), 4))
+            for i in order
+        ]
+
+
+index = MatchingIndex()
+
+
+def rank_for_request(service_request, k=10, language=None):
+    text = f"{service_request.category} {service_request.title} {service_request.description}"
+    return index.rank(text, k=k, language=language, exclude_user_ids=(service_request.client_id,))
+
+
+@receiver(post_save, sender=ProfessionalProfile)
+def update_matching_row(sender, instance, raw=False, **kwargs):
+    if raw or index._built_at is None:
+        return
+    row = tuple(getattr(instance, field) for field in PROFILE_FIELDS)
+    transaction.on_commit(lambda: index.apply([row]))
+
+
+@receiver(post_delete, sender=ProfessionalProfile)
+def remove_matching_row(sender, instance, **kwargs):
+    profile_id = instance.id
+    transaction.on_commit(lambda: index.remove(profile_id))
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_clientprofile_profile_photo_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'date', 'time'], name='accounts_ap_client__894ebf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['professional', 'date', 'time'], name='accounts_ap_profess_0cd1c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'date', 'time'], name='accounts_ap_status_dbcffa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'professional', 'status'], name='accounts_ap_client__5f78de_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_appointment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'timestamp'], name='accounts_ch_session_a073b1_idx'),
+        ),
+    ]
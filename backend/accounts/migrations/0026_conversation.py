@@ -0,0 +1,73 @@
+# Generated by Django 6.0 on 2026-10-18 03:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Conversation = apps.get_model('accounts', 'Conversation')
+    DirectMessage = apps.get_model('accounts', 'DirectMessage')
+
+    pairs = {
+        tuple(sorted(pair))
+        for pair in DirectMessage.objects.values_list('sender_id', 'receiver_id').distinct()
+    }
+    for low, high in pairs:
+        conversation, _ = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+        messages = DirectMessage.objects.filter(
+            models.Q(sender_id=low, receiver_id=high) | models.Q(sender_id=high, receiver_id=low)
+        )
+        messages.update(conversation=conversation)
+        last = messages.order_by('-created_at', '-id').first()
+        if last:
+            conversation.last_message = last
+            conversation.last_message_at = last.created_at
+            conversation.save(update_fields=['last_message', 'last_message_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_chatmessage_session_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.directmessage')),
+                ('user_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='directmessage',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='accounts.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['conversation', 'id'], name='accounts_di_convers_b0aa57_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['conversation', 'receiver', 'is_read'], name='accounts_di_convers_ad5d75_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_low', '-last_message_at'], name='accounts_co_user_lo_a2601a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_high', '-last_message_at'], name='accounts_co_user_hi_eedac8_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user_low', 'user_high')},
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
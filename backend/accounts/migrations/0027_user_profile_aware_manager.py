@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 03:35
+
+import accounts.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_conversation'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', accounts.models.ProfileAwareUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0 on 2026-10-18 03:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_languages(apps, schema_editor):
+    ProfessionalProfile = apps.get_model('accounts', 'ProfessionalProfile')
+    ProfessionalLanguage = apps.get_model('accounts', 'ProfessionalLanguage')
+
+    entries = []
+    for profile_id, languages in ProfessionalProfile.objects.values_list('id', 'languages').iterator():
+        names = {lang.strip().lower() for lang in (languages or '').split(',') if lang.strip()}
+        entries.extend(ProfessionalLanguage(profile_id=profile_id, name=name) for name in names)
+    ProfessionalLanguage.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_user_profile_aware_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessionalLanguage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='professionalprofile',
+            index=models.Index(fields=['verified', 'is_online', 'rating'], name='accounts_pr_verifie_91da82_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='professionalprofile',
+            index=models.Index(fields=['verified', 'sessions_completed'], name='accounts_pr_verifie_2ceb79_idx'),
+        ),
+        migrations.AddField(
+            model_name='professionallanguage',
+            name='profile',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='language_entries', to='accounts.professionalprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='professionallanguage',
+            index=models.Index(fields=['name', 'profile'], name='accounts_pr_name_f29046_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='professionallanguage',
+            unique_together={('profile', 'name')},
+        ),
+        migrations.RunPython(backfill_languages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 6.0 on 2026-10-18 03:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE accounts_professionalsearchdocument ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', name), 'A')
+        || setweight(to_tsvector('english', specialization), 'A')
+        || setweight(to_tsvector('english', bio), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX accounts_pro_search_vector_idx ON accounts_professionalsearchdocument USING gin (search_vector)",
+    "CREATE INDEX accounts_pro_search_name_trgm ON accounts_professionalsearchdocument USING gin (name gin_trgm_ops)",
+    "CREATE INDEX accounts_pro_search_spec_trgm ON accounts_professionalsearchdocument USING gin (specialization gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS accounts_pro_search_spec_trgm",
+    "DROP INDEX IF EXISTS accounts_pro_search_name_trgm",
+    "DROP INDEX IF EXISTS accounts_pro_search_vector_idx",
+    "ALTER TABLE accounts_professionalsearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE accounts_professionalsearch_fts USING fts5(
+        name, specialization, bio,
+        content='accounts_professionalsearchdocument', content_rowid='profile_id',
+        tokenize='porter unicode61'
+    )
+    """,
+    "CREATE VIRTUAL TABLE accounts_professionalsearch_vocab USING fts5vocab(accounts_professionalsearch_fts, 'row')",
+    """
+    CREATE TRIGGER accounts_professionalsearch_ai AFTER INSERT ON accounts_professionalsearchdocument BEGIN
+        INSERT INTO accounts_professionalsearch_fts(rowid, name, specialization, bio)
+        VALUES (new.profile_id, new.name, new.specialization, new.bio);
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_professionalsearch_ad AFTER DELETE ON accounts_professionalsearchdocument BEGIN
+        INSERT INTO accounts_professionalsearch_fts(accounts_professionalsearch_fts, rowid, name, specialization, bio)
+        VALUES ('delete', old.profile_id, old.name, old.specialization, old.bio);
+    END
+    """,
+    """
+    CREATE TRIGGER accounts_professionalsearch_au AFTER UPDATE ON accounts_professionalsearchdocument BEGIN
+        INSERT INTO accounts_professionalsearch_fts(accounts_professionalsearch_fts, rowid, name, specialization, bio)
+        VALUES ('delete', old.profile_id, old.name, old.specialization, old.bio);
+        INSERT INTO accounts_professionalsearch_fts(rowid, name, specialization, bio)
+        VALUES (new.profile_id, new.name, new.specialization, new.bio);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS accounts_professionalsearch_au",
+    "DROP TRIGGER IF EXISTS accounts_professionalsearch_ad",
+    "DROP TRIGGER IF EXISTS accounts_professionalsearch_ai",
+    "DROP TABLE IF EXISTS accounts_professionalsearch_vocab",
+    "DROP TABLE IF EXISTS accounts_professionalsearch_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def backfill_documents(apps, schema_editor):
+    ProfessionalProfile = apps.get_model('accounts', 'ProfessionalProfile')
+    ProfessionalSearchDocument = apps.get_model('accounts', 'ProfessionalSearchDocument')
+
+    documents = []
+    for profile in ProfessionalProfile.objects.select_related('user').iterator():
+        user = profile.user
+        documents.append(ProfessionalSearchDocument(
+            profile_id=profile.pk,
+            name=f"{user.first_name} {user.last_name}".strip() or user.username,
+            specialization=profile.specialization or '',
+            bio=profile.bio or '',
+            verified=profile.verified,
+        ))
+    ProfessionalSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_professional_directory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessionalSearchDocument',
+            fields=[
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='accounts.professionalprofile')),
+                ('name', models.CharField(blank=True, max_length=301)),
+                ('specialization', models.CharField(blank=True, max_length=255)),
+                ('bio', models.TextField(blank=True)),
+                ('verified', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 03:46
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Appointment = apps.get_model('accounts', 'Appointment')
+    ProfessionalProfile = apps.get_model('accounts', 'ProfessionalProfile')
+    StatCounter = apps.get_model('accounts', 'StatCounter')
+
+    StatCounter.objects.bulk_create([
+        StatCounter(name='people_helped', value=User.objects.filter(role='client').count()),
+        StatCounter(name='support_sessions', value=Appointment.objects.filter(status='completed').count()),
+        StatCounter(name='licensed_experts', value=ProfessionalProfile.objects.filter(verification_status='verified').count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
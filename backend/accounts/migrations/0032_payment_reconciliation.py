@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_statcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='chapa_reference',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='next_verify_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='verify_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'next_verify_at'], name='accounts_pa_status_b97576_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='accounts_pa_status_acc580_idx'),
+        ),
+    ]
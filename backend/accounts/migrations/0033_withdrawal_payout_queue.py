@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0032_payment_reconciliation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='withdrawal',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='withdrawal',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='withdrawal',
+            name='last_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='withdrawal',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='withdrawal',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('approved', 'Approved'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='accounts_wi_status_a6bf5b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['status', 'claimed_at'], name='accounts_wi_status_dcb7db_idx'),
+        ),
+    ]
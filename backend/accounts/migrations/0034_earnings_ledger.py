@@ -0,0 +1,108 @@
+# Generated by Django 6.0 on 2026-10-18 03:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledgers(apps, schema_editor):
+    ProfessionalProfile = apps.get_model('accounts', 'ProfessionalProfile')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+    entries = []
+    for user_id, balance, total_earnings in ProfessionalProfile.objects.values_list('user_id', 'balance', 'total_earnings'):
+        if total_earnings:
+            entries.append(LedgerEntry(
+                professional_id=user_id, kind='earning', amount=total_earnings,
+                description='Opening balance carried over from profile'
+            ))
+        # Whatever was already paid out (or reserved) before the ledger existed
+        if balance - total_earnings:
+            entries.append(LedgerEntry(
+                professional_id=user_id, kind='adjustment', amount=balance - total_earnings,
+                description='Withdrawals before the ledger was introduced'
+            ))
+    LedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0033_withdrawal_payout_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_earnings', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('earning', 'Earning'), ('withdrawal', 'Withdrawal'), ('refund', 'Withdrawal Refund'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='accounts_wi_user_id_e54e6f_idx'),
+        ),
+        migrations.AddField(
+            model_name='balancesnapshot',
+            name='professional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='appointment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='accounts.appointment'),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='payment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='accounts.payment'),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='professional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='withdrawal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='accounts.withdrawal'),
+        ),
+        migrations.AddIndex(
+            model_name='balancesnapshot',
+            index=models.Index(fields=['professional', '-last_entry_id'], name='accounts_ba_profess_de126e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['professional', '-created_at', '-id'], name='accounts_le_profess_7cfaff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['professional', 'id'], name='accounts_le_profess_37cd77_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('appointment__isnull', False)), fields=('kind', 'appointment'), name='unique_ledger_appointment'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('payment__isnull', False)), fields=('kind', 'payment'), name='unique_ledger_payment'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('withdrawal__isnull', False)), fields=('kind', 'withdrawal'), name='unique_ledger_withdrawal'),
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
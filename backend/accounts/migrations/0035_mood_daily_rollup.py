@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 03:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    MoodUpdate = apps.get_model('accounts', 'MoodUpdate')
+    MoodDailyRollup = apps.get_model('accounts', 'MoodDailyRollup')
+    days = (
+        MoodUpdate.objects.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day')
+        .annotate(entries=Count('id'), score_total=Sum('mood_score'), min_score=Min('mood_score'), max_score=Max('mood_score'))
+        .order_by()
+    )
+    MoodDailyRollup.objects.bulk_create((MoodDailyRollup(**row) for row in days.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0034_earnings_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('score_total', models.IntegerField(default=0)),
+                ('min_score', models.IntegerField()),
+                ('max_score', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='moodupdate',
+            index=models.Index(fields=['user', 'created_at'], name='accounts_mo_user_id_f7ae08_idx'),
+        ),
+        migrations.AddField(
+            model_name='mooddailyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='mooddailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='unique_mood_rollup_day'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0035_mood_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', 'category', '-created_at', '-id'], name='accounts_se_status_d1eef0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='accounts_se_status_3e8fd3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['client', '-created_at', '-id'], name='accounts_se_client__866d1a_idx'),
+        ),
+    ]
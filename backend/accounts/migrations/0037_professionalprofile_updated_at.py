@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0036_service_request_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='professionalprofile',
+            index=models.Index(fields=['updated_at'], name='accounts_pr_updated_27cc5c_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-18 04:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0037_professionalprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_minutes', models.PositiveIntegerField(default=60)),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='end_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='start_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='availabilitywindow',
+            name='professional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_windows', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='availabilitywindow',
+            index=models.Index(fields=['professional', 'weekday', 'start_time'], name='accounts_av_profess_a439ca_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='availabilitywindow',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='availability_ends_after_start'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 04:08
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def fill_slots(apps, schema_editor):
+    """
+    Derive start_at/end_at for existing appointments. Active bookings that
+    clash with an earlier one (same professional or client at the same time,
+    or a second active booking for the same pair) are cancelled, keeping the
+    first booked, so the new guards can be created.
+    """
+    Appointment = apps.get_model('accounts', 'Appointment')
+    appointments = list(Appointment.objects.order_by('created_at', 'id'))
+    booked = defaultdict(list)
+    pairs = set()
+    for appointment in appointments:
+        appointment.start_at = timezone.make_aware(datetime.combine(appointment.date, appointment.time))
+        appointment.end_at = appointment.start_at + timedelta(minutes=appointment.duration_minutes)
+        if appointment.status not in ('pending', 'upcoming'):
+            continue
+        keys = (('professional', appointment.professional_id), ('client', appointment.client_id))
+        pair = (appointment.client_id, appointment.professional_id)
+        clashes = any(
+            start < appointment.end_at and end > appointment.start_at
+            for key in keys for start, end in booked[key]
+        )
+        if clashes or pair in pairs:
+            appointment.status = 'cancelled'
+            continue
+        pairs.add(pair)
+        for key in keys:
+            booked[key].append((appointment.start_at, appointment.end_at))
+    Appointment.objects.bulk_update(appointments, ['start_at', 'end_at', 'status'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0038_appointment_slots'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+ACTIVE = "('pending', 'upcoming')"
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    f"""
+    ALTER TABLE accounts_appointment ADD CONSTRAINT appointment_professional_no_overlap
+    EXCLUDE USING gist (professional_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&)
+    WHERE (status IN {ACTIVE})
+    """,
+    f"""
+    ALTER TABLE accounts_appointment ADD CONSTRAINT appointment_client_no_overlap
+    EXCLUDE USING gist (client_id WITH =, tstzrange(start_at, end_at, '[)') WITH &&)
+    WHERE (status IN {ACTIVE})
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "ALTER TABLE accounts_appointment DROP CONSTRAINT IF EXISTS appointment_client_no_overlap",
+    "ALTER TABLE accounts_appointment DROP CONSTRAINT IF EXISTS appointment_professional_no_overlap",
+]
+
+
+def _sqlite_guard(event, exclude_self):
+    # SQLite has a single writer, so a check inside the writing statement cannot race.
+    # Django rebuilds SQLite tables for most later AlterField/AddConstraint
+    # operations, which drops these triggers: recreate them in such migrations.
+    other = "AND id <> NEW.id" if exclude_self else ""
+    checks = "".join(
+        f"""
+        SELECT RAISE(ABORT, 'appointment_{column}_no_overlap') WHERE EXISTS (
+            SELECT 1 FROM accounts_appointment
+            WHERE {column}_id = NEW.{column}_id AND status IN {ACTIVE}
+            AND start_at < NEW.end_at AND end_at > NEW.start_at {other}
+        );"""
+        for column in ('professional', 'client')
+    )
+    name = 'update' if exclude_self else 'insert'
+    return f"""
+    CREATE TRIGGER appointment_no_overlap_{name} BEFORE {event} ON accounts_appointment
+    WHEN NEW.status IN {ACTIVE}
+    BEGIN {checks}
+    END
+    """
+
+
+SQLITE_FORWARD = [
+    _sqlite_guard("INSERT", exclude_self=False),
+    _sqlite_guard("UPDATE OF professional_id, client_id, start_at, end_at, status", exclude_self=True),
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS appointment_no_overlap_update",
+    "DROP TRIGGER IF EXISTS appointment_no_overlap_insert",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0039_fill_appointment_slots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='end_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='start_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['professional', 'start_at', 'end_at'], name='accounts_ap_profess_7380cc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['client', 'start_at', 'end_at'], name='accounts_ap_client__cbca39_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.CheckConstraint(condition=models.Q(('end_at__gt', models.F('start_at'))), name='appointment_ends_after_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'upcoming'])), fields=('client', 'professional'), name='unique_active_appointment_pair'),
+        ),
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
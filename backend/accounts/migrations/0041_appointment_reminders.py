@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-18 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0040_appointment_overlap_guards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SchedulerState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('high_water', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'start_at'], name='accounts_ap_status_407be1_idx'),
+        ),
+    ]
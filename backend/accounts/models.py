@@ -1,5 +1,18 @@
-from django.contrib.auth.models import AbstractUser
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+class UserQuerySet(models.QuerySet):
+    def with_profiles(self):
+        # UserSerializer reads whichever profile matches the role; join them all
+        # so serializing a list costs one query instead of one or more per user.
+        return self.select_related('client_profile', 'professional_profile', 'admin_profile')
+
+class ProfileAwareUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -9,6 +22,8 @@ class User(AbstractUser):
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='client')
 
+    objects = ProfileAwareUserManager()
+
     def __str__(self):
         if self.first_name or self.last_name:
             return f"{self.first_name} {self.last_name}".strip()
@@ -90,15 +105,71 @@ class ProfessionalProfile(models.Model):
     # Financials
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total_earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
         # Sync verified boolean with status
         self.verified = (self.verification_status == 'verified')
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'languages' in update_fields:
+            self.sync_language_entries()
+
+    def language_list(self):
+        return [lang.strip() for lang in (self.languages or '').split(',') if lang.strip()]
+
+    def sync_language_entries(self):
+        # Keep the normalized ProfessionalLanguage rows in step with the CSV field
+        wanted = {lang.lower() for lang in self.language_list()}
+        existing = set(self.language_entries.values_list('name', flat=True))
+        if existing - wanted:
+            self.language_entries.filter(name__in=existing - wanted).delete()
+        if wanted - existing:
+            ProfessionalLanguage.objects.bulk_create(
+                [ProfessionalLanguage(profile=self, name=name) for name in wanted - existing],
+                ignore_conflicts=True
+            )
 
     def __str__(self):
         return f"Professional: {self.user.username}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['verified', 'is_online', 'rating']),
+            models.Index(fields=['verified', 'sessions_completed']),
+            models.Index(fields=['updated_at']),
+        ]
+
+class ProfessionalLanguage(models.Model):
+    profile = models.ForeignKey(ProfessionalProfile, on_delete=models.CASCADE, related_name='language_entries')
+    name = models.CharField(max_length=50)  # lowercased
+
+    def __str__(self):
+        return f"{self.profile.user.username}: {self.name}"
+
+    class Meta:
+        unique_together = ('profile', 'name')
+        indexes = [
+            models.Index(fields=['name', 'profile']),
+        ]
+
+class ProfessionalSearchDocument(models.Model):
+    """
+    Denormalized text searched by /professionals/search/, refreshed from
+    signals when a professional or their profile changes. The migration adds
+    the database-specific index on top (tsvector + trigram on Postgres, an
+    FTS5 table on SQLite).
+    """
+    profile = models.OneToOneField(ProfessionalProfile, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=301, blank=True)
+    specialization = models.CharField(max_length=255, blank=True)
+    bio = models.TextField(blank=True)
+    verified = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document: {self.name}"
+
 class AdminProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='admin_profile')
     department = models.CharField(max_length=100, blank=True, null=True)
@@ -134,6 +205,9 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['session', 'timestamp']),
+        ]
 class Appointment(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -152,14 +226,81 @@ class Appointment(models.Model):
     time = models.TimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     session_type = models.CharField(max_length=10, choices=SESSION_TYPE_CHOICES, default='video')
+    duration_minutes = models.PositiveIntegerField(default=60)
+    # Derived from date, time and duration on save; the overlap guards of
+    # migration 0040 work on these (see accounts/availability.py)
+    start_at = models.DateTimeField(editable=False)
+    end_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True, null=True)
 
+    def slot_bounds(self):
+        day = parse_date(self.date) if isinstance(self.date, str) else self.date
+        start_time = parse_time(self.time) if isinstance(self.time, str) else self.time
+        start = timezone.make_aware(datetime.combine(day, start_time))
+        return start, start + timedelta(minutes=self.duration_minutes)
+
+    def save(self, *args, **kwargs):
+        self.start_at, self.end_at = self.slot_bounds()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'date', 'time', 'duration_minutes'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'start_at', 'end_at'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.client.username} with {self.professional.username} on {self.date}"
 
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['client', 'date', 'time']),
+            models.Index(fields=['professional', 'date', 'time']),
+            # Used by the appointment sweeper
+            models.Index(fields=['status', 'date', 'time']),
+            models.Index(fields=['client', 'professional', 'status']),
+            # Range scans for free slots and overlap checks
+            models.Index(fields=['professional', 'start_at', 'end_at']),
+            models.Index(fields=['client', 'start_at', 'end_at']),
+            # Reminder windows (accounts/reminders.py)
+            models.Index(fields=['status', 'start_at']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_at__gt=models.F('start_at')), name='appointment_ends_after_start'),
+            models.UniqueConstraint(
+                fields=['client', 'professional'],
+                condition=models.Q(status__in=['pending', 'upcoming']),
+                name='unique_active_appointment_pair',
+            ),
+        ]
+
+class AvailabilityWindow(models.Model):
+    """A weekly block of working hours in which clients can book sessions."""
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+    professional = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability_windows')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveIntegerField(default=60)
+
+    def __str__(self):
+        return f"{self.professional.username}: {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+        indexes = [
+            models.Index(fields=['professional', 'weekday', 'start_time']),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='availability_ends_after_start'),
+        ]
 
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -175,6 +316,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['user', 'is_read']),
+        ]
 
 class MoodUpdate(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mood_updates')
@@ -187,6 +332,27 @@ class MoodUpdate(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+class MoodDailyRollup(models.Model):
+    """Per-user, per-day mood aggregate, maintained on insert. See accounts/mood.py."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mood_rollups')
+    day = models.DateField()
+    entries = models.PositiveIntegerField(default=0)
+    score_total = models.IntegerField(default=0)
+    min_score = models.IntegerField()
+    max_score = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day}: {self.entries} entries"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_mood_rollup_day'),
+        ]
 
 class Connection(models.Model):
     STATUS_CHOICES = (
@@ -207,24 +373,67 @@ class Connection(models.Model):
         unique_together = ('client', 'professional')
         ordering = ['-created_at']
 
+class Conversation(models.Model):
+    # Canonical pair key: user_low is always the smaller user id
+    user_low = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey('DirectMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def for_users(cls, user_a_id, user_b_id):
+        low, high = sorted([int(user_a_id), int(user_b_id)])
+        conversation, _ = cls.objects.get_or_create(user_low_id=low, user_high_id=high)
+        return conversation
+
+    def other_user(self, user):
+        return self.user_high if self.user_low_id == user.id else self.user_low
+
+    def __str__(self):
+        return f"Conversation {self.user_low_id} <-> {self.user_high_id}"
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+        indexes = [
+            models.Index(fields=['user_low', '-last_message_at']),
+            models.Index(fields=['user_high', '-last_message_at']),
+        ]
+
 class DirectMessage(models.Model):
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     content = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if self.conversation_id is None:
+            self.conversation = Conversation.for_users(self.sender_id, self.receiver_id)
+        super().save(*args, **kwargs)
+        if is_new:
+            Conversation.objects.filter(pk=self.conversation_id).update(
+                last_message=self, last_message_at=self.created_at
+            )
+
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username}"
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'id']),
+            models.Index(fields=['conversation', 'receiver', 'is_read']),
+        ]
 
 class Payment(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('success', 'Success'),
         ('failed', 'Failed'),
+        ('expired', 'Expired'),
     )
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -232,15 +441,26 @@ class Payment(models.Model):
     email = models.EmailField()
     tx_ref = models.CharField(max_length=100, unique=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    chapa_reference = models.CharField(max_length=100, blank=True, null=True)
+    # Background verification state (see accounts/payment_reconciler.py)
+    verify_attempts = models.IntegerField(default=0)
+    next_verify_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.amount} {self.currency} - {self.status}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_verify_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
 class Withdrawal(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
+        ('processing', 'Processing'),
         ('approved', 'Approved'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
@@ -254,12 +474,80 @@ class Withdrawal(models.Model):
     account_name = models.CharField(max_length=100)
     reference = models.CharField(max_length=100, unique=True, blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Payout worker state (see accounts/payouts.py)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Withdrawal: {self.user.username} - {self.amount} {self.currency}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['status', 'claimed_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
+class LedgerEntry(models.Model):
+    """
+    Append-only record of every change to a professional's balance; credits
+    are positive, debits negative. See accounts/ledger.py.
+    """
+    KIND_CHOICES = (
+        ('earning', 'Earning'),
+        ('withdrawal', 'Withdrawal'),
+        ('refund', 'Withdrawal Refund'),
+        ('adjustment', 'Adjustment'),
+    )
+    professional = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    appointment = models.ForeignKey(Appointment, on_delete=models.SET_NULL, blank=True, null=True, related_name='ledger_entries')
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, blank=True, null=True, related_name='ledger_entries')
+    withdrawal = models.ForeignKey(Withdrawal, on_delete=models.SET_NULL, blank=True, null=True, related_name='ledger_entries')
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Ledger entries are append-only; post a correcting entry instead")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.professional.username}: {self.kind} {self.amount}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['professional', '-created_at', '-id']),
+            models.Index(fields=['professional', 'id']),
+        ]
+        constraints = [
+            # Each source document is booked at most once per kind
+            models.UniqueConstraint(fields=['kind', 'appointment'], condition=models.Q(appointment__isnull=False), name='unique_ledger_appointment'),
+            models.UniqueConstraint(fields=['kind', 'payment'], condition=models.Q(payment__isnull=False), name='unique_ledger_payment'),
+            models.UniqueConstraint(fields=['kind', 'withdrawal'], condition=models.Q(withdrawal__isnull=False), name='unique_ledger_withdrawal'),
+        ]
+
+class BalanceSnapshot(models.Model):
+    """A professional's balance and lifetime earnings up to and including last_entry_id."""
+    professional = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_snapshots')
+    last_entry_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    total_earnings = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.professional.username}: {self.balance} at entry {self.last_entry_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['professional', '-last_entry_id']),
+        ]
+
 class JournalEntry(models.Model):
     ENTRY_TYPE_CHOICES = (
         ('text', 'Text'),
@@ -303,6 +591,12 @@ class ServiceRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Marketplace feed: open requests, optionally one category, newest first
+            models.Index(fields=['status', 'category', '-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['client', '-created_at', '-id']),
+        ]
 
 class ServiceProposal(models.Model):
     STATUS_CHOICES = (
@@ -323,3 +617,22 @@ class ServiceProposal(models.Model):
     class Meta:
         unique_together = ('request', 'professional')
         ordering = ['-created_at']
+
+class StatCounter(models.Model):
+    """Running totals behind the public landing-page stats (see accounts/stats.py)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class SchedulerState(models.Model):
+    """Progress of a background scheduler (see accounts/reminders.py)."""
+    name = models.CharField(max_length=50, primary_key=True)
+    # Everything due up to and including this moment has been handled
+    high_water = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.high_water}"
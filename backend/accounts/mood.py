@@ -0,0 +1,236 @@
+"""
+Mood analytics.
+
+MoodDailyRollup keeps one row per user per day (entries, score total, min,
+max). Every new MoodUpdate is folded into its day by a signal with one
+conditional UPDATE; edits and deletes recompute that single day. Weekly and
+monthly figures and logging streaks are derived from the daily rows with
+NumPy group-bys, so a range read is one indexed scan of at most one row per
+day per user, whatever the logging frequency.
+
+rebuild_rollups() (the `rebuild_mood_rollups` command) recomputes rollups
+from the raw MoodUpdate rows with the same vectorized group-by, for
+backfills and repairs.
+"""
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least, TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import MoodDailyRollup, MoodUpdate
+
+DEFAULT_RANGE_DAYS = 90
+MAX_RANGE_DAYS = 366
+EPOCH = date(1970, 1, 1)
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def add_to_rollup(user_id, day, score):
+    fields = {
+        'entries': F('entries') + 1,
+        'score_total': F('score_total') + score,
+        'min_score': Least('min_score', Value(score)),
+        'max_score': Greatest('max_score', Value(score)),
+        'updated_at': timezone.now(),
+    }
+    if MoodDailyRollup.objects.filter(user_id=user_id, day=day).update(**fields):
+        return
+    try:
+        with transaction.atomic():
+            MoodDailyRollup.objects.create(
+                user_id=user_id, day=day, entries=1, score_total=score, min_score=score, max_score=score
+            )
+    except IntegrityError:
+        # Another request created the day first
+        MoodDailyRollup.objects.filter(user_id=user_id, day=day).update(**fields)
+
+
+def recompute_day(user_id, day):
+    start, end = _day_bounds(day)
+    totals = MoodUpdate.objects.filter(user_id=user_id, created_at__gte=start, created_at__lt=end).aggregate(
+        entries=Count('id'), score_total=Sum('mood_score'), min_score=Min('mood_score'), max_score=Max('mood_score')
+    )
+    if not totals['entries']:
+        MoodDailyRollup.objects.filter(user_id=user_id, day=day).delete()
+        return
+    MoodDailyRollup.objects.update_or_create(user_id=user_id, day=day, defaults=totals)
+
+
+def _group(keys, entries, totals, mins, maxs):
+    """Group parallel arrays by the rows of `keys`; returns the same arrays, one element per distinct key, sorted."""
+    if not len(keys):
+        return keys, entries, totals, mins, maxs
+    order = np.lexsort(keys.T[::-1])
+    keys, entries, totals, mins, maxs = keys[order], entries[order], totals[order], mins[order], maxs[order]
+    starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+    return (
+        keys[starts],
+        np.add.reduceat(entries, starts),
+        np.add.reduceat(totals, starts),
+        np.minimum.reduceat(mins, starts),
+        np.maximum.reduceat(maxs, starts),
+    )
+
+
+def _ordinals(days):
+    return np.array(days, dtype='datetime64[D]').astype(np.int64)
+
+
+def rebuild_rollups(user_ids=None, chunk_size=500):
+    """Recompute rollups from MoodUpdate for the given users (default: everyone); returns rows written."""
+    if user_ids is None:
+        user_ids = MoodUpdate.objects.order_by().values_list('user_id', flat=True).distinct()
+    user_ids = sorted(set(user_ids))
+    written = 0
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        rows = list(
+            MoodUpdate.objects.filter(user_id__in=chunk).order_by()
+            .annotate(day=TruncDate('created_at')).values_list('user_id', 'day', 'mood_score')
+        )
+        if rows:
+            users, days, scores = zip(*rows)
+            keys = np.column_stack([np.array(users, dtype=np.int64), _ordinals(days)])
+            scores = np.array(scores, dtype=np.int64)
+            keys, entries, totals, mins, maxs = _group(keys, np.ones_like(scores), scores, scores, scores)
+        else:
+            keys = np.empty((0, 2), dtype=np.int64)
+        rollups = [
+            MoodDailyRollup(
+                user_id=int(user_id), day=EPOCH + timedelta(days=int(day)), entries=int(entries[i]),
+                score_total=int(totals[i]), min_score=int(mins[i]), max_score=int(maxs[i])
+            )
+            for i, (user_id, day) in enumerate(keys)
+        ]
+        with transaction.atomic():
+            MoodDailyRollup.objects.filter(user_id__in=chunk).delete()
+            MoodDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+        written += len(rollups)
+    return written
+
+
+def date_range(params, today=None):
+    """
+    Parse ?start= and ?end= (ISO dates, inclusive); defaults to the last
+    DEFAULT_RANGE_DAYS days. Raises ValueError with a user-facing message.
+    """
+    today = today or timezone.localdate()
+    try:
+        end = date.fromisoformat(params['end']) if params.get('end') else today
+        start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format')
+    if start > end:
+        raise ValueError('start must not be after end')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'The range can cover at most {MAX_RANGE_DAYS} days')
+    return start, end
+
+
+def _series(periods, entries, totals, mins, maxs, label):
+    return [
+        {
+            'period': label(int(period)),
+            'average': round(float(totals[i]) / int(entries[i]), 2),
+            'min': int(mins[i]),
+            'max': int(maxs[i]),
+            'entries': int(entries[i]),
+        }
+        for i, period in enumerate(periods)
+    ]
+
+
+def _streaks(days, end):
+    """Longest run of consecutive logged days, and the run still going at `end` (logged that day or the day before)."""
+    if not len(days):
+        return {'current': 0, 'longest': 0}
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    runs = np.diff(np.r_[-1, breaks, len(days) - 1])
+    current = int(runs[-1]) if days[-1] >= end - 1 else 0
+    return {'current': current, 'longest': int(runs.max())}
+
+
+def _day_label(ordinal):
+    return (EPOCH + timedelta(days=ordinal)).isoformat()
+
+
+def _month_label(ordinal):
+    return str(np.datetime64(ordinal, 'M'))
+
+
+def _per_user(users):
+    """(user_id, slice) for each run of equal ids in a sorted array."""
+    firsts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    lasts = np.r_[firsts[1:], len(users)]
+    return [(int(users[first]), slice(first, last)) for first, last in zip(firsts, lasts)]
+
+
+def analytics(user_ids, start, end):
+    """Daily, weekly and monthly mood statistics and streaks for each user, from one rollup query."""
+    result = {
+        user_id: {
+            'daily': [], 'weekly': [], 'monthly': [],
+            'overall': {'average': None, 'min': None, 'max': None, 'entries': 0, 'days_logged': 0},
+            'streaks': {'current': 0, 'longest': 0},
+        }
+        for user_id in user_ids
+    }
+    rows = list(
+        MoodDailyRollup.objects.filter(user_id__in=user_ids, day__gte=start, day__lte=end)
+        .order_by('user_id', 'day')
+        .values_list('user_id', 'day', 'entries', 'score_total', 'min_score', 'max_score')
+    )
+    if not rows:
+        return result
+
+    users, days, entries, totals, mins, maxs = zip(*rows)
+    users, entries, totals, mins, maxs = (np.array(a, dtype=np.int64) for a in (users, entries, totals, mins, maxs))
+    days = _ordinals(days)
+    # 1970-01-01 was a Thursday: shift by three to land on the Monday of each week
+    weeks = days - (days + 3) % 7
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    end_ordinal = (end - EPOCH).days
+
+    for user_id, span in _per_user(users):
+        stats = result[user_id]
+        stats['daily'] = _series(days[span], entries[span], totals[span], mins[span], maxs[span], _day_label)
+        stats['streaks'] = _streaks(days[span], end_ordinal)
+        total_entries = int(entries[span].sum())
+        stats['overall'] = {
+            'average': round(float(totals[span].sum()) / total_entries, 2),
+            'min': int(mins[span].min()),
+            'max': int(maxs[span].max()),
+            'entries': total_entries,
+            'days_logged': int(span.stop - span.start),
+        }
+
+    for name, periods, label in (('weekly', weeks, _day_label), ('monthly', months, _month_label)):
+        keys, p_entries, p_totals, p_mins, p_maxs = _group(np.column_stack([users, periods]), entries, totals, mins, maxs)
+        for user_id, span in _per_user(keys[:, 0]):
+            result[user_id][name] = _series(keys[span, 1], p_entries[span], p_totals[span], p_mins[span], p_maxs[span], label)
+    return result
+
+
+@receiver(post_save, sender=MoodUpdate)
+def roll_up_mood(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    day = timezone.localdate(instance.created_at)
+    if created:
+        add_to_rollup(instance.user_id, day, instance.mood_score)
+    else:
+        recompute_day(instance.user_id, day)
+
+
+@receiver(post_delete, sender=MoodUpdate)
+def unroll_mood(sender, instance, **kwargs):
+    recompute_day(instance.user_id, timezone.localdate(instance.created_at))
@@ -0,0 +1,66 @@
+"""
+Unread notification counter.
+
+The count for each user lives in the cache and is adjusted as notifications
+are created and read, so the unread badge never runs COUNT(*) over the
+notifications table. A missing key (first read, cache eviction, expiry) is
+seeded from one indexed COUNT; the short TTL bounds how long any drift can
+last.
+
+The counter needs a cache every worker shares (REDIS_URL). With the
+per-process local-memory cache, one worker would never see another's
+adjustments, so the badge reads the indexed COUNT instead.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .caches import cache_is_shared
+from .models import Notification
+
+COUNTER_TTL = 60 * 5
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def unread_count(user_id):
+    if not cache_is_shared():
+        return Notification.objects.filter(user_id=user_id, is_read=False).count()
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(_key(user_id), count, COUNTER_TTL)
+    return count
+
+
+def adjust_unread(user_id, delta):
+    """Apply delta to the cached count once the current transaction commits."""
+    def _apply():
+        try:
+            if cache.incr(_key(user_id), delta) < 0:
+                cache.delete(_key(user_id))
+        except ValueError:
+            # Not cached; the next read seeds it from the table
+            pass
+
+    if delta and cache_is_shared():
+        transaction.on_commit(_apply)
+
+
+def mark_read(user, ids=None):
+    """Mark the user's notifications (all, or just `ids`) read in one UPDATE."""
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    updated = notifications.update(is_read=True)
+    adjust_unread(user.id, -updated)
+    return updated
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        adjust_unread(instance.user_id, 1)
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    def _plain(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+    raw = json.dumps([_plain(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    if not isinstance(values, list) or len(values) != size:
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    return values
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(request.query_params.get('limit', default))
+    except (TypeError, ValueError):
+        raise ValidationError({'limit': 'Must be an integer.'})
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_filter(ordering, values):
+    """
+    Q matching the rows that come strictly after `values` in `ordering`
+    (e.g. ['-created_at', '-id']), i.e. a row-value comparison that the
+    database can answer from a composite index.
+    """
+    condition = Q()
+    for position in range(len(ordering) - 1, -1, -1):
+        field = ordering[position].lstrip('-')
+        lookup = 'lt' if ordering[position].startswith('-') else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        if position < len(ordering) - 1:
+            step |= Q(**{field: values[position]}) & condition
+        condition = step
+    return condition
+
+
+def cursor_values(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return (items, next_cursor) for one page of `queryset` in `ordering`.
+    The last ordering field must be unique (normally the primary key).
+    """
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, len(ordering))))
+    items = list(queryset.order_by(*ordering)[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(cursor_values(items[-1], ordering))
+    return items, next_cursor
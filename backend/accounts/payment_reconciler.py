@@ -0,0 +1,186 @@
+"""
+Background verification of pending Chapa payments.
+
+reconcile_payments() (the `reconcile_payments` command) expires payments
+that stayed pending past PAYMENT_VERIFY_MAX_AGE, then verifies the ones
+that are due against Chapa concurrently, at most PAYMENT_VERIFY_CONCURRENCY
+requests at a time. A payment Chapa still reports as pending, or that could
+not be checked, is retried with exponential backoff.
+
+Chapa calls go through the shared gateway client (accounts/chapa.py), run
+in worker threads so they overlap.
+
+Every final status change is announced after commit: a short-lived cache
+key that VerifyPaymentView long-polls when the cache is shared between
+processes (REDIS_URL), and a `payment.updated` real-time event for the owner.
+
+Without CHAPA_SECRET_KEY payments are only treated as paid under DEBUG
+(local development); otherwise they are left pending and an error is
+printed on every run.
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .caches import cache_is_shared
+from .chapa import ChapaError, chapa
+from .models import Payment
+from .realtime import publish
+
+BASE_BACKOFF = 5
+MAX_BACKOFF = 600
+STATUS_EVENT_TTL = 60 * 60
+
+
+def chapa_key():
+    key = getattr(settings, 'CHAPA_SECRET_KEY', None) or ''
+    return key.strip().strip('"').strip("'")
+
+
+def mock_payments():
+    """True when payments should be treated as paid: no Chapa key, and only under DEBUG."""
+    return not chapa_key() and settings.DEBUG
+
+
+def interpret(body):
+    """Map a Chapa verify response to (status, reference); status None means not settled yet."""
+    details = body.get('data') or {}
+    if body.get('status') == 'success':
+        outcome = details.get('status', 'success')
+        if outcome == 'success':
+            return 'success', details.get('reference')
+        if outcome in ('failed', 'cancelled'):
+            return 'failed', details.get('reference')
+        return None, None
+    # "Payment not found" usually means the customer has not finished checkout yet
+    if body.get('message') == 'Payment not found' or body.get('status') == 'pending':
+        return None, None
+    return 'failed', None
+
+
+def _status_key(tx_ref):
+    return f"payment_status:{tx_ref}"
+
+
+def _announce(payments, status):
+    transaction.on_commit(lambda: cache.set_many(
+        {_status_key(tx_ref): status for tx_ref, _ in payments}, STATUS_EVENT_TTL
+    ))
+    for tx_ref, user_id in payments:
+        publish([user_id], 'payment.updated', {'tx_ref': tx_ref, 'status': status})
+
+
+def settle(payment, status, reference=None):
+    """Move a pending payment to a final status. Returns False if it had already left pending."""
+    updated = Payment.objects.filter(id=payment.id, status='pending').update(
+        status=status,
+        chapa_reference=reference or payment.chapa_reference,
+        next_verify_at=None,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        _announce([(payment.tx_ref, payment.user_id)], status)
+    return bool(updated)
+
+
+def defer(payment, now=None):
+    now = now or timezone.now()
+    delay = min(BASE_BACKOFF * 2 ** payment.verify_attempts, MAX_BACKOFF)
+    Payment.objects.filter(id=payment.id, status='pending').update(
+        verify_attempts=F('verify_attempts') + 1,
+        next_verify_at=now + timedelta(seconds=delay),
+    )
+
+
+def expire_stale_payments(now=None):
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.PAYMENT_VERIFY_MAX_AGE)
+    stale = list(
+        Payment.objects.filter(status='pending', created_at__lt=cutoff).values_list('id', 'tx_ref', 'user_id')
+    )
+    if not stale:
+        return 0
+    with transaction.atomic():
+        expired = Payment.objects.filter(
+            id__in=[payment_id for payment_id, _, _ in stale], status='pending'
+        ).update(status='expired', next_verify_at=None, updated_at=now)
+        _announce([(tx_ref, user_id) for _, tx_ref, user_id in stale], 'expired')
+    return expired
+
+
+def due_payments(now=None, limit=100):
+    now = now or timezone.now()
+    return list(
+        Payment.objects.filter(
+            status='pending',
+            created_at__lte=now - timedelta(seconds=settings.PAYMENT_VERIFY_MIN_AGE)
+        )
+        .filter(Q(next_verify_at__isnull=True) | Q(next_verify_at__lte=now))
+        .order_by('created_at')[:limit]
+    )
+
+
+async def _verify(semaphore, payment):
+    async with semaphore:
+        try:
+            status, reference = interpret(await asyncio.to_thread(chapa.verify, payment.tx_ref))
+        except ChapaError as e:
+            print(f"Payment verification error for {payment.tx_ref}: {e}")
+            status, reference = None, None
+    if status:
+        await sync_to_async(settle)(payment, status, reference)
+    else:
+        await sync_to_async(defer)(payment)
+    return status or 'pending'
+
+
+async def verify_payments(payments, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(_verify(semaphore, payment) for payment in payments))
+
+
+def reconcile_payments(batch_size=100, concurrency=None):
+    now = timezone.now()
+    expired = expire_stale_payments(now)
+    payments = due_payments(now, batch_size)
+    if not payments:
+        outcomes = []
+    elif mock_payments():
+        outcomes = ['success' if settle(payment, 'success') else 'pending' for payment in payments]
+    elif not chapa_key():
+        print(f"Error: CHAPA_SECRET_KEY is not set; {len(payments)} pending payments left unverified")
+        outcomes = ['pending'] * len(payments)
+    else:
+        outcomes = asyncio.run(verify_payments(payments, concurrency or settings.PAYMENT_VERIFY_CONCURRENCY))
+    return {
+        'expired': expired,
+        'checked': len(payments),
+        'success': outcomes.count('success'),
+        'failed': outcomes.count('failed'),
+        'pending': outcomes.count('pending'),
+    }
+
+
+def wait_for_status_change(tx_ref, timeout, interval=0.5):
+    """
+    Block until tx_ref leaves pending or timeout passes; returns the final
+    status or None. Watches the announcement key when the cache is shared,
+    otherwise polls the payment row (less often).
+    """
+    shared = cache_is_shared()
+    deadline = time.monotonic() + timeout
+    while True:
+        if shared:
+            status = cache.get(_status_key(tx_ref))
+        else:
+            status = Payment.objects.filter(tx_ref=tx_ref).exclude(status='pending').values_list('status', flat=True).first()
+        if status is not None or time.monotonic() >= deadline:
+            return status
+        time.sleep(interval if shared else interval * 2)
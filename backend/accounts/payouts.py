@@ -0,0 +1,192 @@
+"""
+Payout pipeline for professional withdrawals.
+
+The request path only touches the database: request_withdrawal() reserves
+the funds with one conditional UPDATE (balance >= amount) and queues a
+pending Withdrawal in the same transaction, so concurrent requests can
+never overdraw a balance. The reservation and any refund are booked in
+the earnings ledger (accounts/ledger.py) in the same transaction.
+
+process_payouts() (the `process_payouts` command) does the Chapa work:
+
+* pending -> processing: rows are claimed with a conditional UPDATE, so
+  several workers never send the same transfer.
+* A transfer Chapa accepts becomes approved; one it rejects fails and
+  the reserved amount is refunded.
+* When Chapa cannot be reached the outcome is unknown. The row goes back
+  to pending with backoff, and every retry first asks Chapa whether the
+  reference already exists before sending it again.
+* Claims left behind by a crashed worker are released after
+  PAYOUT_CLAIM_TIMEOUT. Approved transfers are checked until Chapa
+  reports them completed or failed.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import ledger
+from .chapa import ChapaError, chapa
+from .models import ProfessionalProfile, Withdrawal
+
+BASE_BACKOFF = 30
+MAX_BACKOFF = 60 * 30
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def request_withdrawal(user, amount, bank_code, bank_name, account_number, account_name):
+    with transaction.atomic():
+        reserved = ProfessionalProfile.objects.filter(user=user, balance__gte=amount).update(
+            balance=F('balance') - amount
+        )
+        if not reserved:
+            raise InsufficientFunds()
+        withdrawal = Withdrawal.objects.create(
+            user=user,
+            amount=amount,
+            bank_name=bank_name,
+            bank_code=bank_code,
+            account_number=account_number,
+            account_name=account_name,
+            reference=f"wd-{uuid.uuid4()}",
+            status='pending'
+        )
+        ledger.record(user.id, 'withdrawal', -amount, f"Withdrawal to {bank_name}", withdrawal=withdrawal)
+        return withdrawal
+
+
+def _transition(withdrawal, from_status, to_status, **fields):
+    return Withdrawal.objects.filter(id=withdrawal.id, status=from_status).update(
+        status=to_status, updated_at=timezone.now(), **fields
+    )
+
+
+def fail_and_refund(withdrawal, from_status, error):
+    """Mark the withdrawal failed and give the reserved amount back, exactly once."""
+    with transaction.atomic():
+        if _transition(withdrawal, from_status, 'failed', claimed_at=None, last_error=error):
+            ProfessionalProfile.objects.filter(user_id=withdrawal.user_id).update(
+                balance=F('balance') + withdrawal.amount
+            )
+            ledger.record(withdrawal.user_id, 'refund', withdrawal.amount, error[:255], withdrawal=withdrawal)
+            return True
+    return False
+
+
+def _retry_later(withdrawal, error):
+    delay = min(BASE_BACKOFF * 2 ** withdrawal.attempts, MAX_BACKOFF)
+    _transition(
+        withdrawal, 'processing', 'pending',
+        attempts=F('attempts') + 1,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        claimed_at=None,
+        last_error=error,
+    )
+
+
+def transfer_status(reference):
+    """What Chapa knows about a transfer: 'success', 'failed', 'pending', 'missing' or None if unknown."""
+    data = chapa.verify_transfer(reference)
+    if data.get('status') == 'success':
+        details = data.get('data') or {}
+        return details.get('status') if details.get('status') in ('success', 'failed', 'pending') else 'pending'
+    if 'not found' in str(data.get('message', '')).lower():
+        return 'missing'
+    return None
+
+
+def _send(withdrawal):
+    data = chapa.transfer({
+        "account_name": withdrawal.account_name,
+        "account_number": withdrawal.account_number,
+        "amount": float(withdrawal.amount),
+        "currency": withdrawal.currency,
+        "reference": withdrawal.reference,
+        "bank_code": withdrawal.bank_code,
+    })
+    if data.get('status') == 'success' or 'success' in str(data.get('message', '')).lower():
+        _transition(withdrawal, 'processing', 'approved', claimed_at=None, last_error=None)
+        return 'approved'
+    fail_and_refund(withdrawal, 'processing', str(data.get('message', 'Transfer rejected')))
+    return 'failed'
+
+
+def process_withdrawal(withdrawal):
+    """Run one claimed withdrawal against Chapa; returns its new status."""
+    try:
+        if withdrawal.attempts:
+            # An earlier attempt may have reached Chapa; never send the same reference twice
+            known = transfer_status(withdrawal.reference)
+            if known in ('success', 'pending'):
+                _transition(withdrawal, 'processing', 'approved', claimed_at=None, last_error=None)
+                return 'approved'
+            if known == 'failed':
+                fail_and_refund(withdrawal, 'processing', 'Transfer failed at Chapa')
+                return 'failed'
+            if known is None:
+                _retry_later(withdrawal, 'Transfer status unknown')
+                return 'pending'
+            if withdrawal.attempts >= settings.PAYOUT_MAX_ATTEMPTS:
+                fail_and_refund(withdrawal, 'processing', withdrawal.last_error or 'Transfer could not be sent')
+                return 'failed'
+        return _send(withdrawal)
+    except ChapaError as e:
+        print(f"Payout {withdrawal.reference} will be retried: {e}")
+        _retry_later(withdrawal, str(e))
+        return 'pending'
+
+
+def release_stale_claims(now=None):
+    """Return rows whose worker died mid-transfer to the queue (they are verified before resending)."""
+    now = now or timezone.now()
+    return Withdrawal.objects.filter(
+        status='processing',
+        claimed_at__lt=now - timedelta(seconds=settings.PAYOUT_CLAIM_TIMEOUT)
+    ).update(status='pending', attempts=F('attempts') + 1, claimed_at=None, next_attempt_at=now)
+
+
+def confirm_approved(limit=100):
+    """Move approved transfers to completed (or failed + refunded) once Chapa settles them."""
+    settled = 0
+    for withdrawal in Withdrawal.objects.filter(status='approved').order_by('updated_at')[:limit]:
+        try:
+            known = transfer_status(withdrawal.reference)
+        except ChapaError:
+            break
+        if known == 'success':
+            settled += _transition(withdrawal, 'approved', 'completed')
+        elif known == 'failed':
+            settled += fail_and_refund(withdrawal, 'approved', 'Transfer failed at Chapa')
+    return settled
+
+
+def process_payouts(batch_size=20):
+    now = timezone.now()
+    released = release_stale_claims(now)
+    due = list(
+        Withdrawal.objects.filter(status='pending')
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        .order_by('created_at')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    outcomes = []
+    for withdrawal_id in due:
+        claimed = Withdrawal.objects.filter(id=withdrawal_id, status='pending').update(
+            status='processing', claimed_at=timezone.now()
+        )
+        if claimed:
+            outcomes.append(process_withdrawal(Withdrawal.objects.get(id=withdrawal_id)))
+    return {
+        'released': released,
+        'processed': len(outcomes),
+        'approved': outcomes.count('approved'),
+        'failed': outcomes.count('failed'),
+        'retrying': outcomes.count('pending'),
+        'completed': confirm_approved(),
+    }
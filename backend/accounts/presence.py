@@ -0,0 +1,66 @@
+"""
+Heartbeat-based presence for professionals.
+
+A professional is online while their heartbeat key is alive in the shared
+cache (settings.CACHES, Redis when REDIS_URL is set). Reads never touch the
+database. ProfessionalProfile.is_online is kept as a mirror for filtering:
+it is written with a single-column UPDATE only when a user goes online or
+offline, and heartbeats that lapse are flipped back in batches by
+sync_presence() (the `sync_presence` management command).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ProfessionalProfile
+
+SYNC_BATCH_SIZE = 500
+
+
+def _key(user_id):
+    return f"presence:{user_id}"
+
+
+def heartbeat(user_id):
+    """Mark user_id online for another PRESENCE_TTL seconds."""
+    now = int(time.time())
+    # add() only succeeds when the key was missing, i.e. on an offline -> online transition
+    if cache.add(_key(user_id), now, settings.PRESENCE_TTL):
+        ProfessionalProfile.objects.filter(user_id=user_id, is_online=False).update(is_online=True)
+    else:
+        cache.set(_key(user_id), now, settings.PRESENCE_TTL)
+
+
+def go_offline(user_id):
+    cache.delete(_key(user_id))
+    ProfessionalProfile.objects.filter(user_id=user_id, is_online=True).update(is_online=False)
+
+
+def is_online(user_id):
+    return cache.get(_key(user_id)) is not None
+
+
+def online_among(user_ids):
+    """Return the subset of user_ids with a live heartbeat, in one cache round trip."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+    found = cache.get_many([_key(user_id) for user_id in user_ids])
+    return {user_id for user_id in user_ids if _key(user_id) in found}
+
+
+def sync_presence():
+    """Flip profiles whose heartbeat has lapsed to offline; returns how many changed."""
+    marked_online = list(
+        ProfessionalProfile.objects.filter(is_online=True).values_list('user_id', flat=True)
+    )
+    changed = 0
+    for start in range(0, len(marked_online), SYNC_BATCH_SIZE):
+        batch = marked_online[start:start + SYNC_BATCH_SIZE]
+        lapsed = set(batch) - online_among(batch)
+        if lapsed:
+            changed += ProfessionalProfile.objects.filter(
+                user_id__in=lapsed, is_online=True
+            ).update(is_online=False)
+    return changed
@@ -0,0 +1,194 @@
+"""
+Real-time push to connected clients over a plain ASGI WebSocket.
+
+Clients connect to /ws/events/?token=<SimpleJWT access token> and receive
+JSON frames of the form {"type": "...", "data": {...}} for their own
+notifications, direct messages, connections and appointments.
+
+Events go through a pluggable backend (settings.REALTIME_BACKEND). The
+default InProcessBackend only reaches sockets held by the same process; a
+multi-node deployment swaps in a backend with the same publish/subscribe/
+unsubscribe interface (e.g. one built on Redis pub/sub).
+"""
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Appointment, Connection, DirectMessage, Notification
+
+WEBSOCKET_PATH = '/ws/events/'
+
+
+class InProcessBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        """Register the calling event loop for user_id; returns its queue."""
+        queue = asyncio.Queue(maxsize=settings.REALTIME_QUEUE_SIZE)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            entries = self._subscribers.get(user_id, set())
+            entries.difference_update({entry for entry in entries if entry[1] is queue})
+            if not entries:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, event):
+        # Safe to call from any thread
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Loop already closed; the socket is going away
+                pass
+
+
+def _offer(queue, event):
+    # Slow consumers lose events rather than growing memory without bound
+    if not queue.full():
+        queue.put_nowait(event)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.REALTIME_BACKEND)()
+    return _backend
+
+
+def publish(user_ids, event_type, data):
+    """Send an event to users once the current transaction commits."""
+    event = json.dumps({'type': event_type, 'data': data}, cls=DjangoJSONEncoder)
+
+    def _send():
+        backend = get_backend()
+        for user_id in set(user_ids):
+            backend.publish(user_id, event)
+
+    transaction.on_commit(_send)
+
+
+# Signal receivers
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        from .serializers import NotificationSerializer
+        publish([instance.user_id], 'notification.created', NotificationSerializer(instance).data)
+
+
+@receiver(post_save, sender=DirectMessage)
+def push_direct_message(sender, instance, created, **kwargs):
+    if created:
+        from .serializers import DirectMessageSerializer
+        publish(
+            [instance.sender_id, instance.receiver_id],
+            'message.created',
+            DirectMessageSerializer(instance).data
+        )
+
+
+@receiver(post_init, sender=Connection)
+@receiver(post_init, sender=Appointment)
+def remember_status(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred status field is not fetched here
+    instance._initial_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Connection)
+def push_connection_status(sender, instance, created, **kwargs):
+    if created or instance.status != instance._initial_status:
+        instance._initial_status = instance.status
+        publish([instance.client_id, instance.professional_id], 'connection.updated', {
+            'id': instance.id,
+            'client': instance.client_id,
+            'professional': instance.professional_id,
+            'status': instance.status,
+        })
+
+
+@receiver(post_save, sender=Appointment)
+def push_appointment_status(sender, instance, created, **kwargs):
+    if created or instance.status != instance._initial_status:
+        instance._initial_status = instance.status
+        publish([instance.client_id, instance.professional_id], 'appointment.updated', {
+            'id': instance.id,
+            'client': instance.client_id,
+            'professional': instance.professional_id,
+            'date': instance.date,
+            'time': instance.time,
+            'status': instance.status,
+        })
+
+
+# ASGI WebSocket endpoint
+
+@sync_to_async
+def _authenticate(raw_token):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return None
+
+
+async def websocket_application(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    user = await _authenticate(token) if token else None
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    await send({'type': 'websocket.accept'})
+    backend = get_backend()
+    queue = backend.subscribe(user.id)
+
+    async def forward_events():
+        while True:
+            await send({'type': 'websocket.send', 'text': await queue.get()})
+
+    forwarder = asyncio.create_task(forward_events())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message.get('text') == 'ping':
+                await send({'type': 'websocket.send', 'text': 'pong'})
+    finally:
+        forwarder.cancel()
+        backend.unsubscribe(user.id, queue)
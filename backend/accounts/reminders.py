@@ -0,0 +1,218 @@
+"""
+Appointment reminders.
+
+Every active appointment gets a reminder Notification, for both client and
+professional, at each of settings.APPOINTMENT_REMINDER_OFFSETS minutes
+before it starts.
+
+A ReminderScheduler keeps a heap of upcoming reminder times. It loads them
+LOAD_WINDOW at a time with one range scan over (status, start_at), so the
+appointments table is never read as a whole. Its thread sleeps until the
+earliest entry is due, or at most MAX_SLEEP seconds. Bookings made in the
+same process are pushed onto the heap as they commit.
+
+Sending is claimed through the SchedulerState high-water mark. A tick
+advances the mark from the value it read to now with a conditional UPDATE.
+In the same transaction it bulk-creates the Notifications for every
+reminder due in between. Reminders booked in other processes are therefore
+sent by the next tick of any worker. A worker that loses the race updates
+nothing and sends nothing, so several gunicorn workers and the
+`send_reminders` command can run side by side. After a restart the first
+tick catches up from the persisted mark; only the reminder closest to the
+start is sent for each appointment. A reminder whose moment had already
+passed when its appointment was booked or moved is skipped.
+
+Set APPOINTMENT_REMINDERS_IN_PROCESS to start the scheduler in each web
+worker on its first request. Otherwise run `manage.py send_reminders
+--interval N` as a separate process.
+"""
+import heapq
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import notifications, realtime
+from .appointment_sweeper import ACTIVE_STATUSES
+from .models import Appointment, Notification, SchedulerState
+
+STATE_NAME = 'appointment_reminders'
+LOAD_WINDOW = timedelta(minutes=15)
+MAX_SLEEP = 60
+
+
+def _offsets():
+    return [timedelta(minutes=minutes) for minutes in settings.APPOINTMENT_REMINDER_OFFSETS]
+
+
+def _due_between(after, until):
+    """Active appointments with a reminder due in (after, until]."""
+    window = Q()
+    for offset in _offsets():
+        window |= Q(start_at__gt=after + offset, start_at__lte=until + offset)
+    return Appointment.objects.filter(window, status__in=ACTIVE_STATUSES)
+
+
+def _starts_in(remaining):
+    minutes = max(1, round(remaining.total_seconds() / 60))
+    if minutes < 60:
+        return f"{minutes} minute{'s' if minutes != 1 else ''}"
+    hours = round(minutes / 60)
+    return f"{hours} hour{'s' if hours != 1 else ''}"
+
+
+def _reminder_notifications(appointment, now):
+    starts_in = _starts_in(appointment.start_at - now)
+    return [
+        Notification(
+            user_id=appointment.client_id,
+            title="Upcoming session",
+            message=f"Your {appointment.session_type} session with {appointment.professional.username} starts in {starts_in}.",
+            type='appointment_reminder',
+            link='/schedule',
+        ),
+        Notification(
+            user_id=appointment.professional_id,
+            title="Upcoming session",
+            message=f"Your {appointment.session_type} session with {appointment.client.username} starts in {starts_in}.",
+            type='appointment_reminder',
+            link='/professional/schedule',
+        ),
+    ]
+
+
+def _announce(created):
+    # bulk_create skips post_save, so do what the notification receivers would
+    from .serializers import NotificationSerializer
+
+    for user_id, count in Counter(notification.user_id for notification in created).items():
+        notifications.adjust_unread(user_id, count)
+    for notification in created:
+        realtime.publish([notification.user_id], 'notification.created', NotificationSerializer(notification).data)
+
+
+def send_due(now=None):
+    """
+    Send every reminder due since the high-water mark, up to now. Returns
+    the number of notifications created (0 if another worker claimed them).
+    """
+    now = now or timezone.now()
+    state, _ = SchedulerState.objects.get_or_create(name=STATE_NAME, defaults={'high_water': now})
+    # Reminders due before this belong to appointments that have already started
+    after = max(state.high_water, now - max(_offsets(), default=timedelta(0)))
+    if after >= now:
+        return 0
+
+    with transaction.atomic():
+        claimed = SchedulerState.objects.filter(name=STATE_NAME, high_water=state.high_water).update(high_water=now)
+        if not claimed:
+            return 0
+        appointments = (
+            _due_between(after, now).filter(start_at__gt=now)
+            .select_related('client', 'professional')
+            .only('start_at', 'session_type', 'client__username', 'professional__username')
+        )
+        # One reminder per appointment, even when a catch-up covers several offsets
+        created = Notification.objects.bulk_create(
+            [notification for appointment in appointments for notification in _reminder_notifications(appointment, now)],
+            batch_size=500,
+        )
+        _announce(created)
+    return len(created)
+
+
+class ReminderScheduler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._heap = []
+        self._loaded_until = None
+        self._thread = None
+
+    def push(self, due_at, appointment_id):
+        with self._lock:
+            # Reminders past the loaded window are picked up by the next load
+            if self._loaded_until is not None and due_at <= self._loaded_until:
+                heapq.heappush(self._heap, (due_at, appointment_id))
+                self._wakeup.set()
+
+    def load(self, now):
+        """Queue the reminders due between the end of the loaded window and now + LOAD_WINDOW."""
+        after = self._loaded_until or now
+        until = now + LOAD_WINDOW
+        if until <= after:
+            return
+        rows = list(_due_between(after, until).values_list('id', 'start_at'))
+        with self._lock:
+            for appointment_id, start_at in rows:
+                for offset in _offsets():
+                    if after < start_at - offset <= until:
+                        heapq.heappush(self._heap, (start_at - offset, appointment_id))
+            self._loaded_until = until
+
+    def tick(self, now=None, max_sleep=MAX_SLEEP):
+        """Load ahead and send what is due; returns (notifications sent, seconds until the next tick)."""
+        now = now or timezone.now()
+        self.load(now)
+        sent = send_due(now)
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+            next_due = self._heap[0][0] if self._heap else None
+        if next_due is None:
+            return sent, max_sleep
+        return sent, min(max((next_due - now).total_seconds(), 0), max_sleep)
+
+    def run(self):
+        while True:
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                _, delay = self.tick()
+            except Exception as e:
+                # Keep the thread alive through database outages
+                print(f"Reminder scheduler tick failed: {e}")
+                delay = MAX_SLEEP
+            finally:
+                close_old_connections()
+            self._wakeup.wait(delay)
+
+    def start(self):
+        """Start the scheduler thread unless this process already runs it."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            # A forked worker inherits a dead thread object and starts its own
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, name='appointment-reminders', daemon=True)
+                self._thread.start()
+
+
+scheduler = ReminderScheduler()
+
+
+@receiver(post_save, sender=Appointment)
+def queue_reminders(sender, instance, raw=False, **kwargs):
+    if raw or instance.status not in ACTIVE_STATUSES:
+        return
+    appointment_id, start_at = instance.id, instance.start_at
+
+    def _push():
+        for offset in _offsets():
+            scheduler.push(start_at - offset, appointment_id)
+
+    transaction.on_commit(_push)
+
+
+@receiver(request_started)
+def start_scheduler(sender, **kwargs):
+    # Started on a request rather than at import so it runs in each forked worker
+    if settings.APPOINTMENT_REMINDERS_IN_PROCESS:
+        scheduler.start()
@@ -0,0 +1,158 @@
+"""
+Ranked, typo-tolerant search over professionals.
+
+ProfessionalSearchDocument holds the searchable text (name, specialization,
+bio) and is refreshed row by row when a profile is saved. Matching and
+ranking run inside the database against the index created by migration
+0029_professionalsearchdocument:
+
+* Postgres: a weighted, generated tsvector column with a GIN index, plus
+  pg_trgm indexes on name and specialization for misspelled names.
+* SQLite: an external-content FTS5 table kept in sync by triggers, ranked
+  with bm25(). Misspelled terms are expanded to close index terms read
+  from an fts5vocab table.
+
+Results are paged with a (score, profile id) keyset cursor.
+"""
+import difflib
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ProfessionalProfile, ProfessionalSearchDocument
+from .pagination import decode_cursor, encode_cursor
+
+DOCUMENT_TABLE = 'accounts_professionalsearchdocument'
+FTS_TABLE = 'accounts_professionalsearch_fts'
+VOCAB_TABLE = 'accounts_professionalsearch_vocab'
+
+MAX_QUERY_TERMS = 8
+# Close index terms tried for each query term on SQLite
+TYPO_CANDIDATES = 3
+
+_term = re.compile(r'\w+')
+
+
+def document_values(profile):
+    user = profile.user
+    return {
+        'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+        'specialization': profile.specialization or '',
+        'bio': profile.bio or '',
+        'verified': profile.verified,
+    }
+
+
+def index_professional(profile):
+    """Bring one profile's search document up to date, writing only if it changed."""
+    values = document_values(profile)
+    changed = (
+        ProfessionalSearchDocument.objects.filter(pk=profile.pk)
+        .exclude(Q(**values))
+        .update(updated_at=timezone.now(), **values)
+    )
+    if not changed:
+        ProfessionalSearchDocument.objects.get_or_create(profile_id=profile.pk, defaults=values)
+
+
+@receiver(post_save, sender=ProfessionalProfile)
+def reindex_professional(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'specialization', 'bio', 'verified'} & set(update_fields):
+        return
+    index_professional(instance)
+
+
+def query_terms(query):
+    return [term.lower() for term in _term.findall(query)][:MAX_QUERY_TERMS]
+
+
+def search_professionals(query, cursor=None, page_size=20, verified_only=True):
+    """
+    Return (profile_ids, next_cursor) for one page of matches, best first.
+    An empty or unsearchable query matches nothing.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], None
+    after = decode_cursor(cursor, 2) if cursor else None
+    if connection.vendor == 'postgresql':
+        rows = _search_postgres(' '.join(terms), after, page_size + 1, verified_only)
+    else:
+        rows = _search_sqlite(terms, after, page_size + 1, verified_only)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1])
+    return [profile_id for _, profile_id in rows], next_cursor
+
+
+def _page_clause(after):
+    if after is None:
+        return '', []
+    return 'WHERE score < %s OR (score = %s AND profile_id < %s)', [after[0], after[0], after[1]]
+
+
+def _search_postgres(text, after, limit, verified_only):
+    page_sql, page_params = _page_clause(after)
+    sql = f"""
+        SELECT score, profile_id FROM (
+            SELECT d.profile_id,
+                   (ts_rank_cd(d.search_vector, q.query) * 2
+                    + GREATEST(word_similarity(%s, d.name), word_similarity(%s, d.specialization)))::float8 AS score
+            FROM {DOCUMENT_TABLE} d, websearch_to_tsquery('english', %s) AS q(query)
+            WHERE (d.search_vector @@ q.query OR %s <%% d.name OR %s <%% d.specialization)
+              {'AND d.verified' if verified_only else ''}
+        ) ranked
+        {page_sql}
+        ORDER BY score DESC, profile_id DESC
+        LIMIT %s
+    """
+    params = [text, text, text, text, text, *page_params, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [list(row) for row in cursor.fetchall()]
+
+
+def _expand_term(cursor, term):
+    """FTS5 expression for one query term: the term as a prefix, or its closest indexed spellings."""
+    expression = f'"{term}"*'
+    if len(term) < 4:
+        return expression
+    # Only index terms sharing the first letter are considered
+    cursor.execute(
+        f"SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s",
+        [term[0], term[0] + '￿']
+    )
+    vocabulary = [row[0] for row in cursor.fetchall()]
+    if any(word.startswith(term) for word in vocabulary):
+        return expression
+    close = difflib.get_close_matches(term, vocabulary, n=TYPO_CANDIDATES, cutoff=0.7)
+    return '(' + ' OR '.join([expression] + [f'"{word}"' for word in close]) + ')'
+
+
+def _search_sqlite(terms, after, limit, verified_only):
+    page_sql, page_params = _page_clause(after)
+    with connection.cursor() as cursor:
+        match = ' AND '.join(_expand_term(cursor, term) for term in terms)
+        sql = f"""
+            SELECT score, profile_id FROM (
+                SELECT d.profile_id AS profile_id,
+                       -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) AS score
+                FROM {FTS_TABLE}
+                JOIN {DOCUMENT_TABLE} d ON d.profile_id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                  {'AND d.verified' if verified_only else ''}
+            )
+            {page_sql}
+            ORDER BY score DESC, profile_id DESC
+            LIMIT %s
+        """
+        cursor.execute(sql, [match, *page_params, limit])
+        return [list(row) for row in cursor.fetchall()]
@@ -1,10 +1,22 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models.manager import BaseManager
 from rest_framework.validators import UniqueValidator
 
 User = get_user_model()
 
 from .models import ClientProfile, ProfessionalProfile, AdminProfile
+from . import presence
+
+
+class PresenceListSerializer(serializers.ListSerializer):
+    """Looks up presence for the whole list at once instead of per user."""
+
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, BaseManager) else data)
+        self.context['online_ids'] = presence.online_among(user.id for user in users)
+        return super().to_representation(users)
+
 
 class UserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(
@@ -50,6 +62,7 @@ class UserSerializer(serializers.ModelSerializer):
                   'rating', 'review_count', 'sessions_completed', 'verified', 'languages', 'is_online',
                   'verification_status', 'rejection_reason', 'rejection_reason_type', 'id_number', 'issuing_authority',
                   'id_number_input', 'issuing_authority_input')
+        list_serializer_class = PresenceListSerializer
 
     def get_rating(self, obj):
         try:
@@ -76,10 +89,12 @@ class UserSerializer(serializers.ModelSerializer):
             return ['English']
 
     def get_is_online(self, obj):
-        try:
-            return obj.professional_profile.is_online
-        except:
+        if obj.role != 'professional':
             return False
+        online_ids = self.context.get('online_ids')
+        if online_ids is None:
+            return presence.is_online(obj.id)
+        return obj.id in online_ids
 
     def get_verification_status(self, obj):
         try:
@@ -313,7 +328,15 @@ class AppointmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Appointment
-        fields = ['id', 'client', 'professional', 'client_name', 'client_image', 'professional_name', 'professional_image', 'date', 'time', 'status', 'session_type', 'notes', 'created_at']
+        fields = ['id', 'client', 'professional', 'client_name', 'client_image', 'professional_name', 'professional_image', 'date', 'time', 'duration_minutes', 'start_at', 'end_at', 'status', 'session_type', 'notes', 'created_at']
+        # The active-pair and overlap rules are enforced by the database; the
+        # views map violations to errors (accounts/availability.py)
+        validators = []
+
+    def validate_duration_minutes(self, value):
+        if not 15 <= value <= 240:
+            raise serializers.ValidationError("Sessions last between 15 and 240 minutes.")
+        return value
 
     def get_client_name(self, obj):
         name = obj.client.get_full_name().strip()
@@ -350,6 +373,36 @@ class MoodUpdateSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'mood_score', 'note', 'created_at']
         read_only_fields = ['user']
 
+from .models import AvailabilityWindow
+
+class AvailabilityWindowSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AvailabilityWindow
+        fields = ['id', 'professional', 'weekday', 'start_time', 'end_time', 'slot_minutes']
+        read_only_fields = ['professional']
+
+    def validate(self, data):
+        weekday = data.get('weekday', getattr(self.instance, 'weekday', None))
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        slot_minutes = data.get('slot_minutes', getattr(self.instance, 'slot_minutes', 60))
+        if not 15 <= slot_minutes <= 240:
+            raise serializers.ValidationError("Slots last between 15 and 240 minutes.")
+        if start_time >= end_time:
+            raise serializers.ValidationError("The window must end after it starts.")
+        minutes = (end_time.hour * 60 + end_time.minute) - (start_time.hour * 60 + start_time.minute)
+        if minutes < slot_minutes:
+            raise serializers.ValidationError("The window is shorter than one slot.")
+        overlapping = AvailabilityWindow.objects.filter(
+            professional=self.context['request'].user, weekday=weekday,
+            start_time__lt=end_time, end_time__gt=start_time,
+        )
+        if self.instance:
+            overlapping = overlapping.exclude(id=self.instance.id)
+        if overlapping.exists():
+            raise serializers.ValidationError("This window overlaps another one on the same day.")
+        return data
+
 from .models import Connection
 
 class ConnectionSerializer(serializers.ModelSerializer):
@@ -369,7 +422,7 @@ class ConnectionSerializer(serializers.ModelSerializer):
         name = obj.professional.get_full_name().strip()
         return name if name else obj.professional.username
 
-from .models import DirectMessage
+from .models import Conversation, DirectMessage
 
 class DirectMessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.SerializerMethodField()
@@ -382,6 +435,18 @@ class DirectMessageSerializer(serializers.ModelSerializer):
     def get_sender_name(self, obj):
         return obj.sender.get_full_name().strip() or obj.sender.username
 
+class ConversationSerializer(serializers.ModelSerializer):
+    other_user = serializers.SerializerMethodField()
+    last_message = DirectMessageSerializer(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'other_user', 'last_message', 'last_message_at', 'unread_count']
+
+    def get_other_user(self, obj):
+        return PublicUserSerializer(obj.other_user(self.context['request'].user)).data
+
 class PaymentSerializer(serializers.ModelSerializer):
     username = serializers.SerializerMethodField()
     class Meta:
@@ -410,6 +475,14 @@ class WithdrawalSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['user', 'status', 'reference', 'created_at', 'updated_at']
 
+from .models import LedgerEntry
+
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LedgerEntry
+        fields = ['id', 'kind', 'amount', 'description', 'appointment', 'payment', 'withdrawal', 'created_at']
+        read_only_fields = fields
+
 from .models import ServiceRequest, ServiceProposal
 
 class ServiceProposalSerializer(serializers.ModelSerializer):
@@ -442,9 +515,13 @@ class ServiceProposalSerializer(serializers.ModelSerializer):
         return None
 
 class ServiceRequestSerializer(serializers.ModelSerializer):
+    """
+    Querysets from views.service_requests_for() annotate proposals_count and
+    prefetch only the proposals the caller may see into visible_proposals.
+    """
     client_name = serializers.SerializerMethodField()
     proposals_count = serializers.SerializerMethodField()
-    proposals = ServiceProposalSerializer(many=True, read_only=True)
+    proposals = serializers.SerializerMethodField()
 
     class Meta:
         model = ServiceRequest
@@ -455,4 +532,12 @@ class ServiceRequestSerializer(serializers.ModelSerializer):
         return obj.client.get_full_name().strip() or obj.client.username
 
     def get_proposals_count(self, obj):
+        if hasattr(obj, 'proposals_count'):
+            return obj.proposals_count
         return obj.proposals.count()
+
+    def get_proposals(self, obj):
+        proposals = getattr(obj, 'visible_proposals', None)
+        if proposals is None:
+            proposals = obj.proposals.select_related('professional__professional_profile')
+        return ServiceProposalSerializer(proposals, many=True, context=self.context).data
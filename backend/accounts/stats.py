@@ -0,0 +1,122 @@
+"""
+Public landing-page counters.
+
+Each counter is a StatCounter row adjusted with an F() expression from model
+signals, in the same transaction as the change it counts. Reads go through
+the cache for STATS_CACHE_TTL seconds. Bulk queryset updates bypass the
+signals, so reconcile_stats() (the `reconcile_stats` command) recomputes the
+true totals and corrects any drift.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Appointment, ProfessionalProfile, StatCounter, User
+
+CACHE_KEY = 'public_stats'
+
+# Counter name -> queryset it mirrors
+SOURCES = {
+    'people_helped': lambda: User.objects.filter(role='client'),
+    'support_sessions': lambda: Appointment.objects.filter(status='completed'),
+    'licensed_experts': lambda: ProfessionalProfile.objects.filter(verification_status='verified'),
+}
+
+
+def bump(name, delta):
+    if delta:
+        StatCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def reconcile_stats():
+    """Recompute every counter from its source; returns {name: drift corrected}."""
+    current = dict(StatCounter.objects.values_list('name', 'value'))
+    drift = {}
+    for name, source in SOURCES.items():
+        actual = source().count()
+        drift[name] = actual - current.get(name, 0)
+        if name not in current or drift[name]:
+            StatCounter.objects.update_or_create(name=name, defaults={'value': actual})
+    cache.delete(CACHE_KEY)
+    return drift
+
+
+def get_stats():
+    """Return (stats, etag), served from the cache when fresh."""
+    cached = cache.get(CACHE_KEY)
+    if cached is not None:
+        return cached
+    values = dict(StatCounter.objects.values_list('name', 'value'))
+    if set(SOURCES) - set(values):
+        reconcile_stats()
+        values = dict(StatCounter.objects.values_list('name', 'value'))
+    stats = {name: values[name] for name in SOURCES}
+    etag = '"%s"' % hashlib.md5(json.dumps(stats, sort_keys=True).encode()).hexdigest()
+    cache.set(CACHE_KEY, (stats, etag), settings.STATS_CACHE_TTL)
+    return stats, etag
+
+
+# Signal receivers. post_init snapshots the counted state so saves can tell
+# whether a row moved into or out of a counter; __dict__ avoids loading
+# deferred fields.
+
+@receiver(post_init, sender=User)
+def remember_role(sender, instance, **kwargs):
+    instance._stats_is_client = instance.__dict__.get('role') == 'client'
+
+
+@receiver(post_init, sender=Appointment)
+def remember_completed(sender, instance, **kwargs):
+    instance._stats_completed = instance.__dict__.get('status') == 'completed'
+
+
+@receiver(post_init, sender=ProfessionalProfile)
+def remember_verified(sender, instance, **kwargs):
+    instance._stats_verified = instance.__dict__.get('verification_status') == 'verified'
+
+
+def _track(instance, attribute, counted, name, created):
+    was_counted = False if created else getattr(instance, attribute)
+    bump(name, int(counted) - int(was_counted))
+    setattr(instance, attribute, counted)
+
+
+@receiver(post_save, sender=User)
+def count_client(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _track(instance, '_stats_is_client', instance.role == 'client', 'people_helped', created)
+
+
+@receiver(post_save, sender=Appointment)
+def count_completed_session(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _track(instance, '_stats_completed', instance.status == 'completed', 'support_sessions', created)
+
+
+@receiver(post_save, sender=ProfessionalProfile)
+def count_licensed_expert(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _track(instance, '_stats_verified', instance.verification_status == 'verified', 'licensed_experts', created)
+
+
+@receiver(post_delete, sender=User)
+def uncount_client(sender, instance, **kwargs):
+    if instance._stats_is_client:
+        bump('people_helped', -1)
+
+
+@receiver(post_delete, sender=Appointment)
+def uncount_completed_session(sender, instance, **kwargs):
+    if instance._stats_completed:
+        bump('support_sessions', -1)
+
+
+@receiver(post_delete, sender=ProfessionalProfile)
+def uncount_licensed_expert(sender, instance, **kwargs):
+    if instance._stats_verified:
+        bump('licensed_experts', -1)
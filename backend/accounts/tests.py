@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import numpy as np
+import requests
+from PIL import Image
+from asgiref.sync import sync_to_async
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import ai_context, bank_catalog, ledger, matching, mood, notifications, payment_reconciler, presence, realtime, reminders, stats
+from .ai import AIServiceBusy, ModelCallGate, build_request, can_stream
+from .ai_cache import ResponseCache, normalize_prompt, response_cache
+from .appointment_sweeper import sweep_appointments
+from .availability import SlotUnavailable, guarded
+from .chapa import ChapaClient, ChapaUnavailable, CircuitBreaker, chapa
+from .search import search_professionals
+from .models import Appointment, AvailabilityWindow, BalanceSnapshot, ChatMessage, ChatSession, Connection, Conversation, DirectMessage, LedgerEntry, MoodDailyRollup, MoodUpdate, Notification, Payment, ProfessionalProfile, SchedulerState, ServiceProposal, ServiceRequest, StatCounter, User, Withdrawal
+from .payouts import InsufficientFunds, fail_and_refund, process_payouts, request_withdrawal
+from .uploads import MB
+
+
+class QueryCountTestCase(APITestCase):
+    """
+    Serializing a list must not cost extra queries per row: listing 2 or 8
+    rows should run the same number of queries.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', role='admin')
+        self.client_user = User.objects.create_user(username='client', password='x', role='client')
+        self.professional = self.make_professional('pro')
+        Connection.objects.create(client=self.client_user, professional=self.professional, status='accepted')
+
+    def make_professional(self, username):
+        user = User.objects.create_user(username=username, password='x', role='professional')
+        ProfessionalProfile.objects.filter(user=user).update(verification_status='verified', verified=True)
+        return user
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            self.make_professional(f'pro{i}')
+            client = User.objects.create_user(username=f'client{i}', password='x', role='client')
+            # A professional cannot be double-booked, so every appointment gets its own day
+            Appointment.objects.create(client=client, professional=self.professional, date=date(2030, 1, 1) + timedelta(days=i), time='10:00')
+
+    def count_queries(self, url, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assert_constant_queries(self, url, user):
+        self.add_rows(1)
+        small = self.count_queries(url, user)
+        self.add_rows(6)
+        large = self.count_queries(url, user)
+        self.assertEqual(small, large, f"{url} query count grows with the number of rows")
+
+
+class UserListQueryCountTests(QueryCountTestCase):
+    def test_professional_list(self):
+        self.assert_constant_queries('/api/auth/professionals/', self.client_user)
+
+    def test_client_list(self):
+        self.assert_constant_queries('/api/auth/clients/', self.professional)
+
+    def test_user_list(self):
+        self.assert_constant_queries('/api/auth/users/', self.admin)
+
+    def test_professional_directory(self):
+        self.assert_constant_queries('/api/auth/professionals/directory/', self.client_user)
+
+
+class ServiceRequestFeedQueryCountTests(QueryCountTestCase):
+    """Proposal counts and nested proposals must not cost queries per request."""
+
+    def add_rows(self, count):
+        super().add_rows(count)
+        for i in range(count):
+            service_request = ServiceRequest.objects.create(
+                client=self.client_user, category='Anxiety', title=f'Request {i}', description='...'
+            )
+            for professional in User.objects.filter(role='professional')[:3]:
+                ServiceProposal.objects.create(request=service_request, professional=professional, message='...')
+
+    def test_feed_for_client(self):
+        self.assert_constant_queries('/api/auth/service-requests/feed/', self.client_user)
+
+    def test_feed_for_professional(self):
+        self.assert_constant_queries('/api/auth/service-requests/feed/?applied=true', self.professional)
+
+    def test_request_list(self):
+        self.assert_constant_queries('/api/auth/service-requests/', self.client_user)
+
+
+class ConversationListQueryCountTests(QueryCountTestCase):
+    """Other users, last messages and unread counts come from one query per page."""
+
+    def add_rows(self, count):
+        super().add_rows(count)
+        for professional in User.objects.filter(role='professional', received_messages__isnull=True):
+            DirectMessage.objects.create(sender=self.client_user, receiver=professional, content='Hello')
+            DirectMessage.objects.create(sender=professional, receiver=self.client_user, content='Hi')
+
+    def test_conversations_for_client(self):
+        self.assert_constant_queries('/api/auth/messages/conversations/', self.client_user)
+
+
+class PaymentTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer', password='x', role='client')
+
+    def make_payment(self, tx_ref, age=60):
+        payment = Payment.objects.create(user=self.user, amount='100.00', email='payer@example.com', tx_ref=tx_ref)
+        Payment.objects.filter(id=payment.id).update(created_at=timezone.now() - timedelta(seconds=age))
+        return payment
+
+
+class PaymentReconcilerTests(PaymentTestMixin, APITestCase):
+    @override_settings(CHAPA_SECRET_KEY=None, DEBUG=False)
+    def test_missing_key_leaves_payments_pending_outside_debug(self):
+        payment = self.make_payment('tx-1')
+        result = payment_reconciler.reconcile_payments()
+        self.assertEqual(result['success'], 0)
+        self.assertEqual(result['pending'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/auth/payment/verify/tx-1/')
+        self.assertEqual(response.status_code, 202)
+
+    @override_settings(CHAPA_SECRET_KEY=None, DEBUG=True)
+    def test_missing_key_confirms_payments_under_debug(self):
+        payment = self.make_payment('tx-1')
+        self.assertEqual(payment_reconciler.reconcile_payments()['success'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+
+    @override_settings(CHAPA_SECRET_KEY='test-key', PAYMENT_VERIFY_MAX_AGE=30)
+    def test_abandoned_payments_expire(self):
+        payment = self.make_payment('tx-old', age=60)
+        with mock.patch.object(chapa, 'verify') as verify_mock:
+            self.assertEqual(payment_reconciler.reconcile_payments()['expired'], 1)
+        verify_mock.assert_not_called()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'expired')
+
+    @override_settings(CHAPA_SECRET_KEY='test-key')
+    def test_long_poll_reads_the_row(self):
+        payment = self.make_payment('tx-1')
+        # Settled by another process: no announcement reaches this process's cache
+        Payment.objects.filter(id=payment.id).update(status='success')
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/auth/payment/verify/tx-1/?wait=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'success')
+
+
+class PaymentVerificationTests(PaymentTestMixin, APITransactionTestCase):
+    """Chapa is checked from worker threads, so these run outside a test transaction."""
+
+    @override_settings(CHAPA_SECRET_KEY='test-key')
+    def test_outcomes_follow_chapa(self):
+        paid, declined, unreachable, fresh = (
+            self.make_payment('tx-paid'), self.make_payment('tx-declined'),
+            self.make_payment('tx-unreachable'), self.make_payment('tx-fresh', age=0),
+        )
+        responses = {
+            'tx-paid': {'status': 'success', 'data': {'status': 'success', 'reference': 'ref-1'}},
+            'tx-declined': {'status': 'success', 'data': {'status': 'failed'}},
+        }
+
+        def verify(tx_ref):
+            if tx_ref not in responses:
+                raise ChapaUnavailable('down')
+            return responses[tx_ref]
+
+        with mock.patch.object(chapa, 'verify', side_effect=verify) as verify_mock:
+            result = payment_reconciler.reconcile_payments()
+
+        # Too recent to verify yet
+        self.assertNotIn(mock.call('tx-fresh'), verify_mock.call_args_list)
+        self.assertEqual((result['success'], result['failed'], result['pending']), (1, 1, 1))
+        for payment in (paid, declined, unreachable, fresh):
+            payment.refresh_from_db()
+        self.assertEqual((paid.status, paid.chapa_reference), ('success', 'ref-1'))
+        self.assertEqual(declined.status, 'failed')
+        self.assertEqual((unreachable.status, unreachable.verify_attempts), ('pending', 1))
+        self.assertGreater(unreachable.next_verify_at, timezone.now())
+        self.assertEqual(fresh.status, 'pending')
+
+
+class LedgerTests(APITestCase):
+    def setUp(self):
+        self.professional = User.objects.create_user(username='pro', password='x', role='professional')
+
+    def profile_balance(self):
+        profile = ProfessionalProfile.objects.get(user=self.professional)
+        return {'balance': profile.balance, 'total_earnings': profile.total_earnings}
+
+    def withdraw(self, amount):
+        return request_withdrawal(self.professional, Decimal(amount), '001', 'Test Bank', '1000', 'Pro')
+
+    def test_credit_updates_profile_and_ledger(self):
+        ledger.credit_earning(self.professional.id, Decimal('150.00'), 'Session')
+        expected = {'balance': Decimal('150.00'), 'total_earnings': Decimal('150.00')}
+        self.assertEqual(self.profile_balance(), expected)
+        self.assertEqual(ledger.balance_for(self.professional.id), expected)
+
+    def test_withdrawal_debits_and_refund_credits(self):
+        ledger.credit_earning(self.professional.id, Decimal('100.00'))
+        withdrawal = self.withdraw('60.00')
+        with self.assertRaises(InsufficientFunds):
+            self.withdraw('60.00')
+        self.assertEqual(self.profile_balance()['balance'], Decimal('40.00'))
+        self.assertEqual(ledger.balance_for(self.professional.id)['balance'], Decimal('40.00'))
+
+        self.assertTrue(fail_and_refund(withdrawal, 'pending', 'Rejected'))
+        # A second failure of the same withdrawal refunds nothing
+        self.assertFalse(fail_and_refund(withdrawal, 'pending', 'Rejected'))
+        self.assertEqual(self.profile_balance()['balance'], Decimal('100.00'))
+        self.assertEqual(ledger.balance_for(self.professional.id)['balance'], Decimal('100.00'))
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(withdrawal=withdrawal).values_list('kind', 'amount')),
+            [('withdrawal', Decimal('-60.00')), ('refund', Decimal('60.00'))],
+        )
+
+    def test_earnings_endpoint_reports_the_withdrawable_balance(self):
+        ledger.credit_earning(self.professional.id, Decimal('100.00'))
+        self.withdraw('30.00')
+        self.client.force_authenticate(self.professional)
+        response = self.client.get('/api/auth/payout/earnings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['available_balance']), Decimal('70.00'))
+        self.assertEqual(Decimal(response.data['total_earnings']), Decimal('100.00'))
+        self.assertEqual(len(response.data['history']), 2)
+
+    def test_snapshots_skip_recent_entries_and_keep_balances(self):
+        ledger.credit_earning(self.professional.id, Decimal('100.00'))
+        self.assertEqual(ledger.take_snapshots(), 0)
+
+        self.assertEqual(ledger.take_snapshots(now=timezone.now() + ledger.SNAPSHOT_LAG * 2), 1)
+        snapshot = BalanceSnapshot.objects.get(professional=self.professional)
+        self.assertEqual(snapshot.balance, Decimal('100.00'))
+        self.withdraw('25.00')
+        self.assertEqual(ledger.balance_for(self.professional.id), self.profile_balance())
+        # The next snapshot builds on the previous one instead of rescanning
+        self.assertEqual(ledger.take_snapshots(now=timezone.now() + ledger.SNAPSHOT_LAG * 2), 1)
+        latest = ledger.latest_snapshot(self.professional.id)
+        self.assertEqual((latest.balance, latest.total_earnings), (Decimal('75.00'), Decimal('100.00')))
+        self.assertEqual(ledger.balance_for(self.professional.id), self.profile_balance())
+
+    def test_drift_fix_posts_entries_and_leaves_the_profile(self):
+        ledger.credit_earning(self.professional.id, Decimal('100.00'))
+        ProfessionalProfile.objects.filter(user=self.professional).update(balance=Decimal('80.00'), total_earnings=Decimal('120.00'))
+        drift = ledger.find_drift(fix=True)
+        self.assertIn(self.professional.id, drift)
+        expected = {'balance': Decimal('80.00'), 'total_earnings': Decimal('120.00')}
+        self.assertEqual(self.profile_balance(), expected)
+        self.assertEqual(ledger.balance_for(self.professional.id), expected)
+        self.assertEqual(ledger.find_drift(), {})
+
+
+class PayoutTests(APITestCase):
+    def setUp(self):
+        self.professional = User.objects.create_user(username='pro', password='x', role='professional')
+        ledger.credit_earning(self.professional.id, Decimal('100.00'))
+
+    def balance(self):
+        return ProfessionalProfile.objects.get(user=self.professional).balance
+
+    def withdraw(self, amount='40.00'):
+        return request_withdrawal(self.professional, Decimal(amount), '001', 'Test Bank', '1000', 'Pro')
+
+    def run_payouts(self, transfer=None, verify_transfer=None):
+        with mock.patch.object(chapa, 'transfer', **(transfer or {})) as transfer_mock, \
+                mock.patch.object(chapa, 'verify_transfer', **(verify_transfer or {'return_value': {'status': 'success', 'data': {'status': 'pending'}}})) as verify_mock:
+            result = process_payouts()
+        return result, transfer_mock, verify_mock
+
+    def test_withdrawal_api_reserves_the_balance(self):
+        self.client.force_authenticate(self.professional)
+        data = {'amount': '70.00', 'bank_code': '001', 'account_number': '1000', 'account_name': 'Pro'}
+        first = self.client.post('/api/auth/payout/withdraw/', data, format='json')
+        second = self.client.post('/api/auth/payout/withdraw/', data, format='json')
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(self.balance(), Decimal('30.00'))
+        self.assertEqual(Withdrawal.objects.filter(user=self.professional).count(), 1)
+
+    def test_accepted_transfer_is_approved(self):
+        withdrawal = self.withdraw()
+        result, transfer_mock, _ = self.run_payouts(transfer={'return_value': {'status': 'success'}})
+        self.assertEqual(result['approved'], 1)
+        transfer_mock.assert_called_once()
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'approved')
+        self.assertEqual(self.balance(), Decimal('60.00'))
+
+    def test_rejected_transfer_refunds(self):
+        withdrawal = self.withdraw()
+        result, _, _ = self.run_payouts(transfer={'return_value': {'status': 'failed', 'message': 'Invalid account'}})
+        self.assertEqual(result['failed'], 1)
+        withdrawal.refresh_from_db()
+        self.assertEqual((withdrawal.status, withdrawal.last_error), ('failed', 'Invalid account'))
+        self.assertEqual(self.balance(), Decimal('100.00'))
+
+    def test_unreachable_chapa_backs_off_and_never_sends_twice(self):
+        withdrawal = self.withdraw()
+        result, _, _ = self.run_payouts(transfer={'side_effect': ChapaUnavailable('down')})
+        self.assertEqual(result['retrying'], 1)
+        withdrawal.refresh_from_db()
+        self.assertEqual((withdrawal.status, withdrawal.attempts), ('pending', 1))
+        self.assertGreater(withdrawal.next_attempt_at, timezone.now())
+
+        # Not due yet
+        result, transfer_mock, _ = self.run_payouts()
+        self.assertEqual(result['processed'], 0)
+
+        # The first transfer did reach Chapa: the retry finds it instead of resending
+        Withdrawal.objects.filter(id=withdrawal.id).update(next_attempt_at=timezone.now())
+        result, transfer_mock, verify_mock = self.run_payouts()
+        self.assertEqual(result['approved'], 1)
+        transfer_mock.assert_not_called()
+        verify_mock.assert_any_call(withdrawal.reference)
+        self.assertEqual(self.balance(), Decimal('60.00'))
+
+    def test_stale_claims_are_verified_before_resending(self):
+        withdrawal = self.withdraw()
+        Withdrawal.objects.filter(id=withdrawal.id).update(status='processing', claimed_at=timezone.now() - timedelta(hours=1))
+        result, transfer_mock, _ = self.run_payouts(
+            transfer={'return_value': {'status': 'success'}},
+            verify_transfer={'return_value': {'status': 'failed', 'message': 'Transfer not found'}},
+        )
+        self.assertEqual((result['released'], result['approved']), (1, 1))
+        transfer_mock.assert_called_once()
+
+
+@override_settings(USE_S3=False)
+class DirectUploadTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.professional = User.objects.create_user(username='pro', password='x', role='professional')
+        self.client.force_authenticate(self.professional)
+
+    def png(self):
+        data = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(data, 'PNG')
+        return data.getvalue()
+
+    def start(self, content_type='image/png', size=100, target='profile_photo'):
+        return self.client.post('/api/auth/uploads/', {'target': target, 'content_type': content_type, 'size': size}, format='json')
+
+    def put(self, upload, body, content_type='image/png'):
+        return self.client.generic('PUT', upload['url'].replace('http://testserver', ''), body, content_type=content_type)
+
+    def finalize(self, upload):
+        return self.client.post('/api/auth/uploads/finalize/', {'upload_token': upload['upload_token']}, format='json')
+
+    def upload_photo(self):
+        upload = self.start().data
+        self.assertEqual(self.put(upload, self.png()).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.finalize(upload).status_code, 200)
+        return upload['key']
+
+    def test_types_outside_the_allowlist_are_refused(self):
+        for content_type in ('image/svg+xml', 'text/html', 'application/pdf'):
+            self.assertEqual(self.start(content_type).status_code, 400, content_type)
+        self.assertEqual(self.start('application/pdf', target='certificates').status_code, 201)
+        # The stored extension follows the type, not the client's filename
+        upload = self.client.post('/api/auth/uploads/', {
+            'target': 'profile_photo', 'filename': 'x.html', 'content_type': 'image/png', 'size': 100,
+        }, format='json').data
+        self.assertTrue(upload['key'].endswith('.png'))
+
+    def test_local_round_trip_replaces_the_previous_file(self):
+        first = self.upload_photo()
+        self.assertEqual(ProfessionalProfile.objects.get(user=self.professional).profile_photo.name, first)
+        second = self.upload_photo()
+        self.assertEqual(ProfessionalProfile.objects.get(user=self.professional).profile_photo.name, second)
+        self.assertFalse(default_storage.exists(first))
+        self.assertTrue(default_storage.exists(second))
+
+    def test_local_put_must_match_the_ticket_type(self):
+        upload = self.start().data
+        self.assertEqual(self.put(upload, b'<html></html>', content_type='text/html').status_code, 400)
+        self.assertFalse(default_storage.exists(upload['key']))
+
+    def test_bytes_that_are_not_the_declared_image_are_deleted(self):
+        upload = self.start().data
+        self.put(upload, b'<svg xmlns="http://www.w3.org/2000/svg"></svg>')
+        self.assertEqual(self.finalize(upload).status_code, 400)
+        self.assertFalse(default_storage.exists(upload['key']))
+
+    def test_another_users_token_is_refused(self):
+        upload = self.start().data
+        self.put(upload, self.png())
+        other = User.objects.create_user(username='other', password='x', role='professional')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.finalize(upload).status_code, 400)
+        self.assertFalse(ProfessionalProfile.objects.get(user=other).profile_photo)
+
+    def test_oversize_objects_are_deleted(self):
+        upload = self.start().data
+        # Written past the PUT's own size check, as a direct S3 upload could be
+        default_storage.save(upload['key'], ContentFile(b'0' * (10 * MB + 1)))
+        self.assertEqual(self.finalize(upload).status_code, 400)
+        self.assertFalse(default_storage.exists(upload['key']))
+
+
+class UnreadCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='x', role='client')
+        self.addCleanup(cache.clear)
+
+    def test_local_cache_reads_the_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title='Hi', message='Hello')
+        self.assertEqual(notifications.unread_count(self.user.id), 1)
+        # Read in another worker, whose cache this process cannot see
+        Notification.objects.filter(user=self.user).update(is_read=True)
+        self.assertEqual(notifications.unread_count(self.user.id), 0)
+
+    def test_shared_cache_keeps_a_counter(self):
+        with mock.patch.object(notifications, 'cache_is_shared', return_value=True):
+            self.assertEqual(notifications.unread_count(self.user.id), 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                Notification.objects.create(user=self.user, title='Hi', message='Hello')
+            with self.assertNumQueries(0):
+                self.assertEqual(notifications.unread_count(self.user.id), 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                notifications.mark_read(self.user)
+            self.assertEqual(notifications.unread_count(self.user.id), 0)
+
+    def test_list_reports_the_total_unread_count(self):
+        Notification.objects.bulk_create(
+            [Notification(user=self.user, title='Hi', message=str(i)) for i in range(60)]
+        )
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/auth/notifications/?limit=50')
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertEqual(response.data['unread_count'], 60)
+        response = self.client.post('/api/auth/notifications/read/', {'ids': [response.data['results'][0]['id']]}, format='json')
+        self.assertEqual(response.data['unread_count'], 59)
+
+
+class AppointmentGuardTests(APITestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', role='client')
+        self.other_client = User.objects.create_user(username='client2', password='x', role='client')
+        self.professional = User.objects.create_user(username='pro', password='x', role='professional')
+        self.other_professional = User.objects.create_user(username='pro2', password='x', role='professional')
+
+    def book(self, client, professional, time='10:00', day=None, duration=60):
+        self.client.force_authenticate(client)
+        return self.client.post('/api/auth/appointments/', {
+            'client': client.id, 'professional': professional.id, 'date': day or self.day, 'time': time, 'duration_minutes': duration,
+        }, format='json')
+
+    def test_professional_cannot_be_double_booked(self):
+        self.assertEqual(self.book(self.client_user, self.professional).status_code, 201)
+        response = self.book(self.other_client, self.professional, time='10:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("The professional already has a session at that time.", str(response.data))
+        # Back to back is fine
+        self.assertEqual(self.book(self.other_client, self.professional, time='11:00').status_code, 201)
+
+    def test_client_cannot_overlap_themselves(self):
+        self.assertEqual(self.book(self.client_user, self.professional).status_code, 201)
+        response = self.book(self.client_user, self.other_professional, time='10:45')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("You already have a session at that time.", str(response.data))
+
+    def test_one_active_appointment_per_pair(self):
+        first = self.book(self.client_user, self.professional).data
+        response = self.book(self.client_user, self.professional, day=self.day + timedelta(days=1))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("You already have an active appointment with this professional.", str(response.data))
+        Appointment.objects.filter(id=first['id']).update(status='cancelled')
+        self.assertEqual(self.book(self.client_user, self.professional, day=self.day + timedelta(days=1)).status_code, 201)
+
+    def test_guards_apply_to_updates(self):
+        self.book(self.client_user, self.professional)
+        moved = self.book(self.other_client, self.professional, time='12:00').data
+        response = self.client.patch(f"/api/auth/appointments/{moved['id']}/", {'time': '10:30'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        # The database refuses it without the view too
+        appointment = Appointment.objects.get(id=moved['id'])
+        appointment.time = '10:30'
+        with self.assertRaises(SlotUnavailable):
+            guarded(appointment.save)
+        # Cancelled appointments no longer hold their slot
+        Appointment.objects.filter(client=self.client_user).update(status='cancelled')
+        self.assertEqual(self.client.patch(f"/api/auth/appointments/{moved['id']}/", {'time': '10:30'}, format='json').status_code, 200)
+
+    def test_moves_must_stay_within_availability(self):
+        AvailabilityWindow.objects.create(professional=self.professional, weekday=self.day.weekday(), start_time='09:00', end_time='12:00')
+        self.assertEqual(self.book(self.client_user, self.professional, time='13:00').status_code, 400)
+        booked = self.book(self.client_user, self.professional).data
+        url = f"/api/auth/appointments/{booked['id']}/"
+        self.assertEqual(self.client.patch(url, {'time': '11:30'}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'time': '11:00'}, format='json').status_code, 200)
+        # Changes that keep the slot are not re-checked against the current hours
+        AvailabilityWindow.objects.filter(professional=self.professional).delete()
+        AvailabilityWindow.objects.create(professional=self.professional, weekday=self.day.weekday(), start_time='14:00', end_time='16:00')
+        self.assertEqual(self.client.patch(url, {'notes': 'Running late'}, format='json').status_code, 200)
+
+    def test_sweeper_cancels_past_appointments(self):
+        booked = self.book(self.client_user, self.professional).data
+        booked_end = Appointment.objects.get(id=booked['id']).end_at
+        result = sweep_appointments(now=booked_end + timedelta(days=1))
+        self.assertEqual(result, {'expired': 1})
+        self.assertEqual(Appointment.objects.get(id=booked['id']).status, 'cancelled')
+
+
+class AIChatTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='chatter', password='x', role='client')
+        self.client.force_authenticate(self.user)
+        self.addCleanup(cache.clear)
+
+    def test_stream_requests_get_json_under_wsgi(self):
+        with mock.patch('accounts.views.get_client') as get_client_mock:
+            get_client_mock.return_value.models.generate_content.return_value.text = 'Hello there'
+            response = self.client.post(
+                '/api/auth/ai-chat/', {'message': 'Hi', 'stream': True}, format='json',
+                HTTP_ACCEPT='text/event-stream',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['reply'], 'Hello there')
+
+    def test_only_asgi_requests_stream(self):
+        self.assertTrue(can_stream(AsyncRequestFactory().post('/api/auth/ai-chat/')))
+        self.assertFalse(can_stream(RequestFactory().post('/api/auth/ai-chat/')))
+
+
+class MatchingIndexTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.anxiety = self.make_professional('anx', 'Anxiety', 'Panic attacks and worry', 'English', 4)
+        self.grief = self.make_professional('grief', 'Grief', 'Loss and bereavement counselling', 'Amharic', 5)
+        self.career = self.make_professional('career', 'Career', 'Work stress and burnout', 'English', 3)
+        self.index = matching.MatchingIndex()
+        self.index.build()
+
+    def make_professional(self, username, specialization, bio, languages, rating):
+        user = User.objects.create_user(username=username, password='x', role='professional')
+        profile = ProfessionalProfile.objects.get(user=user)
+        profile.specialization, profile.bio, profile.languages, profile.rating = specialization, bio, languages, rating
+        profile.verification_status = 'verified'
+        profile.save()
+        return user
+
+    def row(self, user):
+        return ProfessionalProfile.objects.filter(user=user).values_list(*matching.PROFILE_FIELDS).get()
+
+    def ranked_ids(self, text, **kwargs):
+        return [user_id for user_id, _, _ in self.index.rank(text, **kwargs)]
+
+    def test_text_decides_the_order(self):
+        self.assertEqual(self.ranked_ids('worry and panic every night')[0], self.anxiety.id)
+        self.assertEqual(self.ranked_ids('coping with the loss of my father')[0], self.grief.id)
+        _, _, similarity = self.index.rank('burnout at work', k=1)[0]
+        self.assertGreater(similarity, 0)
+
+    def test_similarity_is_cosine_of_tfidf_rows(self):
+        # Compare with the dense computation the sparse postings stand in for
+        dense = np.zeros((3, matching.N_FEATURES), np.float32)
+        for i, (columns, values) in enumerate(self.index.rows):
+            dense[i, columns] = values
+        idf = np.log(4 / (1 + (dense > 0).sum(axis=0))) + 1
+        weighted = dense * idf
+        weighted /= np.linalg.norm(weighted, axis=1)[:, None]
+        columns, values = matching.term_vector(('panic and loss at work', 1))
+        query = np.zeros(matching.N_FEATURES)
+        query[columns] = values * idf[columns]
+        expected = dict(zip(self.index.user_ids.tolist(), weighted @ (query / np.linalg.norm(query))))
+        for user_id, _, similarity in self.index.rank('panic and loss at work'):
+            self.assertAlmostEqual(similarity, expected[user_id], places=4)
+
+    def test_rows_follow_profile_changes(self):
+        ProfessionalProfile.objects.filter(user=self.career).update(
+            specialization='Grief', bio='Bereavement and loss', updated_at=timezone.now()
+        )
+        self.assertEqual(self.index.apply([self.row(self.career)]), 1)
+        self.assertIn(self.career.id, self.ranked_ids('bereavement', k=2))
+
+        ProfessionalProfile.objects.filter(user=self.grief).update(verified=False, updated_at=timezone.now())
+        self.index.apply([self.row(self.grief)])
+        self.assertEqual(len(self.index), 2)
+        self.assertNotIn(self.grief.id, self.ranked_ids('loss'))
+        self.assertEqual(self.index.df.sum(), sum(len(columns) for columns, _ in self.index.rows))
+
+        self.index.remove(ProfessionalProfile.objects.get(user=self.anxiety).id)
+        self.assertEqual(self.ranked_ids('panic'), [self.career.id])
+
+    def test_excluded_users_and_language(self):
+        self.assertNotIn(self.anxiety.id, self.ranked_ids('panic', exclude_user_ids=(self.anxiety.id,)))
+        self.assertEqual(self.ranked_ids('counselling', language='Amharic')[0], self.grief.id)
+
+
+@override_settings(APPOINTMENT_REMINDER_OFFSETS=[1440, 60, 10])
+class ReminderTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.client_user = User.objects.create_user(username='client', password='x', role='client')
+        self.professional = User.objects.create_user(username='pro', password='x', role='professional')
+        self.appointment = Appointment.objects.create(
+            client=self.client_user, professional=self.professional, date=date(2030, 1, 7), time='10:00'
+        )
+        self.start = self.appointment.start_at
+
+    def set_mark(self, high_water):
+        SchedulerState.objects.update_or_create(name=reminders.STATE_NAME, defaults={'high_water': high_water})
+
+    def test_a_mark_is_claimed_by_one_worker(self):
+        self.set_mark(self.start - timedelta(minutes=61))
+        stale = SchedulerState.objects.get(name=reminders.STATE_NAME)
+        now = self.start - timedelta(minutes=59)
+        self.assertEqual(reminders.send_due(now), 2)
+        # A second worker that read the same mark before the first one advanced it
+        with mock.patch.object(SchedulerState.objects, 'get_or_create', return_value=(stale, False)):
+            self.assertEqual(reminders.send_due(now), 0)
+        self.assertEqual(reminders.send_due(now), 0)
+        self.assertEqual(Notification.objects.filter(type='appointment_reminder').count(), 2)
+
+    def test_catch_up_sends_only_the_closest_reminder(self):
+        # Down since long before the 24 hour reminder was due
+        self.set_mark(self.start - timedelta(days=3))
+        Appointment.objects.create(
+            client=User.objects.create_user(username='late', password='x', role='client'),
+            professional=self.professional, date=date(2030, 1, 7), time='09:00',
+        )
+        self.assertEqual(reminders.send_due(self.start - timedelta(minutes=5)), 2)
+        messages = set(Notification.objects.values_list('user_id', 'message'))
+        self.assertEqual(messages, {
+            (self.client_user.id, "Your video session with pro starts in 5 minutes."),
+            (self.professional.id, "Your video session with client starts in 5 minutes."),
+        })
+        self.assertEqual(
+            SchedulerState.objects.get(name=reminders.STATE_NAME).high_water, self.start - timedelta(minutes=5)
+        )
+
+    def test_bulk_sent_reminders_count_as_unread(self):
+        self.set_mark(self.start - timedelta(minutes=11))
+        with mock.patch.object(notifications, 'cache_is_shared', return_value=True):
+            self.assertEqual(notifications.unread_count(self.client_user.id), 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                reminders.send_due(self.start - timedelta(minutes=9))
+            with self.assertNumQueries(0):
+                self.assertEqual(notifications.unread_count(self.client_user.id), 1)
+
+
+def chapa_response(status_code, body=None):
+    return mock.Mock(status_code=status_code, json=mock.Mock(return_value=body or {}), text='')
+
+
+@override_settings(CHAPA_SECRET_KEY='test-key')
+class ChapaClientTests(APITestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+        self.gateway = ChapaClient(pool_size=1, max_retries=2, breaker=self.breaker)
+        sleep = mock.patch('accounts.chapa.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def send(self, *outcomes):
+        return mock.patch.object(self.gateway.session, 'request', side_effect=list(outcomes))
+
+    def test_idempotent_calls_retry_server_errors(self):
+        with self.send(chapa_response(503), chapa_response(200, {'status': 'success'})) as request:
+            self.assertEqual(self.gateway.verify('tx-1'), {'status': 'success'})
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(
+            {key: self.gateway.stats()['operations']['verify'][key] for key in ('calls', 'errors', 'retries')},
+            {'calls': 2, 'errors': 1, 'retries': 1},
+        )
+
+    def test_business_errors_are_returned_not_retried(self):
+        with self.send(chapa_response(400, {'message': 'Invalid reference'})) as request:
+            self.assertEqual(self.gateway.verify('tx-1'), {'message': 'Invalid reference'})
+        self.assertEqual(request.call_count, 1)
+
+    def test_transfers_retry_only_when_never_sent(self):
+        with self.send(requests.ReadTimeout('slow')) as request:
+            with self.assertRaises(ChapaUnavailable):
+                self.gateway.transfer({'reference': 'wd-1'})
+        # Chapa may have received it: sending again could pay twice
+        self.assertEqual(request.call_count, 1)
+
+        with self.send(requests.ConnectTimeout('no route'), chapa_response(200, {'status': 'success'})) as request:
+            self.assertEqual(self.gateway.transfer({'reference': 'wd-2'}), {'status': 'success'})
+        self.assertEqual(request.call_count, 2)
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        self.gateway.max_retries = 0
+        with self.send(*[requests.ConnectionError('down')] * 3):
+            for _ in range(3):
+                with self.assertRaises(ChapaUnavailable):
+                    self.gateway.banks()
+        with self.send() as request:
+            with self.assertRaises(ChapaUnavailable):
+                self.gateway.banks()
+        request.assert_not_called()
+        self.assertEqual(self.gateway.stats()['circuit'], 'open')
+        self.assertEqual(self.gateway.stats()['operations']['banks']['short_circuited'], 1)
+
+        self.breaker._opened_at -= self.breaker.reset_timeout
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertTrue(self.breaker.allow())
+        # A second caller is refused while the trial is out
+        self.assertFalse(self.breaker.allow())
+        self.breaker.release_trial()
+
+        with self.send(chapa_response(200, {'data': []})):
+            self.assertEqual(self.gateway.banks(), {'data': []})
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_unexpected_errors_release_the_trial(self):
+        self.breaker._opened_at = time.monotonic() - self.breaker.reset_timeout
+        with self.send(RuntimeError('bug')):
+            with self.assertRaises(RuntimeError):
+                self.gateway.banks()
+        self.assertTrue(self.breaker.allow())
+
+
+class PublicStatsTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        stats.reconcile_stats()
+
+    def counters(self):
+        return dict(StatCounter.objects.values_list('name', 'value'))
+
+    def test_counters_follow_saves_and_deletes(self):
+        client = User.objects.create_user(username='client', password='x', role='client')
+        professional = User.objects.create_user(username='pro', password='x', role='professional')
+        self.assertEqual(self.counters()['people_helped'], 1)
+
+        # A role change moves the user out of the counter, even when loaded afresh
+        client = User.objects.get(id=client.id)
+        client.role = 'professional'
+        client.save()
+        self.assertEqual(self.counters()['people_helped'], 0)
+        client.role = 'client'
+        client.save()
+        self.assertEqual(self.counters()['people_helped'], 1)
+
+        appointment = Appointment.objects.create(client=client, professional=professional, date=date(2030, 1, 7), time='10:00')
+        self.assertEqual(self.counters()['support_sessions'], 0)
+        appointment.status = 'completed'
+        appointment.save()
+        appointment.save()
+        self.assertEqual(self.counters()['support_sessions'], 1)
+        appointment = Appointment.objects.get(id=appointment.id)
+        appointment.status = 'cancelled'
+        appointment.save()
+        self.assertEqual(self.counters()['support_sessions'], 0)
+
+        profile = ProfessionalProfile.objects.get(user=professional)
+        profile.verification_status = 'verified'
+        profile.save()
+        self.assertEqual(self.counters()['licensed_experts'], 1)
+        ProfessionalProfile.objects.get(user=professional).delete()
+        self.assertEqual(self.counters()['licensed_experts'], 0)
+
+        User.objects.get(id=client.id).delete()
+        self.assertEqual(self.counters()['people_helped'], 0)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        # Bulk writes skip the signals
+        User.objects.bulk_create([User(username=f'bulk{i}', role='client') for i in range(3)])
+        self.assertEqual(self.counters()['people_helped'], 0)
+        drift = stats.reconcile_stats()
+        self.assertEqual(drift['people_helped'], 3)
+        self.assertEqual(self.counters()['people_helped'], 3)
+        self.assertEqual(stats.reconcile_stats()['people_helped'], 0)
+
+    def test_matching_etag_gets_304(self):
+        response = self.client.get('/api/auth/stats/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get('/api/auth/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        User.objects.create_user(username='client', password='x', role='client')
+        cache.clear()
+        response = self.client.get('/api/auth/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['people_helped'], 1)
+
+
+class MoodAnalyticsTests(APITestCase):
+    # Sat 28 March to Fri 3 April 2026: two ISO weeks, two months, one missed day
+    LOG = [
+        (date(2026, 3, 28), 2), (date(2026, 3, 28), 4), (date(2026, 3, 29), 3), (date(2026, 3, 30), 5),
+        (date(2026, 3, 31), 1), (date(2026, 3, 31), 3), (date(2026, 4, 1), 4), (date(2026, 4, 3), 5),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='client', password='x', role='client')
+        self.other = User.objects.create_user(username='other', password='x', role='client')
+        for day, score in self.LOG:
+            self.log(self.user, day, score)
+        self.log(self.other, date(2026, 3, 30), 1)
+
+    def log(self, user, day, score):
+        logged_at = timezone.make_aware(datetime(day.year, day.month, day.day, 12))
+        with mock.patch('django.utils.timezone.now', return_value=logged_at):
+            return MoodUpdate.objects.create(user=user, mood_score=score)
+
+    def rollups(self):
+        return list(
+            MoodDailyRollup.objects.order_by('user_id', 'day')
+            .values_list('user_id', 'day', 'entries', 'score_total', 'min_score', 'max_score')
+        )
+
+    def test_daily_weekly_and_monthly_series(self):
+        stats = mood.analytics([self.user.id], date(2026, 3, 1), date(2026, 4, 4))[self.user.id]
+        self.assertEqual(len(stats['daily']), 6)
+        self.assertEqual(stats['daily'][0], {'period': '2026-03-28', 'average': 3.0, 'min': 2, 'max': 4, 'entries': 2})
+        self.assertEqual(stats['daily'][3], {'period': '2026-03-31', 'average': 2.0, 'min': 1, 'max': 3, 'entries': 2})
+        # Weeks are labelled by their Monday
+        self.assertEqual(stats['weekly'], [
+            {'period': '2026-03-23', 'average': 3.0, 'min': 2, 'max': 4, 'entries': 3},
+            {'period': '2026-03-30', 'average': 3.6, 'min': 1, 'max': 5, 'entries': 5},
+        ])
+        self.assertEqual(stats['monthly'], [
+            {'period': '2026-03', 'average': 3.0, 'min': 1, 'max': 5, 'entries': 6},
+            {'period': '2026-04', 'average': 4.5, 'min': 4, 'max': 5, 'entries': 2},
+        ])
+        self.assertEqual(
+            stats['overall'], {'average': round(27 / 8, 2), 'min': 1, 'max': 5, 'entries': 8, 'days_logged': 6}
+        )
+
+    def test_streaks(self):
+        stats = mood.analytics([self.user.id, self.other.id], date(2026, 3, 1), date(2026, 4, 4))
+        self.assertEqual(stats[self.user.id]['streaks'], {'current': 1, 'longest': 5})
+        self.assertEqual(stats[self.other.id]['streaks'], {'current': 0, 'longest': 1})
+        self.assertEqual(stats[self.other.id]['monthly'], [
+            {'period': '2026-03', 'average': 1.0, 'min': 1, 'max': 1, 'entries': 1},
+        ])
+        # Nothing logged on the last day or the one before breaks the current run
+        stats = mood.analytics([self.user.id], date(2026, 3, 1), date(2026, 4, 5))[self.user.id]
+        self.assertEqual(stats['streaks'], {'current': 0, 'longest': 5})
+        stats = mood.analytics([self.user.id], date(2026, 3, 1), date(2026, 4, 1))[self.user.id]
+        self.assertEqual(stats['streaks'], {'current': 5, 'longest': 5})
+
+    def test_edits_and_deletes_recompute_the_day(self):
+        update = self.log(self.user, date(2026, 4, 3), 1)
+        update.mood_score = 3
+        update.save()
+        self.assertIn((self.user.id, date(2026, 4, 3), 2, 8, 3, 5), self.rollups())
+        update.delete()
+        self.assertIn((self.user.id, date(2026, 4, 3), 1, 5, 5, 5), self.rollups())
+
+    def test_rebuild_matches_the_incremental_rollups(self):
+        incremental = self.rollups()
+        self.assertEqual(len(incremental), 7)
+        MoodDailyRollup.objects.all().delete()
+        self.assertEqual(mood.rebuild_rollups(), 7)
+        self.assertEqual(self.rollups(), incremental)
+        # Rebuilding one user leaves the others alone
+        MoodDailyRollup.objects.filter(user=self.user).update(entries=99)
+        self.assertEqual(mood.rebuild_rollups([self.user.id]), 6)
+        self.assertEqual(self.rollups(), incremental)
+
+
+class ProfessionalSearchTests(APITestCase):
+    def setUp(self):
+        self.specialist = self.make_professional('abebe', 'Anxiety', 'Panic attacks and worry')
+        self.generalist = self.make_professional('hana', 'Family therapy', 'Couples, parenting and some anxiety')
+        self.grief = self.make_professional('dawit', 'Grief', 'Loss and bereavement counselling')
+        self.unverified = self.make_professional('selam', 'Anxiety', 'Social anxiety', verified=False)
+
+    def make_professional(self, username, specialization, bio, verified=True):
+        user = User.objects.create_user(username=username, password='x', role='professional')
+        profile = ProfessionalProfile.objects.get(user=user)
+        profile.specialization, profile.bio = specialization, bio
+        profile.verification_status = 'verified' if verified else 'pending'
+        profile.save()
+        return profile.id
+
+    def test_specialization_outranks_bio(self):
+        ids, next_cursor = search_professionals('anxiety')
+        self.assertEqual(ids, [self.specialist, self.generalist])
+        self.assertIsNone(next_cursor)
+
+    def test_misspelled_terms_match_close_index_terms(self):
+        self.assertEqual(search_professionals('anxeity')[0], [self.specialist, self.generalist])
+        self.assertEqual(search_professionals('bereavment')[0], [self.grief])
+        self.assertEqual(search_professionals('grie')[0], [self.grief])
+        self.assertEqual(search_professionals('zzzz ??')[0], [])
+        self.assertEqual(search_professionals('??'), ([], None))
+
+    def test_unverified_professionals_only_when_asked(self):
+        self.assertNotIn(self.unverified, search_professionals('anxiety')[0])
+        self.assertIn(self.unverified, search_professionals('anxiety', verified_only=False)[0])
+        # The index follows verification changes
+        profile = ProfessionalProfile.objects.get(id=self.unverified)
+        profile.verification_status = 'verified'
+        profile.save()
+        self.assertIn(self.unverified, search_professionals('anxiety')[0])
+
+    def test_cursor_pages_through_every_match_once(self):
+        everyone, _ = search_professionals('anxiety', verified_only=False)
+        self.assertEqual(len(everyone), 3)
+        pages, cursor = [], None
+        while True:
+            ids, cursor = search_professionals('anxiety', cursor=cursor, page_size=2, verified_only=False)
+            pages.append(ids)
+            if cursor is None:
+                break
+        self.assertEqual(pages, [everyone[:2], everyone[2:]])
+
+    def test_view_limits_clients_to_verified_professionals(self):
+        client = User.objects.create_user(username='client', password='x', role='client')
+        self.client.force_authenticate(client)
+        response = self.client.get('/api/auth/professionals/search/', {'q': 'anxiety', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in response.data['results']], ['abebe'])
+        response = self.client.get(
+            '/api/auth/professionals/search/', {'q': 'anxiety', 'limit': 1, 'cursor': response.data['next_cursor']}
+        )
+        self.assertEqual([user['username'] for user in response.data['results']], ['hana'])
+        self.assertIsNone(response.data['next_cursor'])
+
+
+class RealtimeSocketTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='client', password='x', role='client')
+        self.token = str(AccessToken.for_user(self.user))
+
+    async def connect(self, path=realtime.WEBSOCKET_PATH, token=None):
+        """Run the ASGI app against in-memory channels; returns (incoming, outgoing, app task)."""
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path, 'query_string': f'token={token}'.encode() if token else b''}
+        app = asyncio.create_task(realtime.websocket_application(scope, incoming.get, outgoing.put))
+        return incoming, outgoing, app
+
+    async def next_frame(self, outgoing):
+        return await asyncio.wait_for(outgoing.get(), timeout=2)
+
+    def notify(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title='Hello', message='New message')
+
+    async def test_rejects_unknown_paths_and_bad_tokens(self):
+        for path, token, code in (
+            ('/ws/other/', self.token, 4404),
+            (realtime.WEBSOCKET_PATH, None, 4401),
+            (realtime.WEBSOCKET_PATH, 'not-a-jwt', 4401),
+        ):
+            _, outgoing, app = await self.connect(path, token)
+            await asyncio.wait_for(app, timeout=2)
+            self.assertEqual(await self.next_frame(outgoing), {'type': 'websocket.close', 'code': code})
+
+    async def test_notifications_reach_the_subscriber(self):
+        incoming, outgoing, app = await self.connect(token=self.token)
+        self.assertEqual(await self.next_frame(outgoing), {'type': 'websocket.accept'})
+
+        await sync_to_async(self.notify)()
+        frame = await self.next_frame(outgoing)
+        self.assertEqual(frame['type'], 'websocket.send')
+        event = json.loads(frame['text'])
+        self.assertEqual(event['type'], 'notification.created')
+        self.assertEqual(event['data']['title'], 'Hello')
+
+        await incoming.put({'type': 'websocket.receive', 'text': 'ping'})
+        self.assertEqual(await self.next_frame(outgoing), {'type': 'websocket.send', 'text': 'pong'})
+        await incoming.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(app, timeout=2)
+        self.assertNotIn(self.user.id, realtime.get_backend()._subscribers)
+
+    def test_events_are_published_only_on_commit(self):
+        with mock.patch.object(realtime.get_backend(), 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                Notification.objects.create(user=self.user, title='Hello', message='New message')
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        publish.assert_called_once()
+        user_id, event = publish.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual(json.loads(event)['type'], 'notification.created')
+
+
+@override_settings(
+    PRESENCE_TTL=5,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'presence-tests'}},
+)
+class PresenceTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.online = User.objects.create_user(username='online', password='x', role='professional')
+        self.lapsed = User.objects.create_user(username='lapsed', password='x', role='professional')
+        self.never = User.objects.create_user(username='never', password='x', role='professional')
+
+    def marked_online(self):
+        return set(ProfessionalProfile.objects.filter(is_online=True).values_list('user_id', flat=True))
+
+    def test_heartbeat_writes_only_when_going_online(self):
+        with self.assertNumQueries(1):
+            presence.heartbeat(self.online.id)
+        with self.assertNumQueries(0):
+            presence.heartbeat(self.online.id)
+            self.assertTrue(presence.is_online(self.online.id))
+        self.assertEqual(self.marked_online(), {self.online.id})
+
+        presence.go_offline(self.online.id)
+        self.assertFalse(presence.is_online(self.online.id))
+        self.assertEqual(self.marked_online(), set())
+        with self.assertNumQueries(1):
+            presence.heartbeat(self.online.id)
+
+    def test_lapsed_heartbeats_are_synced_offline(self):
+        now = time.time()
+        with mock.patch('time.time', return_value=now - 4):
+            presence.heartbeat(self.lapsed.id)
+        with mock.patch('time.time', return_value=now):
+            presence.heartbeat(self.online.id)
+        users = [self.online.id, self.lapsed.id, self.never.id]
+        self.assertEqual(presence.online_among(users), {self.online.id, self.lapsed.id})
+        self.assertEqual(presence.online_among([]), set())
+
+        # Two seconds on, only the lapsed heartbeat has passed its TTL
+        with mock.patch('time.time', return_value=now + 2):
+            self.assertEqual(presence.online_among(users), {self.online.id})
+            self.assertEqual(self.marked_online(), {self.online.id, self.lapsed.id})
+            self.assertEqual(presence.sync_presence(), 1)
+            self.assertEqual(self.marked_online(), {self.online.id})
+            self.assertEqual(presence.sync_presence(), 0)
+
+
+@override_settings(BANK_LIST_TTL=60, BANK_LIST_STALE_TTL=3600)
+class BankCatalogTests(APITestCase):
+    OLD = {'status': 'success', 'data': [{'id': 1, 'name': 'Awash Bank'}]}
+    NEW = {'status': 'success', 'data': [{'id': 1, 'name': 'Awash Bank'}, {'id': 2, 'name': 'Dashen Bank'}]}
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        # Run the background refresh inline so its outcome can be checked
+        thread = mock.patch(
+            'accounts.bank_catalog.threading.Thread', side_effect=lambda target, daemon: mock.Mock(start=target)
+        )
+        thread.start()
+        self.addCleanup(thread.stop)
+
+    def cache_copy(self, payload, age):
+        cache.set(bank_catalog.CACHE_KEY, {'payload': payload, 'fetched_at': time.time() - age}, 3600)
+
+    def upstream(self, outcome):
+        if isinstance(outcome, Exception):
+            return mock.patch.object(chapa, 'banks', side_effect=outcome)
+        return mock.patch.object(chapa, 'banks', return_value=outcome)
+
+    def test_fresh_copy_is_served_without_calling_chapa(self):
+        self.cache_copy(self.OLD, age=10)
+        with self.upstream(self.NEW) as banks:
+            self.assertEqual(bank_catalog.get_banks(), self.OLD)
+        banks.assert_not_called()
+
+    def test_stale_copy_is_served_while_refreshing(self):
+        self.cache_copy(self.OLD, age=120)
+        with self.upstream(self.NEW) as banks:
+            self.assertEqual(bank_catalog.get_banks(), self.OLD)
+            self.assertEqual(bank_catalog.get_banks(), self.NEW)
+        banks.assert_called_once()
+        self.assertIsNone(cache.get(bank_catalog.REFRESH_LOCK_KEY))
+
+    def test_failed_refresh_keeps_the_last_good_copy(self):
+        self.cache_copy(self.OLD, age=120)
+        with self.upstream(ChapaUnavailable('down')) as banks:
+            self.assertEqual(bank_catalog.get_banks(), self.OLD)
+            # The lock is kept, so a failing upstream is not retried on every read
+            self.assertEqual(bank_catalog.get_banks(), self.OLD)
+        banks.assert_called_once()
+        self.assertEqual(cache.get(bank_catalog.CACHE_KEY)['payload'], self.OLD)
+
+    def test_cold_cache_waits_on_chapa(self):
+        with self.upstream(ChapaUnavailable('down')):
+            with self.assertRaises(bank_catalog.BankCatalogUnavailable):
+                bank_catalog.get_banks()
+        with self.upstream({'status': 'failed', 'message': 'Invalid API key'}):
+            with self.assertRaisesMessage(bank_catalog.BankCatalogUnavailable, 'Invalid API key'):
+                bank_catalog.get_banks()
+        self.assertIsNone(cache.get(bank_catalog.CACHE_KEY))
+        with self.upstream(self.NEW):
+            self.assertEqual(bank_catalog.get_banks(), self.NEW)
+        self.assertEqual(cache.get(bank_catalog.CACHE_KEY)['payload'], self.NEW)
+
+
+class DirectMessageTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='x', role='client')
+        self.bob = User.objects.create_user(username='bob', password='x', role='professional')
+        self.messages = [
+            DirectMessage.objects.create(
+                sender=sender, receiver=receiver, content=f'Message {i}'
+            )
+            for i, (sender, receiver) in enumerate([(self.alice, self.bob), (self.bob, self.alice)] * 3)
+        ]
+        self.client.force_authenticate(self.alice)
+
+    def ids(self, response):
+        return [message['id'] for message in response.data['results']]
+
+    def test_both_directions_share_one_canonical_conversation(self):
+        conversation = Conversation.for_users(self.bob.id, self.alice.id)
+        self.assertEqual(Conversation.for_users(str(self.alice.id), str(self.bob.id)), conversation)
+        self.assertEqual((conversation.user_low_id, conversation.user_high_id), (self.alice.id, self.bob.id))
+        self.assertEqual(Conversation.objects.count(), 1)
+        self.assertEqual({message.conversation_id for message in self.messages}, {conversation.id})
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, self.messages[-1].id)
+
+    def test_older_pages_through_previous_cursor(self):
+        all_ids = [message.id for message in self.messages]
+        response = self.client.get('/api/auth/messages/', {'user_id': self.bob.id, 'limit': 4})
+        self.assertEqual(self.ids(response), all_ids[2:])
+        self.assertEqual(response.data['latest_id'], all_ids[-1])
+        response = self.client.get(
+            '/api/auth/messages/', {'user_id': self.bob.id, 'limit': 4, 'cursor': response.data['previous_cursor']}
+        )
+        self.assertEqual(self.ids(response), all_ids[:2])
+        self.assertIsNone(response.data['previous_cursor'])
+
+    def test_after_fetches_only_newer_messages(self):
+        all_ids = [message.id for message in self.messages]
+        response = self.client.get('/api/auth/messages/', {'user_id': self.bob.id, 'after': all_ids[2]})
+        self.assertEqual(self.ids(response), all_ids[3:])
+        self.assertEqual((response.data['latest_id'], response.data['has_more']), (all_ids[-1], False))
+
+        response = self.client.get('/api/auth/messages/', {'user_id': self.bob.id, 'after': all_ids[2], 'limit': 2})
+        self.assertEqual(self.ids(response), all_ids[3:5])
+        self.assertEqual((response.data['latest_id'], response.data['has_more']), (all_ids[4], True))
+
+        response = self.client.get('/api/auth/messages/', {'user_id': self.bob.id, 'after': all_ids[-1]})
+        self.assertEqual(self.ids(response), [])
+        self.assertEqual(response.data['latest_id'], all_ids[-1])
+
+    def test_bad_or_unknown_users(self):
+        self.assertEqual(self.client.get('/api/auth/messages/').status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/messages/', {'user_id': 'bob'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/messages/', {'user_id': self.bob.id, 'after': 'x'}).status_code, 400)
+        stranger = User.objects.create_user(username='carol', password='x', role='client')
+        response = self.client.get('/api/auth/messages/', {'user_id': stranger.id})
+        self.assertEqual((self.ids(response), response.data['latest_id']), ([], None))
+
+    def test_conversation_list_counts_unread_messages_per_receiver(self):
+        carol = User.objects.create_user(username='carol', password='x', role='professional')
+        DirectMessage.objects.create(sender=carol, receiver=self.alice, content='Hello')
+        DirectMessage.objects.filter(id=self.messages[1].id).update(is_read=True)
+
+        response = self.client.get('/api/auth/messages/conversations/')
+        self.assertEqual(
+            [(row['other_user']['name'], row['unread_count']) for row in response.data['results']],
+            [('carol', 1), ('bob', 2)],
+        )
+        self.assertEqual(response.data['results'][1]['last_message']['content'], 'Message 5')
+
+        self.client.force_authenticate(self.bob)
+        response = self.client.get('/api/auth/messages/conversations/')
+        self.assertEqual(
+            [(row['other_user']['name'], row['unread_count']) for row in response.data['results']], [('alice', 3)]
+        )
+
+
+class ModelCallGateTests(APITestCase):
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'timed out waiting for the gate')
+            time.sleep(0.005)
+
+    def test_waiters_are_served_in_arrival_order(self):
+        gate = ModelCallGate(limit=1, timeout=2)
+        served = []
+
+        def call(name):
+            with gate.slot():
+                served.append(name)
+
+        gate.acquire()
+        threads = []
+        for depth, name in enumerate(['first', 'second', 'third'], start=1):
+            thread = threading.Thread(target=call, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Start the next caller only once this one is queued
+            self.wait_until(lambda: gate.stats()['queue_depth'] == depth)
+        time.sleep(0.02)
+        gate.release()
+        for thread in threads:
+            thread.join(2)
+
+        self.assertEqual(served, ['first', 'second', 'third'])
+        stats = gate.stats()
+        self.assertEqual(
+            {key: stats[key] for key in ('in_flight', 'queue_depth', 'max_queue_depth', 'acquired', 'timeouts')},
+            {'in_flight': 0, 'queue_depth': 0, 'max_queue_depth': 3, 'acquired': 4, 'timeouts': 0},
+        )
+        self.assertGreaterEqual(stats['max_wait_ms'], 20)
+        self.assertGreater(stats['avg_wait_ms'], 0)
+
+    def test_busy_after_the_queue_timeout(self):
+        gate = ModelCallGate(limit=1, timeout=0.05)
+        gate.acquire()
+        with self.assertRaises(AIServiceBusy):
+            gate.acquire()
+        stats = gate.stats()
+        self.assertEqual((stats['timeouts'], stats['queue_depth'], stats['in_flight']), (1, 0, 1))
+        # The abandoned waiter does not swallow the next free slot
+        gate.release()
+        with gate.slot():
+            self.assertEqual(gate.stats()['in_flight'], 1)
+        self.assertEqual(gate.stats()['in_flight'], 0)
+
+    def test_async_waiters_share_the_queue(self):
+        gate = ModelCallGate(limit=1, timeout=2)
+
+        async def scenario():
+            gate.acquire()
+            waiter = asyncio.ensure_future(gate.acquire_async())
+            await asyncio.sleep(0.01)
+            self.assertEqual(gate.stats()['queue_depth'], 1)
+            # Released from another thread, as a sync view would
+            threading.Thread(target=gate.release).start()
+            await asyncio.wait_for(waiter, 2)
+            self.assertEqual(gate.stats()['in_flight'], 1)
+            gate.release()
+
+            gate.timeout = 0.05
+            async with gate.aslot():
+                with self.assertRaises(AIServiceBusy):
+                    await gate.acquire_async()
+
+        asyncio.run(scenario())
+        self.assertEqual(gate.stats()['in_flight'], 0)
+        self.assertEqual(gate.stats()['timeouts'], 1)
+
+
+@override_settings(AI_CONTEXT_TOKEN_BUDGET=30, AI_SUMMARY_TOKEN_BUDGET=12)
+class ConversationContextTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        user = User.objects.create_user(username='chatter', password='x', role='client')
+        self.session = ChatSession.objects.create(user=user)
+        for i in range(6):
+            self.say(i)
+
+    def say(self, i, content=None):
+        # 40 characters, i.e. 10 estimated tokens
+        content = content if content is not None else f'Message {i}. '.ljust(40, 'z')
+        return ChatMessage.objects.create(session=self.session, role='assistant' if i % 2 else 'user', content=content)
+
+    def window(self, context):
+        return [content[:10] for _, content, _ in context.turns]
+
+    def test_older_turns_are_summarized_to_fit_the_budget(self):
+        context = ai_context.ConversationContext.load(self.session)
+        self.assertEqual(self.window(context), ['Message 3.', 'Message 4.', 'Message 5.'])
+        self.assertEqual(context.tokens, 30)
+        self.assertEqual([turn['role'] for turn in context.contents()], ['model', 'user', 'model'])
+        # Message 0 no longer fits the summary budget either
+        self.assertEqual(context.summary, ['- SoulTalk AI: Message 1.', '- User: Message 2.'])
+        self.assertEqual(
+            context.system_instruction('Be kind.'),
+            'Be kind.\n\nSummary of the earlier part of this conversation:\n- SoulTalk AI: Message 1.\n- User: Message 2.',
+        )
+
+    def test_cached_window_reads_only_newer_messages(self):
+        ai_context.ConversationContext.load(self.session)
+        latest = self.say(6)
+        self.say(7, content='   ')
+        with self.assertNumQueries(1):
+            context = ai_context.ConversationContext.load(self.session)
+        self.assertEqual(self.window(context), ['Message 4.', 'Message 5.', 'Message 6.'])
+        self.assertEqual(context.summary, ['- User: Message 2.', '- SoulTalk AI: Message 3.'])
+        # Blank messages are skipped but still move the high-water mark
+        self.assertGreater(context.last_id, latest.id)
+
+        # The incremental window matches one rebuilt from scratch
+        cache.clear()
+        rebuilt = ai_context.ConversationContext.load(self.session)
+        self.assertEqual((rebuilt.turns, rebuilt.summary, rebuilt.last_id), (context.turns, context.summary, context.last_id))
+
+    def test_newest_turn_is_kept_even_over_budget(self):
+        self.say(6, content='A long first sentence that runs on. ' + 'word ' * 60)
+        context = ai_context.ConversationContext.load(self.session)
+        self.assertEqual(len(context.turns), 1)
+        self.assertGreater(context.tokens, 30)
+        self.assertEqual(context.summary, ['- User: Message 4.', '- SoulTalk AI: Message 5.'])
+
+    def test_summary_lines_keep_the_first_sentence(self):
+        self.assertEqual(ai_context._summary_line('user', 'I feel low. It started last week.'), '- User: I feel low.')
+        line = ai_context._summary_line('assistant', 'x' * 200)
+        self.assertEqual(line, '- SoulTalk AI: ' + 'x' * ai_context.SUMMARY_LINE_CHARS + '...')
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='chatter', password='x', role='client')
+        self.responses = ResponseCache(enabled=True, maxsize=2, ttl=60, max_prompt_chars=40)
+
+    def context(self, turns, summary=()):
+        return mock.Mock(turns=[(role, text, 1) for role, text in turns], summary=list(summary))
+
+    def key(self, prompt, **kwargs):
+        return self.responses.key_for(self.context([('user', prompt)]), kwargs.get('model', 'm'), kwargs.get('system', 's'))
+
+    def test_only_short_first_turns_are_cacheable(self):
+        self.assertIsNotNone(self.key('I feel anxious'))
+        self.assertIsNone(self.key('x' * 41))
+        self.assertIsNone(self.responses.key_for(self.context([('assistant', 'Hello')]), 'm', 's'))
+        self.assertIsNone(self.responses.key_for(self.context([('user', 'Hi'), ('assistant', 'Hello')]), 'm', 's'))
+        self.assertIsNone(self.responses.key_for(self.context([('user', 'Hi')], summary=['- User: Hi']), 'm', 's'))
+        self.responses.enabled = False
+        self.assertIsNone(self.key('I feel anxious'))
+
+    def test_keys_normalize_the_prompt_but_not_the_model_or_instruction(self):
+        self.assertEqual(normalize_prompt('  I feel ANXIOUS!!\n'), 'i feel anxious')
+        self.assertEqual(self.key('I feel anxious!!'), self.key('i  feel anxious'))
+        self.assertNotEqual(self.key('I feel anxious'), self.key('I feel anxious', model='other'))
+        self.assertNotEqual(self.key('I feel anxious'), self.key('I feel anxious', system='other'))
+
+    def test_hits_misses_and_eviction(self):
+        keys = [self.key(prompt) for prompt in ('one', 'two', 'three')]
+        self.assertIsNone(self.responses.get(keys[0]))
+        self.responses.set(keys[0], 'Reply one')
+        self.responses.set(keys[1], '')
+        self.responses.set(keys[1], 'Reply two')
+        self.assertEqual(self.responses.get(keys[0]), 'Reply one')
+        # The least recently used entry makes room
+        self.responses.set(keys[2], 'Reply three')
+        self.assertIsNone(self.responses.get(keys[1]))
+        self.assertIsNone(self.responses.get(None))
+        self.assertEqual(self.responses.stats(), {
+            'enabled': True, 'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 2, 'stores': 3, 'hit_rate': 0.333,
+        })
+
+        short_lived = ResponseCache(enabled=True, maxsize=2, ttl=0.05, max_prompt_chars=40)
+        short_lived.set(keys[0], 'Reply one')
+        self.assertEqual(short_lived.get(keys[0]), 'Reply one')
+        time.sleep(0.06)
+        self.assertIsNone(short_lived.get(keys[0]))
+
+    def test_build_request_stops_caching_once_there_is_history(self):
+        self.addCleanup(response_cache._cache.clear)
+        session = ChatSession.objects.create(user=self.user)
+        ChatMessage.objects.create(session=session, role='user', content='I feel anxious')
+        with mock.patch.object(response_cache, 'enabled', True):
+            _, first_key = build_request(session)
+            ChatMessage.objects.create(session=session, role='assistant', content='I am here for you.')
+            ChatMessage.objects.create(session=session, role='user', content='I feel anxious')
+            request_kwargs, key = build_request(session)
+        self.assertIsNotNone(first_key)
+        self.assertIsNone(key)
+        self.assertEqual(len(request_kwargs['contents']), 3)
+
+    def test_repeated_first_turns_skip_the_model(self):
+        self.addCleanup(response_cache._cache.clear)
+        self.client.force_authenticate(self.user)
+        with mock.patch.object(response_cache, 'enabled', True), mock.patch('accounts.views.get_client') as get_client_mock:
+            get_client_mock.return_value.models.generate_content.return_value.text = 'You are not alone.'
+            replies = [
+                self.client.post('/api/auth/ai-chat/', {'message': message}, format='json').json()['reply']
+                for message in ('I feel anxious', 'i feel anxious!')
+            ]
+        self.assertEqual(replies, ['You are not alone.'] * 2)
+        get_client_mock.return_value.models.generate_content.assert_called_once()
+        self.assertEqual(ChatMessage.objects.filter(role='assistant').count(), 2)
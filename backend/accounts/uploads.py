@@ -0,0 +1,253 @@
+"""
+Direct-to-storage uploads for journal recordings, verification documents and
+profile photos.
+
+The bytes do not pass through a web worker. Three steps replace the
+multipart form post:
+
+1. start_upload() (POST uploads/) checks the target, type and size and
+   returns where to send the file plus a signed upload token.
+2. The client PUTs the file there itself.
+3. finalize_upload() (POST uploads/finalize/) confirms the object exists,
+   re-checks its size and stores its key in the model's FileField.
+
+The token names the key, owner and target, so finalize never trusts a key
+chosen by the client.
+
+With S3 storage (settings.USE_S3) the destination is a presigned S3 URL.
+Files over MULTIPART_THRESHOLD become a multipart upload with one URL per
+part, and finalize completes it. The bucket needs a CORS rule that allows
+PUT and exposes the ETag header. It also needs a lifecycle rule that aborts
+incomplete multipart uploads and expires objects that were never
+finalized.
+
+With the local filesystem storage the URL points at LocalUploadView
+(PUT uploads/local/<token>/). That view streams the request body to disk
+in chunks, so the frontend uses the same code path in development.
+"""
+import math
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from PIL import Image
+
+from .models import ClientProfile, JournalEntry, ProfessionalProfile
+
+MB = 1024 * 1024
+
+# Served back from the storage domain, so only types that browsers will not
+# run as a page are accepted (no HTML, no SVG). The stored extension comes from
+# this table, never from the client's filename.
+IMAGE_TYPES = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+MEDIA_TYPES = {
+    'audio/mpeg': '.mp3', 'audio/mp4': '.m4a', 'audio/aac': '.aac', 'audio/wav': '.wav',
+    'audio/x-wav': '.wav', 'audio/ogg': '.ogg', 'audio/webm': '.weba',
+    'video/mp4': '.mp4', 'video/webm': '.webm', 'video/quicktime': '.mov',
+}
+
+TARGETS = {
+    'journal_media': {
+        'prefix': 'journal_media/', 'max_size': 500 * MB,
+        'content_types': MEDIA_TYPES, 'roles': ('professional',),
+    },
+    'profile_photo': {
+        'prefix': 'profiles/', 'max_size': 10 * MB,
+        'content_types': IMAGE_TYPES, 'roles': ('client', 'professional'),
+    },
+    'id_image': {
+        'prefix': 'ids/', 'max_size': 10 * MB,
+        'content_types': IMAGE_TYPES, 'roles': ('professional',),
+    },
+    'id_image_back': {
+        'prefix': 'ids/', 'max_size': 10 * MB,
+        'content_types': IMAGE_TYPES, 'roles': ('professional',),
+    },
+    'certificates': {
+        'prefix': 'certificates/', 'max_size': 20 * MB,
+        'content_types': {**IMAGE_TYPES, 'application/pdf': '.pdf'}, 'roles': ('professional',),
+    },
+}
+
+MULTIPART_THRESHOLD = 64 * MB
+# S3 parts must be at least 5 MB (except the last) and at most 10,000 per upload
+PART_SIZE = 16 * MB
+MAX_PARTS = 10000
+# Finalize may come well after the URLs expire when a long multipart upload is slow
+TOKEN_MAX_AGE = 60 * 60 * 24
+
+SALT = 'accounts.uploads'
+
+
+class UploadError(Exception):
+    pass
+
+
+def _s3():
+    # The storage has no location prefix, so keys are the names FileFields store
+    return default_storage.connection.meta.client, default_storage.bucket_name
+
+
+def _storage_errors():
+    from botocore.exceptions import BotoCoreError, ClientError
+    return BotoCoreError, ClientError
+
+
+def _presign(method, expires_in=None, **params):
+    client, bucket = _s3()
+    return client.generate_presigned_url(
+        method, Params={'Bucket': bucket, **params}, ExpiresIn=expires_in or settings.UPLOAD_URL_TTL
+    )
+
+
+def _media_type(content_type):
+    """'audio/webm;codecs=opus' -> 'audio/webm'."""
+    return (content_type or '').split(';')[0].strip().lower()
+
+
+def start_upload(user, target, content_type, size, build_url):
+    """
+    Validate an upload and return {'upload_token', 'key', 'method', 'url',
+    'headers'} for a single PUT, or {'upload_token', 'key', 'method',
+    'part_size', 'parts': [{'part_number', 'url'}]} for a multipart upload.
+    build_url turns a path into an absolute URL (request.build_absolute_uri).
+    """
+    spec = TARGETS.get(target)
+    if spec is None:
+        raise UploadError(f"Unknown upload target. Use one of: {', '.join(TARGETS)}")
+    if user.role not in spec['roles']:
+        raise UploadError(f"Your account cannot upload {target}")
+    content_type = _media_type(content_type)
+    if content_type not in spec['content_types']:
+        raise UploadError(f"{target} must be one of: {', '.join(spec['content_types'])}")
+    if size <= 0 or size > spec['max_size']:
+        raise UploadError(f"{target} files must be between 1 byte and {spec['max_size'] // MB} MB")
+
+    key = f"{spec['prefix']}{user.id}/{uuid.uuid4().hex}{spec['content_types'][content_type]}"
+    ticket = {'key': key, 'user': user.id, 'target': target, 'content_type': content_type}
+    headers = {'Content-Type': content_type}
+
+    if not settings.USE_S3:
+        token = signing.dumps(ticket, salt=SALT)
+        url = build_url(reverse('local_upload', args=[token]))
+        return {'upload_token': token, 'key': key, 'method': 'PUT', 'url': url, 'headers': headers}
+
+    try:
+        if size <= MULTIPART_THRESHOLD:
+            url = _presign('put_object', Key=key, ContentType=content_type)
+            return {'upload_token': signing.dumps(ticket, salt=SALT), 'key': key, 'method': 'PUT', 'url': url, 'headers': headers}
+
+        client, bucket = _s3()
+        ticket['upload_id'] = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)['UploadId']
+        part_size = max(PART_SIZE, math.ceil(size / MAX_PARTS))
+        parts = [
+            {
+                'part_number': number,
+                'url': _presign('upload_part', Key=key, UploadId=ticket['upload_id'], PartNumber=number),
+            }
+            for number in range(1, math.ceil(size / part_size) + 1)
+        ]
+    except _storage_errors() as e:
+        raise UploadError(f"Storage is unavailable: {e}") from e
+    return {'upload_token': signing.dumps(ticket, salt=SALT), 'key': key, 'method': 'PUT', 'part_size': part_size, 'parts': parts}
+
+
+def read_token(token, max_age=TOKEN_MAX_AGE):
+    try:
+        return signing.loads(token, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired upload token")
+
+
+def _complete_multipart(ticket, parts):
+    try:
+        parts = sorted(
+            ({'PartNumber': int(part['part_number']), 'ETag': str(part['etag'])} for part in parts or ()),
+            key=lambda part: part['PartNumber'],
+        )
+    except (KeyError, TypeError, ValueError):
+        raise UploadError("parts must be a list of {part_number, etag}")
+    if not parts:
+        raise UploadError("parts are required to finish a multipart upload")
+    client, bucket = _s3()
+    try:
+        client.complete_multipart_upload(
+            Bucket=bucket, Key=ticket['key'], UploadId=ticket['upload_id'], MultipartUpload={'Parts': parts}
+        )
+    except _storage_errors() as e:
+        raise UploadError(f"The upload could not be completed: {e}") from e
+
+
+def _attachment(user, target, journal_entry_id):
+    """The instance and FileField name an upload of `target` is stored on."""
+    if target == 'journal_media':
+        entry = None
+        if str(journal_entry_id or '').isdigit():
+            entry = JournalEntry.objects.filter(id=journal_entry_id, professional=user).first()
+        if entry is None:
+            raise UploadError("Journal entry not found")
+        return entry, 'media_file'
+    profile_model = ClientProfile if user.role == 'client' else ProfessionalProfile
+    profile, _ = profile_model.objects.get_or_create(user=user)
+    return profile, target
+
+
+def _check_image(key, content_type):
+    """Decode the header of an uploaded image, as an ImageField form upload would."""
+    try:
+        with default_storage.open(key) as f:
+            image = Image.open(f)
+            image.verify()
+    except Exception:
+        return False
+    return Image.MIME.get(image.format) == content_type
+
+
+def finalize_upload(user, token, parts=None, journal_entry_id=None):
+    """Attach an uploaded object to its model field; returns the updated instance."""
+    ticket = read_token(token)
+    if ticket['user'] != user.id:
+        raise UploadError("Invalid or expired upload token")
+    key, spec = ticket['key'], TARGETS[ticket['target']]
+    instance, field = _attachment(user, ticket['target'], journal_entry_id)
+
+    if 'upload_id' in ticket:
+        _complete_multipart(ticket, parts)
+    if not default_storage.exists(key):
+        raise UploadError("The file has not been uploaded yet")
+    if default_storage.size(key) > spec['max_size']:
+        default_storage.delete(key)
+        raise UploadError(f"{ticket['target']} files can be at most {spec['max_size'] // MB} MB")
+    if ticket['content_type'] in IMAGE_TYPES and not _check_image(key, ticket['content_type']):
+        default_storage.delete(key)
+        raise UploadError("The file is not a valid image of the declared type")
+
+    previous = getattr(instance, field).name
+    setattr(instance, field, key)
+    update_fields = [field]
+    if any(f.name == 'updated_at' for f in instance._meta.concrete_fields):
+        update_fields.append('updated_at')
+    instance.save(update_fields=update_fields)
+    if previous and previous != key:
+        # Only once the new key is committed; the replaced file has no other owner
+        transaction.on_commit(lambda: default_storage.delete(previous))
+    return instance
+
+
+def receive_local_upload(token, body, content_length, content_type):
+    """Stream a PUT body to the local storage under the token's key (development stand-in for S3)."""
+    ticket = read_token(token, max_age=settings.UPLOAD_URL_TTL)
+    # A presigned S3 PUT is signed for one Content-Type; hold the stand-in to the same rule
+    if _media_type(content_type) != ticket['content_type']:
+        raise UploadError(f"Content-Type must be {ticket['content_type']}")
+    max_size = TARGETS[ticket['target']]['max_size']
+    if not content_length or content_length > max_size:
+        raise UploadError(f"{ticket['target']} files must be between 1 byte and {max_size // MB} MB")
+    # A retried PUT replaces the earlier attempt instead of getting a new name
+    default_storage.delete(ticket['key'])
+    default_storage.save(ticket['key'], File(body, name=ticket['key']))
+    return ticket['key']
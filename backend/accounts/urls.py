@@ -1,14 +1,15 @@
 from django.urls import path
 from .views import (
-    RegisterView, UserDetailView, AIChatView, 
+    RegisterView, UserDetailView, AIChatView, AIGateStatsView,
     ChatSessionListView, ChatSessionDetailView, 
-    UserListView, ProfessionalListView, ClientListView,
-    AppointmentListCreateView, AppointmentDetailView, NotificationListView, NotificationMarkReadView,
-    MoodUpdateListCreateView, ConnectionListCreateView, ConnectionDetailView, UpdateOnlineStatusView, DirectMessageView,
+    UserListView, ProfessionalListView, ProfessionalDirectoryView, ProfessionalSearchView, ClientListView,
+    AppointmentListCreateView, AppointmentDetailView, AvailabilityWindowListCreateView, AvailabilityWindowDetailView, ProfessionalSlotsView, NotificationListView, NotificationMarkReadView, NotificationBulkMarkReadView, NotificationUnreadCountView,
+    MoodUpdateListCreateView, MoodAnalyticsView, ClientMoodAnalyticsView, ConnectionListCreateView, ConnectionDetailView, UpdateOnlineStatusView, PresenceHeartbeatView, DirectMessageView, ConversationListView,
     PublicUserDetailView, InitiateLiveSessionView, InitializePaymentView, VerifyPaymentView,
-    PaymentListView, PaymentCallbackView, JournalEntryListCreateView, JournalEntryDetailView,
+    PaymentListView, PaymentCallbackView, PaymentGatewayStatsView, JournalEntryListCreateView, JournalEntryDetailView,
+    UploadStartView, UploadFinalizeView, LocalUploadView,
     ProfessionalEarningsView, BankListView, WithdrawalRequestView,
-    ServiceRequestListCreateView, ServiceRequestDetailView, 
+    ServiceRequestListCreateView, ServiceRequestFeedView, ServiceRequestDetailView, ServiceRequestMatchesView, 
     ServiceProposalListCreateView, ServiceProposalActionView,
     PublicStatsView
 )
@@ -23,32 +24,50 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('me/', UserDetailView.as_view(), name='me'),
     path('ai-chat/', AIChatView.as_view(), name='ai_chat'),
+    path('ai-chat/stats/', AIGateStatsView.as_view(), name='ai_chat_stats'),
     path('chat-sessions/', ChatSessionListView.as_view(), name='chat_session_list'),
     path('chat-sessions/<int:pk>/', ChatSessionDetailView.as_view(), name='chat_session_detail'),
     path('users/', UserListView.as_view(), name='user_list'),
     path('professionals/', ProfessionalListView.as_view(), name='professional_list'),
+    path('professionals/directory/', ProfessionalDirectoryView.as_view(), name='professional_directory'),
+    path('professionals/search/', ProfessionalSearchView.as_view(), name='professional_search'),
     path('clients/', ClientListView.as_view(), name='client_list'),
     path('appointments/', AppointmentListCreateView.as_view(), name='appointment_list_create'),
     path('appointments/<int:pk>/', AppointmentDetailView.as_view(), name='appointment_detail'),
+    path('professional/availability/', AvailabilityWindowListCreateView.as_view(), name='availability_list_create'),
+    path('professional/availability/<int:pk>/', AvailabilityWindowDetailView.as_view(), name='availability_detail'),
+    path('professionals/<int:pk>/slots/', ProfessionalSlotsView.as_view(), name='professional_slots'),
     path('notifications/', NotificationListView.as_view(), name='notification_list'),
     path('notifications/<int:pk>/read/', NotificationMarkReadView.as_view(), name='notification_mark_read'),
+    path('notifications/read/', NotificationBulkMarkReadView.as_view(), name='notification_bulk_mark_read'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification_unread_count'),
     path('mood-updates/', MoodUpdateListCreateView.as_view(), name='mood_update_list_create'),
+    path('mood-updates/analytics/', MoodAnalyticsView.as_view(), name='mood_analytics'),
+    path('professional/clients/mood-analytics/', ClientMoodAnalyticsView.as_view(), name='client_mood_analytics'),
     path('connections/', ConnectionListCreateView.as_view(), name='connection_list_create'),
     path('connections/<int:pk>/', ConnectionDetailView.as_view(), name='connection_detail'),
     path('professional/status/', UpdateOnlineStatusView.as_view(), name='update_online_status'),
+    path('professional/heartbeat/', PresenceHeartbeatView.as_view(), name='presence_heartbeat'),
     path('messages/', DirectMessageView.as_view(), name='direct_messages'),
+    path('messages/conversations/', ConversationListView.as_view(), name='conversation_list'),
     path('users/detail/<int:pk>/', PublicUserDetailView.as_view(), name='public_user_detail'),
     path('live/initiate/', InitiateLiveSessionView.as_view(), name='initiate_live_session'),
     path('payment/initialize/', InitializePaymentView.as_view(), name='payment_initialize'),
     path('payment/verify/<str:tx_ref>/', VerifyPaymentView.as_view(), name='payment_verify'),
     path('payment/history/', PaymentListView.as_view(), name='payment_history'),
     path('payment/callback/<str:tx_ref>/', PaymentCallbackView.as_view(), name='payment_callback'),
+    path('payment/gateway-stats/', PaymentGatewayStatsView.as_view(), name='payment_gateway_stats'),
     path('journal-entries/', JournalEntryListCreateView.as_view(), name='journal_entry_list_create'),
     path('journal-entries/<int:pk>/', JournalEntryDetailView.as_view(), name='journal_entry_detail'),
+    path('uploads/', UploadStartView.as_view(), name='upload_start'),
+    path('uploads/finalize/', UploadFinalizeView.as_view(), name='upload_finalize'),
+    path('uploads/local/<str:token>/', LocalUploadView.as_view(), name='local_upload'),
     path('payout/earnings/', ProfessionalEarningsView.as_view(), name='payout_earnings'),
     path('payout/banks/', BankListView.as_view(), name='payout_banks'),
     path('payout/withdraw/', WithdrawalRequestView.as_view(), name='payout_withdraw'),
     path('service-requests/', ServiceRequestListCreateView.as_view(), name='service_request_list_create'),
+    path('service-requests/feed/', ServiceRequestFeedView.as_view(), name='service_request_feed'),
+    path('service-requests/<int:pk>/matches/', ServiceRequestMatchesView.as_view(), name='service_request_matches'),
     path('service-requests/<int:pk>/', ServiceRequestDetailView.as_view(), name='service_request_detail'),
     path('service-proposals/', ServiceProposalListCreateView.as_view(), name='service_proposal_list_create'),
     path('service-proposals/<int:pk>/action/', ServiceProposalActionView.as_view(), name='service_proposal_action'),
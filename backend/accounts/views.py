@@ -1,23 +1,44 @@
 from rest_framework import generics, permissions, views, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.conf import settings
-from google import genai
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from .ai import (
+    MODEL_NAME, AIServiceBusy, EventStreamRenderer, ai_gate, build_request,
+    can_stream, get_client, stream_reply
+)
+from .ai_cache import response_cache
+from .availability import SlotUnavailable, free_slots, guarded, parse_start_date, within_availability
+from .bank_catalog import BankCatalogUnavailable, get_banks
+from .caches import cache_is_shared
+from .chapa import ChapaNotConfigured, ChapaUnavailable, chapa
+from . import ledger, matching, mood, presence
+from .notifications import mark_read, unread_count
+from .pagination import cursor_values, encode_cursor, get_page_size, paginate_keyset
+from .payouts import InsufficientFunds, request_withdrawal
+from .payment_reconciler import mock_payments, settle, wait_for_status_change
+from .search import search_professionals
+from .stats import get_stats
+from .uploads import UploadError, finalize_upload, receive_local_upload, start_upload
 from .serializers import (
     UserSerializer, ChatSessionSerializer, ChatMessageSerializer,
     AppointmentSerializer, NotificationSerializer, MoodUpdateSerializer, ConnectionSerializer,
-    PaymentSerializer, JournalEntrySerializer, WithdrawalSerializer,
+    PaymentSerializer, JournalEntrySerializer, WithdrawalSerializer, LedgerEntrySerializer, AvailabilityWindowSerializer,
     ServiceRequestSerializer, ServiceProposalSerializer
 )
 from .models import (
-    User, ChatSession, ChatMessage, Appointment, Notification, MoodUpdate, 
+    User, ChatSession, ChatMessage, Appointment, AvailabilityWindow, Notification, MoodUpdate, 
     Connection, ProfessionalProfile, Payment, JournalEntry, Withdrawal,
-    ServiceRequest, ServiceProposal
+    ServiceRequest, ServiceProposal, Conversation, DirectMessage
 )
 import uuid
-import requests
 import json
 from datetime import datetime
 
@@ -50,18 +71,59 @@ class ChatSessionDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         messages = ChatMessage.objects.filter(session=instance)
-        message_serializer = ChatMessageSerializer(messages, many=True)
+        page_size = get_page_size(request)
+        since = request.query_params.get('since')
+
+        if since:
+            # Incremental sync: only messages newer than the client's last one
+            page, more_cursor = paginate_keyset(messages, ['timestamp', 'id'], since, page_size)
+            previous_cursor = None
+            has_more = more_cursor is not None
+        else:
+            # Newest page first (or the page before ?cursor=), shown oldest -> newest
+            page, previous_cursor = paginate_keyset(
+                messages, ['-timestamp', '-id'], request.query_params.get('cursor'), page_size
+            )
+            page.reverse()
+            has_more = False
+
+        if page:
+            since_cursor = encode_cursor(cursor_values(page[-1], ['timestamp', 'id']))
+        else:
+            since_cursor = since
+
         return Response({
             'session': serializer.data,
-            'messages': message_serializer.data
+            'messages': ChatMessageSerializer(page, many=True).data,
+            'previous_cursor': previous_cursor,
+            'since_cursor': since_cursor,
+            'has_more': has_more,
         })
 
 class AIChatView(views.APIView):
+    """
+    Reply to a chat message. With `stream` (or Accept: text/event-stream)
+    the reply is sent as server-sent events, but only when the app runs
+    under ASGI (soultalk_backend/asgi.py). Under WSGI the same request gets
+    the single JSON reply, so streaming clients must check the response
+    Content-Type.
+    """
     permission_classes = (IsAuthenticated,)
+    renderer_classes = views.APIView.renderer_classes + [EventStreamRenderer]
+
+    def perform_content_negotiation(self, request, force=False):
+        renderer, media_type = super().perform_content_negotiation(request, force)
+        if isinstance(renderer, EventStreamRenderer) and not can_stream(request):
+            return JSONRenderer(), JSONRenderer.media_type
+        return renderer, media_type
 
     def post(self, request):
         message_content = request.data.get('message')
         session_id = request.data.get('session_id')
+        wants_stream = can_stream(request) and (
+            str(request.data.get('stream', '')).lower() in ('1', 'true')
+            or 'text/event-stream' in request.headers.get('Accept', '')
+        )
         
         if not message_content:
             return Response({'error': 'Message is required'}, status=400)
@@ -79,43 +141,28 @@ class AIChatView(views.APIView):
             content=message_content
         )
 
-        try:
-            print(f"Debug: Using Gemini Key: {settings.GEMINI_API_KEY[:5]}...")
-            client = genai.Client(api_key=settings.GEMINI_API_KEY)
-            
-            history = []
-            # Get last 10 messages for context (proper ordering)
-            # We need them chronological for Gemini: Oldest -> Newest
-            previous_messages = ChatMessage.objects.filter(session=session).order_by('-timestamp')[:10]
-            # Reverse to get chronological order from the slice
-            chronological_msgs = reversed(previous_messages)
-            
-            for msg in chronological_msgs:
-                role = 'user' if msg.role == 'user' else 'model'
-                # Gemini expects valid non-empty content
-                if msg.content and msg.content.strip():
-                     history.append({'role': role, 'parts': [{'text': msg.content}]})
-
-            print(f"Debug: History length: {len(history)}")
-
-            # Strict prompt to keep the AI on topic
-            prompt_context = (
-                "You are SoulTalk AI, a compassionate mental wellness companion. "
-                "Your purpose is strictly limited to providing emotional support and mental health guidance. "
-                "STRICT RULE: You must ONLY answer questions directly related to mental health, wellness, and emotional well-being. "
-                "If the user asks about ANY unrelated topic (e.g., coding, math, general knowledge, recipes, technology, etc.), "
-                "you must politely refuse to answer. State that you are specifically designed to support their mental health "
-                "and ask if they would like to share how they are feeling or discuss a wellness topic instead. "
-                "Maintain a supportive, professional, and empathetic tone at all times.\n\n"
-                "User says: "
-            )
-            full_prompt = prompt_context + message_content
-            
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=history + [{'role': 'user', 'parts': [{'text': full_prompt}]}]
+        request_kwargs, cache_key = build_request(session)
+
+        if wants_stream:
+            response = StreamingHttpResponse(
+                stream_reply(session, request_kwargs, cache_key),
+                content_type='text/event-stream'
             )
-            ai_reply = response.text
+            response['Cache-Control'] = 'no-cache'
+            # Stop nginx-style proxies from buffering the stream
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        try:
+            ai_reply = response_cache.get(cache_key)
+            if ai_reply is None:
+                with ai_gate.slot():
+                    response = get_client().models.generate_content(
+                        model=MODEL_NAME,
+                        **request_kwargs
+                    )
+                ai_reply = response.text
+                response_cache.set(cache_key, ai_reply)
             
             print(f"Debug: AI Reply received: {ai_reply[:20]}...")
 
@@ -133,12 +180,22 @@ class AIChatView(views.APIView):
                 'title': session.title
             })
 
+        except AIServiceBusy as e:
+            return Response({'error': str(e)}, status=503, headers={'Retry-After': '5'})
         except Exception as e:
             import traceback
             traceback.print_exc()
             print(f"Gemini API Error Detail: {str(e)}")
             return Response({'error': f"AI Service Error: {str(e)}"}, status=500)
 
+class AIGateStatsView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        return Response({**ai_gate.stats(), 'response_cache': response_cache.stats()})
+
 class UserListView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -146,7 +203,7 @@ class UserListView(views.APIView):
         if request.user.role != 'admin':
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        users = User.objects.all()
+        users = User.objects.with_profiles()
         data = {
             'clients': UserSerializer(users.filter(role='client'), many=True).data,
             'professionals': UserSerializer(users.filter(role='professional'), many=True).data,
@@ -162,7 +219,7 @@ class UserListView(views.APIView):
         if not user_id:
             return Response({'error': 'User ID is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        user = get_object_or_404(User, id=user_id)
+        user = get_object_or_404(User.objects.with_profiles(), id=user_id)
         serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -175,10 +232,66 @@ class ProfessionalListView(generics.ListAPIView):
 
     def get_queryset(self):
         # Clients should only see verified professionals
+        professionals = User.objects.with_profiles().filter(role='professional')
         if self.request.user.role == 'client':
-            return User.objects.filter(role='professional', professional_profile__verified=True)
+            return professionals.filter(professional_profile__verified=True)
         # Admins or others can see all
-        return User.objects.filter(role='professional')
+        return professionals
+
+class ProfessionalDirectoryView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    SORT_ORDERINGS = {
+        'rating': ['-rating', '-id'],
+        'sessions_completed': ['-sessions_completed', '-id'],
+    }
+
+    def get(self, request):
+        params = request.query_params
+        ordering = self.SORT_ORDERINGS.get(params.get('sort', 'rating'))
+        if ordering is None:
+            return Response({'error': f"sort must be one of: {', '.join(self.SORT_ORDERINGS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = ProfessionalProfile.objects.filter(user__role='professional').select_related('user')
+        # Clients only ever see verified professionals
+        if request.user.role == 'client' or params.get('verified', 'true').lower() == 'true':
+            profiles = profiles.filter(verified=True)
+        if params.get('is_online') is not None:
+            profiles = profiles.filter(is_online=params['is_online'].lower() == 'true')
+        if params.get('language'):
+            profiles = profiles.filter(language_entries__name=params['language'].strip().lower())
+        if params.get('specialization'):
+            profiles = profiles.filter(specialization__icontains=params['specialization'].strip())
+        if params.get('location'):
+            profiles = profiles.filter(location__iexact=params['location'].strip())
+
+        page, next_cursor = paginate_keyset(profiles, ordering, params.get('cursor'), get_page_size(request))
+        return Response({
+            'results': UserSerializer([profile.user for profile in page], many=True).data,
+            'next_cursor': next_cursor,
+        })
+
+class ProfessionalSearchView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile_ids, next_cursor = search_professionals(
+            query,
+            cursor=request.query_params.get('cursor'),
+            page_size=get_page_size(request, default=20),
+            verified_only=request.user.role == 'client',
+        )
+        users = User.objects.with_profiles().filter(professional_profile__id__in=profile_ids)
+        by_profile = {user.professional_profile.id: user for user in users}
+        ranked = [by_profile[profile_id] for profile_id in profile_ids if profile_id in by_profile]
+        return Response({
+            'results': UserSerializer(ranked, many=True).data,
+            'next_cursor': next_cursor,
+        })
 
 class ClientListView(generics.ListAPIView):
     serializer_class = UserSerializer
@@ -197,76 +310,39 @@ class ClientListView(generics.ListAPIView):
             ).values_list('client_id', flat=True)
             
             client_ids = set(connected_client_ids) | set(appointment_client_ids)
-            return User.objects.filter(id__in=client_ids)
-        return User.objects.filter(role='client')
+            return User.objects.with_profiles().filter(id__in=client_ids)
+        return User.objects.with_profiles().filter(role='client')
 
 class AppointmentListCreateView(generics.ListCreateAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        from django.utils import timezone
-        
-        # Auto-cancel past appointments
-        now = timezone.now()
-        today = now.date()
-        current_time = now.time()
-        
-        # Cancel appointments from previous days
-        Appointment.objects.filter(
-            status__in=['pending', 'upcoming'],
-            date__lt=today
-        ).update(status='cancelled')
-        
-        # Cancel appointments from today that have passed
-        Appointment.objects.filter(
-            status__in=['pending', 'upcoming'],
-            date=today,
-            time__lt=current_time
-        ).update(status='cancelled')
-
-        # Detect and fix double bookings (keep earliest, cancel others)
-        from django.db.models import Count
-        duplicates = Appointment.objects.filter(
-            status__in=['pending', 'upcoming']
-        ).values('client', 'professional').annotate(
-            count=Count('id')
-        ).filter(count__gt=1)
-
-        for dup in duplicates:
-            # Get all active appointments for this pair
-            apps = Appointment.objects.filter(
-                client_id=dup['client'],
-                professional_id=dup['professional'],
-                status__in=['pending', 'upcoming']
-            ).order_by('created_at') # Keep earliest
-            
-            # Skip the first one, cancel the rest
-            for app in apps[1:]:
-                app.status = 'cancelled'
-                app.save()
-
+        # Expiry runs in the sweep_appointments command, so listing stays a
+        # plain read.
+        queryset = Appointment.objects.select_related(
+            'client__client_profile', 'professional__professional_profile'
+        )
         user = self.request.user
         if user.role == 'client':
-            return Appointment.objects.filter(client=user).order_by('date', 'time')
+            return queryset.filter(client=user).order_by('date', 'time')
         elif user.role == 'professional':
-            return Appointment.objects.filter(professional=user).order_by('date', 'time')
-        return Appointment.objects.all().order_by('date', 'time')
+            return queryset.filter(professional=user).order_by('date', 'time')
+        return queryset.order_by('date', 'time')
 
     def perform_create(self, serializer):
-        client = self.request.user
-        professional = serializer.validated_data['professional']
-        
-        # Check for existing active appointment
-        if Appointment.objects.filter(
-            client=client, 
-            professional=professional, 
-            status__in=['pending', 'upcoming']
-        ).exists():
-             raise ValidationError("You already have an active appointment with this professional.")
-
-        # Default status is 'pending' from model, but we can be explicit
-        serializer.save(client=self.request.user)
+        data = serializer.validated_data
+        start_at, end_at = Appointment(
+            date=data['date'], time=data['time'], duration_minutes=data.get('duration_minutes', 60)
+        ).slot_bounds()
+        if not within_availability(data['professional'].id, start_at, end_at):
+            raise ValidationError("The professional is not available at that time.")
+
+        # Overlaps and duplicate bookings are refused by the database (see accounts/availability.py)
+        try:
+            guarded(lambda: serializer.save(client=self.request.user))
+        except SlotUnavailable as e:
+            raise ValidationError(str(e))
 
 class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AppointmentSerializer
@@ -280,22 +356,102 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Appointment.objects.filter(professional=user)
         return Appointment.objects.all()
 
-class NotificationListView(generics.ListAPIView):
-    serializer_class = NotificationSerializer
+    def perform_update(self, serializer):
+        data, appointment = serializer.validated_data, serializer.instance
+        if data.keys() & {'date', 'time', 'duration_minutes', 'professional'}:
+            start_at, end_at = Appointment(
+                date=data.get('date', appointment.date),
+                time=data.get('time', appointment.time),
+                duration_minutes=data.get('duration_minutes', appointment.duration_minutes),
+            ).slot_bounds()
+            professional = data.get('professional', appointment.professional)
+            if not within_availability(professional.id, start_at, end_at):
+                raise ValidationError("The professional is not available at that time.")
+
+        try:
+            guarded(serializer.save)
+        except SlotUnavailable as e:
+            raise ValidationError(str(e))
+
+class AvailabilityWindowListCreateView(generics.ListCreateAPIView):
+    serializer_class = AvailabilityWindowSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return AvailabilityWindow.objects.filter(professional=self.request.user)
+
+    def perform_create(self, serializer):
+        if self.request.user.role != 'professional':
+            raise ValidationError("Only professionals can set working hours.")
+        serializer.save(professional=self.request.user)
+
+class AvailabilityWindowDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = AvailabilityWindowSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return AvailabilityWindow.objects.filter(professional=self.request.user)
+
+class ProfessionalSlotsView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, pk):
+        professional = get_object_or_404(User, id=pk, role='professional')
+        try:
+            start = parse_start_date(request.query_params.get('start'))
+            days = int(request.query_params.get('days', 7))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({
+            'professional': professional.id,
+            'days': free_slots(professional.id, start, days),
+        })
+
+class NotificationListView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        page, next_cursor = paginate_keyset(
+            Notification.objects.filter(user=request.user),
+            ['-created_at', '-id'],
+            request.query_params.get('cursor'),
+            get_page_size(request)
+        )
+        return Response({
+            'results': NotificationSerializer(page, many=True).data,
+            'next_cursor': next_cursor,
+            'unread_count': unread_count(request.user.id),
+        })
 
 class NotificationMarkReadView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, pk):
-        notification = get_object_or_404(Notification, id=pk, user=request.user)
-        notification.is_read = True
-        notification.save()
+        if not Notification.objects.filter(id=pk, user=request.user).exists():
+            return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        mark_read(request.user, ids=[pk])
         return Response({'status': 'marked as read'})
 
+class NotificationBulkMarkReadView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        if ids is None and not request.data.get('all'):
+            return Response({'error': 'Provide ids or all=true'}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        # Read before the UPDATE; the cached count only drops once the request commits
+        unread = unread_count(request.user.id)
+        updated = mark_read(request.user, ids=ids)
+        return Response({'updated': updated, 'unread_count': max(unread - updated, 0)})
+
+class NotificationUnreadCountView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        return Response({'unread_count': unread_count(request.user.id)})
+
 class MoodUpdateListCreateView(generics.ListCreateAPIView):
     serializer_class = MoodUpdateSerializer
     permission_classes = (IsAuthenticated,)
@@ -306,6 +462,49 @@ class MoodUpdateListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class MoodAnalyticsView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        try:
+            start, end = mood.date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        stats = mood.analytics([request.user.id], start, end)[request.user.id]
+        return Response({'start': start, 'end': end, **stats})
+
+class ClientMoodAnalyticsView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        if request.user.role != 'professional':
+            return Response({'error': 'Only professionals can view client mood trends'}, status=403)
+        try:
+            start, end = mood.date_range(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        clients = list(
+            User.objects.filter(
+                professional_connections__professional=request.user,
+                professional_connections__status='accepted'
+            ).distinct().order_by('id').values('id', 'username', 'first_name', 'last_name')
+        )
+        # One rollup scan for every connected client
+        stats = mood.analytics([client['id'] for client in clients], start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'clients': [
+                {
+                    'client_id': client['id'],
+                    'name': f"{client['first_name']} {client['last_name']}".strip() or client['username'],
+                    **stats[client['id']],
+                }
+                for client in clients
+            ],
+        })
+
 class ConnectionListCreateView(generics.ListCreateAPIView):
     serializer_class = ConnectionSerializer
     permission_classes = (IsAuthenticated,)
@@ -345,16 +544,20 @@ class UpdateOnlineStatusView(views.APIView):
         if is_online is None:
             return Response({'error': 'is_online field is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get or create profile to be safe
-        profile, created = ProfessionalProfile.objects.get_or_create(user=request.user)
-        profile.is_online = bool(is_online)
-        profile.save()
-        
-        profile.save()
-        
-        profile.save()
-        
-        return Response({'status': 'success', 'is_online': profile.is_online})
+        if is_online:
+            presence.heartbeat(request.user.id)
+        else:
+            presence.go_offline(request.user.id)
+        return Response({'status': 'success', 'is_online': bool(is_online)})
+
+class PresenceHeartbeatView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        if request.user.role != 'professional':
+            return Response({'error': 'Only professionals can send presence heartbeats'}, status=status.HTTP_403_FORBIDDEN)
+        presence.heartbeat(request.user.id)
+        return Response({'is_online': True, 'ttl': settings.PRESENCE_TTL})
 
 class ZegoTokenView(views.APIView):
     permission_classes = (IsAuthenticated,)
@@ -380,7 +583,7 @@ class ZegoTokenView(views.APIView):
             # We don't send the secret!
         })
 
-from .serializers import DirectMessageSerializer, PublicUserSerializer
+from .serializers import ConversationSerializer, DirectMessageSerializer, PublicUserSerializer
 
 class PublicUserDetailView(generics.RetrieveAPIView):
     serializer_class = PublicUserSerializer
@@ -390,7 +593,6 @@ class PublicUserDetailView(generics.RetrieveAPIView):
         # If the requested user is a professional, only show if verified
         # This is simple: just filter the whole queryset for professionals
         # Non-professionals (clients) are always visible to authenticated users (e.g. for connection display)
-        from django.db.models import Q
         return User.objects.filter(
             Q(role='client') | 
             (Q(role='professional') & Q(professional_profile__verified=True))
@@ -438,15 +640,36 @@ class DirectMessageView(views.APIView):
         other_user_id = request.query_params.get('user_id')
         if not other_user_id:
             return Response({'error': 'user_id param required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Get messages between current user and other user
-        messages = DirectMessage.objects.filter(
-            (Q(sender=request.user) & Q(receiver_id=other_user_id)) |
-            (Q(sender_id=other_user_id) & Q(receiver=request.user))
-        ).order_by('created_at')
-        
-        serializer = DirectMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        after = request.query_params.get('after')
+        if not str(other_user_id).isdigit() or (after and not after.isdigit()):
+            return Response({'error': 'user_id and after must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = get_page_size(request)
+        low, high = sorted([request.user.id, int(other_user_id)])
+        conversation = Conversation.objects.filter(user_low_id=low, user_high_id=high).first()
+        messages = DirectMessage.objects.filter(conversation=conversation).select_related('sender')
+
+        previous_cursor = None
+        has_more = False
+        if conversation is None:
+            page = []
+        elif after:
+            # Delta fetch: only messages newer than the last one the client has
+            page = list(messages.filter(id__gt=after).order_by('id')[:page_size + 1])
+            has_more = len(page) > page_size
+            page = page[:page_size]
+        else:
+            page, previous_cursor = paginate_keyset(
+                messages, ['-id'], request.query_params.get('cursor'), page_size
+            )
+            page.reverse()
+
+        return Response({
+            'results': DirectMessageSerializer(page, many=True).data,
+            'previous_cursor': previous_cursor,
+            'latest_id': page[-1].id if page else (int(after) if after else None),
+            'has_more': has_more,
+        })
 
     def post(self, request):
         receiver_id = request.data.get('receiver')
@@ -464,6 +687,33 @@ class DirectMessageView(views.APIView):
         serializer = DirectMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+class ConversationListView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        user = request.user
+        unread = DirectMessage.objects.filter(
+            conversation=OuterRef('pk'), receiver=user, is_read=False
+        ).order_by().values('conversation').annotate(count=Count('id')).values('count')
+
+        conversations = Conversation.objects.filter(
+            Q(user_low=user) | Q(user_high=user),
+            last_message_at__isnull=False
+        ).select_related(
+            'user_low', 'user_high', 'last_message__sender'
+        ).annotate(
+            unread_count=Coalesce(Subquery(unread), 0)
+        )
+
+        page, next_cursor = paginate_keyset(
+            conversations, ['-last_message_at', '-id'],
+            request.query_params.get('cursor'), get_page_size(request)
+        )
+        return Response({
+            'results': ConversationSerializer(page, many=True, context={'request': request}).data,
+            'next_cursor': next_cursor,
+        })
+
 class InitializePaymentView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -509,7 +759,6 @@ class InitializePaymentView(views.APIView):
             last_name = "User"
 
         # Initialize with Chapa
-        url = "https://api.chapa.co/v1/transaction/initialize"
         payload = {
             "amount": str(amount),
             "currency": "ETB",
@@ -531,26 +780,9 @@ class InitializePaymentView(views.APIView):
         # Letting Chapa handle the input on their hosted page ensures the User sees the 
         # full "Select Payment Method" screen (Wallets, Cards, Banks).
         
-        chapa_key = getattr(settings, 'CHAPA_SECRET_KEY', None)
-        if not chapa_key:
-             return Response({'error': 'Chapa Secret Key missing'}, status=500)
-        
-        chapa_key = chapa_key.strip().strip('"').strip("'")
-        
-        headers = {
-            'Authorization': f'Bearer {chapa_key}', 
-            'Content-Type': 'application/json'
-        }
-
         try:
-            
             print(f"Debug: Initializing Chapa for {email} with amount {amount}")
-            response = requests.post(url, json=payload, headers=headers)
-            try:
-                data = response.json()
-            except:
-                data = {'message': response.text}
-                
+            data = chapa.initialize(payload)
             print(f"Debug: Chapa Response: {data}")
             
             if data.get('status') == 'success':
@@ -566,6 +798,10 @@ class InitializePaymentView(views.APIView):
                     'error': error_msg
                 }, status=400)
                 
+        except ChapaNotConfigured as e:
+            return Response({'error': str(e)}, status=500)
+        except ChapaUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             error_msg = f"Chapa Exception: {str(e)}"
             with open('payment_errors.log', 'a') as f:
@@ -574,13 +810,36 @@ class InitializePaymentView(views.APIView):
             return Response({'error': error_msg}, status=500)
 
 
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
 class VerifyPaymentView(views.APIView):
+    """
+    Reports a payment's status from the database; Chapa is queried by the
+    reconcile_payments worker, not here. Pass ?wait=<seconds> to long-poll a
+    pending payment until it settles: up to MAX_WAIT with a shared cache,
+    LOCAL_MAX_WAIT otherwise, since the wait holds a worker and then polls
+    the database.
+    """
     permission_classes = (IsAuthenticated,)
+    MAX_WAIT = 25
+    LOCAL_MAX_WAIT = 5
 
     def get(self, request, tx_ref):
         payment = get_object_or_404(Payment, tx_ref=tx_ref)
-        
-        # If already success, return immediately to avoid slow network calls
+
+        # Mock verification for local development (DEBUG without a Chapa key)
+        if payment.status == 'pending' and mock_payments():
+            settle(payment, 'success')
+            payment.refresh_from_db()
+
+        try:
+            wait = min(max(float(request.query_params.get('wait', 0)), 0), self.MAX_WAIT if cache_is_shared() else self.LOCAL_MAX_WAIT)
+        except ValueError:
+            return Response({'error': 'wait must be a number of seconds'}, status=status.HTTP_400_BAD_REQUEST)
+        if payment.status == 'pending' and wait:
+            wait_for_status_change(tx_ref, wait)
+            # The announcement may have been missed; the row is the source of truth
+            payment.refresh_from_db()
+
         if payment.status == 'success':
             return Response({
                 'status': 'success', 
@@ -588,43 +847,14 @@ class VerifyPaymentView(views.APIView):
                     'amount': payment.amount, 
                     'currency': payment.currency,
                     'tx_ref': payment.tx_ref,
+                    'reference': payment.chapa_reference,
                     'status': 'success'
                 }
             })
-
-        url = f"https://api.chapa.co/v1/transaction/verify/{tx_ref}"
-        chapa_key = getattr(settings, 'CHAPA_SECRET_KEY', None) or "CHASECK_TEST-valid-test-key"
-        headers = {
-            'Authorization': f'Bearer {chapa_key}'
-        }
-
-        try:
-            # Mock verification for dev
-            if chapa_key == "CHASECK_TEST-valid-test-key":
-                 payment.status = 'success'
-                 payment.save()
-                 return Response({'status': 'success', 'data': {'amount': payment.amount, 'currency': 'ETB'}})
-
-            # Added timeout to prevent long hangs
-            response = requests.get(url, headers=headers, timeout=10)
-            data = response.json()
-            
-            if data['status'] == 'success':
-                payment.status = 'success'
-                # Optionally save more details from Chapa if available
-                payment.save()
-                return Response({'status': 'success', 'data': data['data']})
-            else:
-                # Don't update to failed immediately if it's just 'pending' on Chapa's side
-                if data.get('message') != 'Payment not found' and data.get('status') != 'pending':
-                    payment.status = 'failed'
-                    payment.save()
-                return Response({'status': 'failed', 'message': data.get('message')}, status=400)
-                
-        except requests.exceptions.Timeout:
-            return Response({'error': 'Verification timed out. Please refresh.'}, status=504)
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+        if payment.status == 'pending':
+            return Response({'status': 'pending', 'message': 'Payment is still being confirmed.'}, status=status.HTTP_202_ACCEPTED)
+        message = 'Payment expired before it was completed.' if payment.status == 'expired' else 'Payment failed.'
+        return Response({'status': payment.status, 'message': message}, status=status.HTTP_400_BAD_REQUEST)
 
 class PaymentCallbackView(views.APIView):
     permission_classes = (AllowAny,) # Chapa hits this anonymously
@@ -635,13 +865,19 @@ class PaymentCallbackView(views.APIView):
         
         # In a real app, you should verify the Chapa signature here
         # for security, but for now we update based on the ref
-        status = request.data.get('status')
-        if status == 'success':
-            payment.status = 'success'
-            payment.save()
+        if request.data.get('status') == 'success':
+            settle(payment, 'success', request.data.get('reference'))
         
         return Response({'status': 'received'})
 
+class PaymentGatewayStatsView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(chapa.stats())
+
 class PaymentListView(generics.ListAPIView):
     serializer_class = PaymentSerializer
     permission_classes = (IsAuthenticated,)
@@ -679,6 +915,59 @@ class JournalEntryDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return JournalEntry.objects.filter(professional=self.request.user)
 
+class UploadStartView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        try:
+            size = int(request.data.get('size') or 0)
+        except (TypeError, ValueError):
+            return Response({'error': 'size must be the file size in bytes'}, status=400)
+        try:
+            upload = start_upload(
+                request.user, request.data.get('target'), request.data.get('content_type', ''),
+                size, request.build_absolute_uri
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+class UploadFinalizeView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        token = request.data.get('upload_token')
+        if not token:
+            return Response({'error': 'upload_token is required'}, status=400)
+        try:
+            instance = finalize_upload(
+                request.user, token, request.data.get('parts'), request.data.get('journal_entry')
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=400)
+        if isinstance(instance, JournalEntry):
+            return Response(JournalEntrySerializer(instance).data)
+        return Response(UserSerializer(User.objects.get(pk=request.user.pk)).data)
+
+class LocalUploadView(views.APIView):
+    """Stand-in for a presigned S3 PUT when media is stored on the local filesystem."""
+    # The signed token in the URL is the credential, as with a presigned URL
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def put(self, request, token):
+        if settings.USE_S3:
+            return Response({'error': 'Uploads go directly to object storage'}, status=404)
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        try:
+            receive_local_upload(token, request, content_length, request.META.get('CONTENT_TYPE'))
+        except UploadError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(status=status.HTTP_200_OK)
+
 class ProfessionalEarningsView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -686,34 +975,33 @@ class ProfessionalEarningsView(views.APIView):
         if request.user.role != 'professional':
             return Response({'error': 'Only professionals can access dynamic earnings details.'}, status=403)
         
-        profile = getattr(request.user, 'professional_profile', None)
-        if not profile:
+        # The same balance withdrawals are reserved against; the ledger explains it
+        balance = ProfessionalProfile.objects.filter(user=request.user).values('balance', 'total_earnings').first()
+        if balance is None:
              return Response({'error': 'Profile not found'}, status=404)
-             
-        withdrawals = Withdrawal.objects.filter(user=request.user).order_by('-created_at')
-        
+
+        history, next_cursor = paginate_keyset(
+            request.user.ledger_entries.all(), ['-created_at', '-id'],
+            request.query_params.get('cursor'), get_page_size(request, default=20)
+        )
+        withdrawals = Withdrawal.objects.filter(user=request.user).order_by('-created_at', '-id')[:20]
+
         return Response({
-            'available_balance': profile.balance,
-            'total_earnings': profile.total_earnings,
-            'withdrawals': WithdrawalSerializer(withdrawals, many=True).data
+            'available_balance': balance['balance'],
+            'total_earnings': balance['total_earnings'],
+            'period_totals': ledger.period_totals(request.user.id),
+            'withdrawals': WithdrawalSerializer(withdrawals, many=True).data,
+            'history': LedgerEntrySerializer(history, many=True).data,
+            'next_cursor': next_cursor,
         })
 
 class BankListView(views.APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        url = "https://api.chapa.co/v1/banks"
-        chapa_key = getattr(settings, 'CHAPA_SECRET_KEY', None)
-        if not chapa_key:
-             return Response({'error': 'Chapa key missing'}, status=500)
-             
-        chapa_key = chapa_key.strip().strip('"').strip("'")
-        headers = {'Authorization': f'Bearer {chapa_key}'}
-        
         try:
-            response = requests.get(url, headers=headers)
-            return Response(response.json())
-        except Exception as e:
+            return Response(get_banks())
+        except BankCatalogUnavailable as e:
             return Response({'error': str(e)}, status=500)
 
 class WithdrawalRequestView(views.APIView):
@@ -732,79 +1020,42 @@ class WithdrawalRequestView(views.APIView):
         if not amount or not bank_code or not account_number:
             return Response({'error': 'Amount, bank_code, and account_number are required'}, status=400)
 
-        profile = request.user.professional_profile
-        from decimal import Decimal
+        from decimal import Decimal, InvalidOperation
         try:
             amount_dec = Decimal(str(amount))
-        except:
+        except InvalidOperation:
              return Response({'error': 'Invalid amount format'}, status=400)
+        if not amount_dec.is_finite() or amount_dec <= 0:
+            return Response({'error': 'Amount must be greater than zero'}, status=400)
 
-        if profile.balance < amount_dec:
-            return Response({'error': f'Insufficient balance. Current balance: {profile.balance}'}, status=400)
-
-        # Create withdrawal record
-        reference = f"wd-{uuid.uuid4()}"
-        withdrawal = Withdrawal.objects.create(
-            user=request.user,
-            amount=amount_dec,
-            bank_name=bank_name,
-            bank_code=bank_code,
-            account_number=account_number,
-            account_name=beneficiary_name,
-            reference=reference,
-            status='pending'
-        )
-
-        # Call Chapa Transfer API
-        chapa_url = "https://api.chapa.co/v1/transfer"
-        chapa_key = getattr(settings, 'CHAPA_SECRET_KEY', None)
-        if not chapa_key:
-             return Response({'error': 'Chapa key missing in settings'}, status=500)
-             
-        chapa_key = chapa_key.strip().strip('"').strip("'")
-        headers = {
-            'Authorization': f'Bearer {chapa_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        payload = {
-            "account_name": beneficiary_name,
-            "account_number": account_number,
-            "amount": float(amount_dec),
-            "currency": "ETB",
-            "reference": reference,
-            "bank_code": bank_code,
-        }
-
+        # Funds are reserved here; the transfer itself is sent by the process_payouts worker
         try:
-            print(f"Debug: Payout initiation for {beneficiary_name} to bank {bank_code}")
-            response = requests.post(chapa_url, json=payload, headers=headers)
-            try:
-                data = response.json()
-            except:
-                data = {"message": response.text}
-                
-            print(f"Debug: Chapa Payout Response: {data}")
-            
-            is_success = data.get('status') == 'success' or 'success' in data.get('message', '').lower()
-            
-            if is_success:
-                # Deduct from balance
-                profile.balance -= amount_dec
-                profile.save()
-                
-                withdrawal.status = 'approved'
-                withdrawal.save()
-                return Response({'status': 'success', 'message': 'Withdrawal initiated successfully', 'data': data})
-            else:
-                withdrawal.status = 'failed'
-                withdrawal.save()
-                return Response({'error': data.get('message', 'Direct transfer failed')}, status=400)
-        except Exception as e:
-            withdrawal.status = 'failed'
-            withdrawal.save()
-            return Response({'error': str(e)}, status=500)
+            withdrawal = request_withdrawal(
+                request.user, amount_dec, bank_code, bank_name, account_number, beneficiary_name
+            )
+        except InsufficientFunds:
+            balance = ProfessionalProfile.objects.filter(user=request.user).values_list('balance', flat=True).first()
+            return Response({'error': f'Insufficient balance. Current balance: {balance}'}, status=400)
 
+        return Response({
+            'status': 'queued',
+            'message': 'Withdrawal queued for processing',
+            'data': WithdrawalSerializer(withdrawal).data
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def service_requests_for(user):
+    """
+    Service requests with their proposal count annotated and only the
+    proposals `user` may see (all of them for the owner or an admin, their
+    own otherwise) prefetched into visible_proposals.
+    """
+    proposals = ServiceProposal.objects.select_related('professional__professional_profile').order_by('-created_at')
+    if user.role != 'admin':
+        proposals = proposals.filter(Q(request__client=user) | Q(professional=user))
+    return ServiceRequest.objects.select_related('client').annotate(
+        proposals_count=Count('proposals')
+    ).prefetch_related(Prefetch('proposals', queryset=proposals, to_attr='visible_proposals'))
 
 class ServiceRequestListCreateView(generics.ListCreateAPIView):
     serializer_class = ServiceRequestSerializer
@@ -812,24 +1063,82 @@ class ServiceRequestListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
+        requests = service_requests_for(user)
         if user.role in ['client', 'seeker']:
-            return ServiceRequest.objects.filter(client=user)
+            return requests.filter(client=user)
         elif user.role in ['professional', 'listener']:
             # Professionals/Listeners see open requests
-            return ServiceRequest.objects.filter(status='open')
-        return ServiceRequest.objects.all()
+            return requests.filter(status='open')
+        return requests
 
     def perform_create(self, serializer):
         if self.request.user.role not in ['client', 'seeker', 'admin']:
             raise ValidationError(f"Only clients and seekers can create service requests. Your current role is: {self.request.user.role}")
         serializer.save(client=self.request.user)
 
+class ServiceRequestFeedView(views.APIView):
+    """
+    Cursor-paginated marketplace feed, one call per opportunity board tab.
+    For professionals the default (browse) feed is the open requests they
+    have not yet bid on; ?applied=true returns the ones they have, in any
+    status. ?category= narrows either. Clients get their own requests.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        user = request.user
+        params = request.query_params
+        requests = service_requests_for(user)
+        if user.role in ['professional', 'listener']:
+            applied = Exists(ServiceProposal.objects.filter(request=OuterRef('pk'), professional=user))
+            if params.get('applied', '').lower() == 'true':
+                requests = requests.filter(applied)
+            else:
+                # A request drops out of browse once bid on and moves to the applied tab
+                requests = requests.filter(status='open').filter(~applied)
+        elif user.role != 'admin':
+            requests = requests.filter(client=user)
+        if params.get('status') and user.role not in ['professional', 'listener']:
+            requests = requests.filter(status=params['status'])
+        if params.get('category'):
+            requests = requests.filter(category=params['category'])
+
+        page, next_cursor = paginate_keyset(
+            requests, ['-created_at', '-id'], params.get('cursor'), get_page_size(request, default=20)
+        )
+        return Response({
+            'results': ServiceRequestSerializer(page, many=True, context={'request': request}).data,
+            'next_cursor': next_cursor,
+        })
+
+class ServiceRequestMatchesView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, pk):
+        service_request = get_object_or_404(ServiceRequest, id=pk)
+        if service_request.client != request.user and request.user.role != 'admin':
+            return Response({'error': 'Only the client who created the request can see its matches.'}, status=403)
+
+        ranked = matching.rank_for_request(
+            service_request,
+            k=get_page_size(request, default=10),
+            language=request.query_params.get('language'),
+        )
+        users = {user.id: user for user in User.objects.with_profiles().filter(id__in=[user_id for user_id, _, _ in ranked])}
+        results = []
+        for user_id, score, similarity in ranked:
+            if user_id in users:
+                data = UserSerializer(users[user_id]).data
+                data.update({'match_score': score, 'text_similarity': similarity})
+                results.append(data)
+        return Response({'results': results})
+
 class ServiceRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ServiceRequestSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return ServiceRequest.objects.all()
+        return service_requests_for(self.request.user)
 
 class ServiceProposalListCreateView(generics.ListCreateAPIView):
     serializer_class = ServiceProposalSerializer
@@ -915,12 +1224,11 @@ class PublicStatsView(views.APIView):
     permission_classes = (AllowAny,)
     
     def get(self, request):
-        total_people = User.objects.filter(role='client').count()
-        total_sessions = Appointment.objects.filter(status='completed').count()
-        total_experts = ProfessionalProfile.objects.filter(verification_status='verified').count()
-        
-        return Response({
-            'people_helped': total_people,
-            'support_sessions': total_sessions,
-            'licensed_experts': total_experts
-        })
+        stats, etag = get_stats()
+        if request.headers.get('If-None-Match') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(stats)
+        response['ETag'] = etag
+        response['Cache-Control'] = f'public, max-age={settings.STATS_CACHE_TTL}'
+        return response
@@ -3,6 +3,14 @@ ASGI config for soultalk_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Streaming AI chat replies (server-sent events) and the /ws/events/
+WebSocket need an ASGI server so that a slow model response or an idle
+socket does not hold a worker. Under WSGI (runserver, the Vercel build)
+the AI chat answers streaming requests with a single JSON reply instead.
+Run it with e.g.:
+
+    gunicorn soultalk_backend.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -13,4 +21,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'soultalk_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from accounts.realtime import websocket_application  # noqa: E402 (needs apps loaded)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -213,6 +213,9 @@ if os.getenv('VERCEL'):
 else:
     MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Seconds a presigned (or local stand-in) upload URL stays valid (accounts/uploads.py)
+UPLOAD_URL_TTL = int(os.getenv('UPLOAD_URL_TTL', '3600'))
+
 AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
@@ -228,7 +231,39 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Shared cache for presence heartbeats and AI context windows. Without REDIS_URL
+# each process gets its own local-memory cache, which is only fine for development.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Seconds a professional stays online after their last heartbeat
+PRESENCE_TTL = int(os.getenv('PRESENCE_TTL', '90'))
+# Seconds the public landing-page stats are cached (server side and by clients)
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '60'))
+
+# Real-time push (/ws/events/). The in-process backend only reaches sockets on
+# the same worker; point this at a shared pub/sub backend for multi-node setups.
+REALTIME_BACKEND = os.getenv('REALTIME_BACKEND', 'accounts.realtime.InProcessBackend')
+REALTIME_QUEUE_SIZE = int(os.getenv('REALTIME_QUEUE_SIZE', '100'))
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# Max concurrent Gemini calls per process; extra calls queue for AI_QUEUE_TIMEOUT seconds
+AI_MAX_CONCURRENT_CALLS = int(os.getenv('AI_MAX_CONCURRENT_CALLS', '8'))
+AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '30'))
+# Approximate token budgets for the chat history window and the summary of older turns
+AI_CONTEXT_TOKEN_BUDGET = int(os.getenv('AI_CONTEXT_TOKEN_BUDGET', '3000'))
+AI_SUMMARY_TOKEN_BUDGET = int(os.getenv('AI_SUMMARY_TOKEN_BUDGET', '400'))
+# Opt-in cache of replies to first-turn prompts (per process, LRU with TTL)
+AI_RESPONSE_CACHE_ENABLED = os.getenv('AI_RESPONSE_CACHE_ENABLED', 'False') == 'True'
+AI_RESPONSE_CACHE_SIZE = int(os.getenv('AI_RESPONSE_CACHE_SIZE', '512'))
+AI_RESPONSE_CACHE_TTL = int(os.getenv('AI_RESPONSE_CACHE_TTL', '3600'))
+AI_RESPONSE_CACHE_MAX_PROMPT_CHARS = int(os.getenv('AI_RESPONSE_CACHE_MAX_PROMPT_CHARS', '200'))
 
 # Supabase Settings
 SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -241,6 +276,28 @@ ZEGO_APP_ID = os.getenv('ZEGO_APP_ID')
 
 ZEGO_SERVER_SECRET = os.getenv('ZEGO_SERVER_SECRET')
 CHAPA_SECRET_KEY = os.getenv('CHAPA_SECRET_KEY')
+# Outbound Chapa client: keep-alive pool size, retries for idempotent calls, and
+# the circuit breaker (open after N consecutive failures, retry after RESET seconds)
+CHAPA_POOL_SIZE = int(os.getenv('CHAPA_POOL_SIZE', '10'))
+CHAPA_MAX_RETRIES = int(os.getenv('CHAPA_MAX_RETRIES', '2'))
+CHAPA_BREAKER_THRESHOLD = int(os.getenv('CHAPA_BREAKER_THRESHOLD', '5'))
+CHAPA_BREAKER_RESET = int(os.getenv('CHAPA_BREAKER_RESET', '30'))
+# Background verification of pending payments (manage.py reconcile_payments)
+PAYMENT_VERIFY_MIN_AGE = int(os.getenv('PAYMENT_VERIFY_MIN_AGE', '5'))
+PAYMENT_VERIFY_MAX_AGE = int(os.getenv('PAYMENT_VERIFY_MAX_AGE', str(60 * 60 * 24)))
+PAYMENT_VERIFY_CONCURRENCY = int(os.getenv('PAYMENT_VERIFY_CONCURRENCY', '10'))
+# Payout worker (manage.py process_payouts): attempts before a never-sent transfer
+# is refunded, and seconds before a crashed worker's claim is released
+PAYOUT_MAX_ATTEMPTS = int(os.getenv('PAYOUT_MAX_ATTEMPTS', '5'))
+PAYOUT_CLAIM_TIMEOUT = int(os.getenv('PAYOUT_CLAIM_TIMEOUT', '300'))
+# Appointment reminders: minutes before the start at which both sides are notified,
+# and whether each web worker runs the scheduler (otherwise use manage.py send_reminders)
+APPOINTMENT_REMINDER_OFFSETS = [int(minutes) for minutes in os.getenv('APPOINTMENT_REMINDER_OFFSETS', '1440,60,10').split(',')]
+APPOINTMENT_REMINDERS_IN_PROCESS = os.getenv('APPOINTMENT_REMINDERS_IN_PROCESS', 'False') == 'True'
+# Chapa bank list: refreshed in the background after BANK_LIST_TTL seconds,
+# last good copy kept for BANK_LIST_STALE_TTL seconds if Chapa is unreachable
+BANK_LIST_TTL = int(os.getenv('BANK_LIST_TTL', str(60 * 60 * 24)))
+BANK_LIST_STALE_TTL = int(os.getenv('BANK_LIST_STALE_TTL', str(60 * 60 * 24 * 30)))
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173')
 
 JAZZMIN_SETTINGS = {
@@ -14,6 +14,13 @@ interface Message {
     timestamp: Date;
 }
 
+const toMessage = (m: any): Message => ({
+    id: m.id.toString(),
+    role: m.role,
+    content: m.content,
+    timestamp: new Date(m.timestamp)
+});
+
 interface ChatSession {
     id: number;
     title: string;
@@ -30,7 +37,19 @@ const AIChat: React.FC = () => {
     const [isTyping, setIsTyping] = useState(false);
     const textareaRef = useRef<HTMLTextAreaElement>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    const messagesContainerRef = useRef<HTMLElement>(null);
     const [messages, setMessages] = useState<Message[]>([]);
+    // Sessions open on their newest page; older pages load on scroll-up.
+    // Refs rather than state, so scroll events fired before the next render
+    // see an in-flight fetch and the latest cursor.
+    const previousCursorRef = useRef<string | null>(null);
+    const loadingOlderRef = useRef(false);
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+    // Distance from the bottom to restore after older messages are prepended
+    const prependOffsetRef = useRef<number | null>(null);
+    // A freshly opened session jumps to its bottom; scroll-up loading starts after that
+    const jumpToBottomRef = useRef(false);
+    const scrollReadyRef = useRef(false);
     const [sessions, setSessions] = useState<ChatSession[]>([]);
     const [currentSessionId, setCurrentSessionId] = useState<number | null>(null);
     const [isSidebarOpen, setSidebarOpen] = useState(true);
@@ -58,6 +77,19 @@ const AIChat: React.FC = () => {
     };
 
     useEffect(() => {
+        const container = messagesContainerRef.current;
+        if (prependOffsetRef.current !== null && container) {
+            container.scrollTo({ top: container.scrollHeight - prependOffsetRef.current, behavior: 'instant' as ScrollBehavior });
+            prependOffsetRef.current = null;
+            return;
+        }
+        if (jumpToBottomRef.current && container) {
+            container.scrollTo({ top: container.scrollHeight, behavior: 'instant' as ScrollBehavior });
+            jumpToBottomRef.current = false;
+            // The scroll event for this jump is dispatched on the next frame
+            requestAnimationFrame(() => { scrollReadyRef.current = true; });
+            return;
+        }
         scrollToBottom();
     }, [messages, isTyping]);
 
@@ -112,6 +144,8 @@ const AIChat: React.FC = () => {
         setIsTyping(false);
         setCurrentSessionId(sessionId);
         activeSessionRef.current = sessionId;
+        previousCursorRef.current = null;
+        scrollReadyRef.current = false;
         if (window.innerWidth < 768) setSidebarOpen(false);
 
         try {
@@ -119,13 +153,9 @@ const AIChat: React.FC = () => {
             if (response.ok) {
                 const data = await response.json();
                 if (activeSessionRef.current === sessionId) {
-                    const loadedMessages = data.messages.map((m: any) => ({
-                        id: m.id.toString(),
-                        role: m.role,
-                        content: m.content,
-                        timestamp: new Date(m.timestamp)
-                    }));
-                    setMessages(loadedMessages);
+                    previousCursorRef.current = data.previous_cursor;
+                    jumpToBottomRef.current = true;
+                    setMessages(data.messages.map(toMessage));
                 }
             }
         } catch (error) {
@@ -133,6 +163,40 @@ const AIChat: React.FC = () => {
         }
     };
 
+    const loadOlderMessages = async () => {
+        const sessionId = activeSessionRef.current;
+        const cursor = previousCursorRef.current;
+        if (!sessionId || !cursor || loadingOlderRef.current) return;
+        loadingOlderRef.current = true;
+        setIsLoadingOlder(true);
+        try {
+            const response = await fetchWithAuth(
+                `${API_BASE_URL}/api/auth/chat-sessions/${sessionId}/?cursor=${encodeURIComponent(cursor)}`
+            );
+            if (response.ok) {
+                const data = await response.json();
+                const container = messagesContainerRef.current;
+                if (activeSessionRef.current === sessionId && previousCursorRef.current === cursor) {
+                    previousCursorRef.current = data.previous_cursor;
+                    if (container) prependOffsetRef.current = container.scrollHeight - container.scrollTop;
+                    setMessages(prev => {
+                        const loaded = new Set(prev.map(m => m.id));
+                        return [...data.messages.map(toMessage).filter((m: Message) => !loaded.has(m.id)), ...prev];
+                    });
+                }
+            }
+        } catch (error) {
+            console.error("Failed to load earlier messages", error);
+        } finally {
+            loadingOlderRef.current = false;
+            setIsLoadingOlder(false);
+        }
+    };
+
+    const handleMessagesScroll = (e: React.UIEvent<HTMLElement>) => {
+        if (scrollReadyRef.current && e.currentTarget.scrollTop < 80) loadOlderMessages();
+    };
+
     const startNewChat = () => {
         setIsTyping(false);
         setMessages([{
@@ -143,6 +207,8 @@ const AIChat: React.FC = () => {
         }]);
         setCurrentSessionId(null);
         activeSessionRef.current = null;
+        previousCursorRef.current = null;
+        scrollReadyRef.current = false;
         if (window.innerWidth < 768) setSidebarOpen(false);
     };
 
@@ -410,7 +476,7 @@ const AIChat: React.FC = () => {
                 </header >
 
                 {/* Messages Area - Constrained width container */}
-                < main className="flex-1 overflow-y-auto px-4 py-4 md:px-6 custom-scrollbar scroll-smooth flex flex-col" >
+                < main ref={messagesContainerRef} onScroll={handleMessagesScroll} className="flex-1 overflow-y-auto px-4 py-4 md:px-6 custom-scrollbar scroll-smooth flex flex-col" >
                     <div className="max-w-3xl mx-auto w-full flex-1 flex flex-col">
 
                         {messages.length === 0 ? (
@@ -426,6 +492,9 @@ const AIChat: React.FC = () => {
                             </div>
                         ) : (
                             <div className="space-y-6 pb-4">
+                                {isLoadingOlder && (
+                                    <div className="text-center text-xs opacity-60">Loading earlier messages...</div>
+                                )}
                                 {messages.map((message) => (
                                     <div
                                         key={message.id}
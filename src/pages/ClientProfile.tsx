@@ -1,4 +1,5 @@
 "use client"
+import { IMAGE_ACCEPT, uploadDirect } from "../utils/uploads";
 import { API_BASE_URL } from "../config";
 
 import React, { useState, useEffect, useRef } from "react"
@@ -130,16 +131,15 @@ const ClientProfile: React.FC = () => {
             formData.append('display_name', profile.display_name)
             formData.append('is_anonymous', String(profile.is_anonymous))
 
-            if (profilePhotoFile) {
-                formData.append('profile_photo', profilePhotoFile)
-            }
-
             const response = await fetchWithAuth(API_BASE_URL + '/api/auth/me/', {
                 method: 'PATCH',
                 body: formData
             })
 
             if (response.ok) {
+                if (profilePhotoFile) {
+                    await uploadDirect(fetchWithAuth, 'profile_photo', profilePhotoFile)
+                }
                 await refreshUser();
                 if (previewUrl) {
                     updateUser({ avatar: previewUrl });
@@ -151,7 +151,7 @@ const ClientProfile: React.FC = () => {
             }
         } catch (error) {
             console.error("Profile update error:", error)
-            setMessage({ type: 'error', text: 'An error occurred while saving profile.' })
+            setMessage({ type: 'error', text: error instanceof Error ? error.message : 'An error occurred while saving profile.' })
         } finally {
             setSaving(false)
         }
@@ -232,7 +232,7 @@ const ClientProfile: React.FC = () => {
                                         type="file"
                                         ref={fileInputRef}
                                         onChange={handleAvatarChange}
-                                        accept="image/*"
+                                        accept={IMAGE_ACCEPT}
                                         className="hidden"
                                     />
                                     <img
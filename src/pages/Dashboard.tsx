@@ -274,7 +274,10 @@ const Dashboard: React.FC = () => {
 
     const fetchMoodData = async () => {
       try {
-        const response = await fetchWithAuth(API_BASE_URL + '/api/auth/mood-updates/')
+        const isoDate = (d: Date) => `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`
+        const start = new Date()
+        start.setDate(start.getDate() - 6)
+        const response = await fetchWithAuth(API_BASE_URL + `/api/auth/mood-updates/analytics/?start=${isoDate(start)}&end=${isoDate(new Date())}`)
         if (response.ok) {
           const data = await response.json()
           // Format for the last 7 days
@@ -283,8 +286,8 @@ const Dashboard: React.FC = () => {
             const d = new Date()
             d.setDate(d.getDate() - (6 - i))
             const dayName = days[d.getDay()]
-            const record = data.find((r: any) => new Date(r.created_at).toDateString() === d.toDateString())
-            return { date: dayName, mood: record ? record.mood_score : 0 }
+            const record = data.daily.find((r: any) => r.period === isoDate(d))
+            return { date: dayName, mood: record ? record.average : 0 }
           })
           setMoodData(last7Days)
         }
@@ -105,6 +105,8 @@ const DashboardHeader: React.FC = () => {
   }, [notificationsOpen])
 
   const [notifications, setNotifications] = useState<any[]>([])
+  // From the server: the list only holds the newest page
+  const [unreadCount, setUnreadCount] = useState(0)
   const [loadingNotifications, setLoadingNotifications] = useState(true)
 
   const fetchNotifications = async () => {
@@ -112,7 +114,8 @@ const DashboardHeader: React.FC = () => {
       const response = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/')
       if (response.ok) {
         const data = await response.json()
-        setNotifications(data)
+        setNotifications(data.results)
+        setUnreadCount(data.unread_count)
       }
     } catch (error) {
       console.error("Error fetching notifications:", error)
@@ -134,6 +137,7 @@ const DashboardHeader: React.FC = () => {
         method: 'POST'
       })
       if (response.ok) {
+        if (notifications.some(n => n.id === id && !n.is_read)) setUnreadCount(count => Math.max(count - 1, 0))
         setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n))
       }
     } catch (error) {
@@ -142,7 +146,20 @@ const DashboardHeader: React.FC = () => {
   }
 
   const markAllAsRead = async () => {
-    notifications.filter(n => !n.is_read).forEach(n => markAsRead(n.id))
+    try {
+      const response = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/read/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ all: true })
+      })
+      if (response.ok) {
+        const data = await response.json()
+        setNotifications(prev => prev.map(n => ({ ...n, is_read: true })))
+        setUnreadCount(data.unread_count)
+      }
+    } catch (error) {
+      console.error("Error marking notifications as read:", error)
+    }
   }
 
   const filteredNotifications = notifications.filter(n => {
@@ -176,8 +193,6 @@ const DashboardHeader: React.FC = () => {
     }),
   }
 
-  const unreadCount = notifications.filter((n) => !n.is_read).length
-
   const quickActions = [
     { name: "Book Session", icon: FaCalendarAlt, href: "/booking" },
     { name: "Messages", icon: FaComments, href: "/messages" },
@@ -1,4 +1,5 @@
 import { API_BASE_URL } from "../config";
+import { uploadDirect } from "../utils/uploads";
 import React, { useState, useRef, useEffect, useCallback } from 'react';
 import { useTheme } from '../contexts/ThemeContext';
 import { Link } from 'react-router-dom';
@@ -113,12 +114,6 @@ const Journal: React.FC = () => {
 
             if (mode === 'text') {
                 formData.append('content', entry);
-            } else if (blob || recordedBlob) {
-                const finalBlob = blob || recordedBlob;
-                if (finalBlob) {
-                    const ext = mode === 'video' ? 'webm' : 'webm';
-                    formData.append('media_file', finalBlob, `journal_entry_${Date.now()}.${ext}`);
-                }
             }
 
             const response = await fetchWithAuth(API_BASE_URL + '/api/auth/journal-entries/', {
@@ -126,6 +121,19 @@ const Journal: React.FC = () => {
                 body: formData,
             });
 
+            // Recordings go straight to storage and are attached to the new entry
+            const finalBlob = mode === 'text' ? null : blob || recordedBlob;
+            if (response.ok && finalBlob) {
+                const created = await response.json();
+                try {
+                    await uploadDirect(fetchWithAuth, 'journal_media', finalBlob, { journalEntry: created.id });
+                } catch (uploadError) {
+                    await fetchWithAuth(`${API_BASE_URL}/api/auth/journal-entries/${created.id}/`, { method: 'DELETE' });
+                    alert("Failed to upload the recording: " + (uploadError as Error).message);
+                    return;
+                }
+            }
+
             if (response.ok) {
                 setSaved(true);
                 setEntry('');
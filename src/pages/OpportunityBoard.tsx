@@ -38,20 +38,26 @@ const OpportunityBoard: React.FC = () => {
 
     const categories = ['All', 'Anxiety', 'Depression', 'Relationship', 'Stress', 'Trauma', 'Grief', 'Career', 'Personal Growth'];
 
-    const fetchRequests = useCallback(async () => {
-        setLoading(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+
+    const fetchRequests = useCallback(async (cursor?: string) => {
+        if (!cursor) setLoading(true);
         try {
-            const response = await fetchWithAuth(`${API_BASE_URL}/api/auth/service-requests/`);
+            const params = new URLSearchParams({ applied: String(activeTab === 'applied') });
+            if (categoryFilter !== 'All') params.set('category', categoryFilter);
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetchWithAuth(`${API_BASE_URL}/api/auth/service-requests/feed/?${params}`);
             if (response.ok) {
                 const data = await response.json();
-                setRequests(data);
+                setRequests(prev => cursor ? [...prev, ...data.results] : data.results);
+                setNextCursor(data.next_cursor);
             }
         } catch (error) {
             console.error("Error fetching requests:", error);
         } finally {
             setLoading(false);
         }
-    }, [fetchWithAuth]);
+    }, [fetchWithAuth, activeTab, categoryFilter]);
 
     useEffect(() => {
         fetchRequests();
@@ -87,15 +93,11 @@ const OpportunityBoard: React.FC = () => {
         }
     };
 
-    const filteredRequests = requests.filter(req => {
-        const matchesSearch = req.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-            req.description.toLowerCase().includes(searchTerm.toLowerCase());
-        const matchesCategory = categoryFilter === 'All' || req.category === categoryFilter;
-
-        const hasApplied = req.proposals.some(p => String(p.professional) === String(user?.id));
-        if (activeTab === 'applied') return hasApplied && matchesSearch && matchesCategory;
-        return !hasApplied && matchesSearch && matchesCategory;
-    });
+    // Tab and category are filtered by the feed; search narrows the loaded pages
+    const filteredRequests = requests.filter(req =>
+        req.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
+        req.description.toLowerCase().includes(searchTerm.toLowerCase())
+    );
 
     return (
         <div className={`min-h-screen transition-all duration-500 ${theme === 'dark' ? 'bg-[#0B1120] text-gray-100' : 'bg-[#F8FAFB] text-slate-900'}`}>
@@ -218,6 +220,14 @@ const OpportunityBoard: React.FC = () => {
                                         </div>
                                     </motion.div>
                                 ))}
+                                {nextCursor && (
+                                    <button
+                                        onClick={() => fetchRequests(nextCursor)}
+                                        className={`mx-auto px-8 py-3 rounded-2xl font-bold transition-all ${theme === 'dark' ? 'bg-[#151C2C] hover:bg-white/5' : 'bg-white shadow-sm hover:bg-gray-50'}`}
+                                    >
+                                        Load more
+                                    </button>
+                                )}
                             </div>
                         ) : (
                             <div className="text-center py-24 bg-white/5 rounded-[3rem] border-2 border-dashed border-gray-700/20">
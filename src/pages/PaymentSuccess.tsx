@@ -27,7 +27,11 @@ const PaymentSuccess: React.FC = () => {
             }
 
             try {
-                const response = await fetchWithAuth(`${API_BASE_URL}/api/auth/payment/verify/${txRef}/`)
+                // The server confirms payments in the background; long-poll while it is still pending
+                let response = await fetchWithAuth(`${API_BASE_URL}/api/auth/payment/verify/${txRef}/`)
+                for (let attempt = 0; response.status === 202 && attempt < 6; attempt++) {
+                    response = await fetchWithAuth(`${API_BASE_URL}/api/auth/payment/verify/${txRef}/?wait=20`)
+                }
                 const data = await response.json()
 
                 if (response.ok && data.status === 'success') {
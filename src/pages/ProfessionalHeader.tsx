@@ -65,13 +65,16 @@ const ProfessionalHeader: React.FC = () => {
     const notificationsRef = useRef<HTMLDivElement>(null);
 
     const [notifications, setNotifications] = useState<any[]>([]);
+    // From the server: the list only holds the newest page
+    const [unreadCount, setUnreadCount] = useState(0);
 
     const fetchNotifications = async () => {
         try {
             const response = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/');
             if (response.ok) {
                 const data = await response.json();
-                setNotifications(data);
+                setNotifications(data.results);
+                setUnreadCount(data.unread_count);
             }
         } catch (error) {
             console.error("Error fetching notifications:", error);
@@ -88,6 +91,7 @@ const ProfessionalHeader: React.FC = () => {
                 method: 'POST'
             });
             if (response.ok) {
+                if (notifications.some(n => n.id === id && !n.is_read)) setUnreadCount(count => Math.max(count - 1, 0));
                 setNotifications(prev => prev.map(n => n.id === id ? { ...n, is_read: true } : n));
             }
         } catch (error) {
@@ -95,9 +99,23 @@ const ProfessionalHeader: React.FC = () => {
         }
     };
 
-    const markAllAsRead = () => notifications.filter(n => !n.is_read).forEach(n => markAsRead(n.id));
+    const markAllAsRead = async () => {
+        try {
+            const response = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/read/', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ all: true })
+            });
+            if (response.ok) {
+                const data = await response.json();
+                setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
+                setUnreadCount(data.unread_count);
+            }
+        } catch (error) {
+            console.error("Error marking notifications as read:", error);
+        }
+    };
     const filteredNotifications = notifications.filter(n => (activeTab === 'unread' ? !n.is_read : true));
-    const unreadCount = notifications.filter(n => !n.is_read).length;
 
     useEffect(() => {
         const handleClickOutside = (event: MouseEvent) => {
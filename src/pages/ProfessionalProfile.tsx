@@ -1,4 +1,5 @@
 "use client"
+import { IMAGE_ACCEPT, uploadDirect, UploadTarget } from "../utils/uploads";
 import { API_BASE_URL } from "../config";
 
 import React, { useState, useEffect, useRef } from "react"
@@ -124,23 +125,24 @@ const ProfessionalProfile: React.FC = () => {
             formData.append('languages', JSON.stringify(profile.languages))
             formData.append('license_number', profile.license_number)
 
-            if (profilePhotoFile) {
-                formData.append('profile_photo', profilePhotoFile)
-            }
-            if (idImageFile) {
-                formData.append('id_image', idImageFile)
-            }
-            if (certificateFile) {
-                formData.append('certificates', certificateFile)
-            }
-
             const response = await fetchWithAuth(API_BASE_URL + '/api/auth/me/', {
                 method: 'PATCH',
                 body: formData
             })
 
             if (response.ok) {
-                const updatedData = await response.json()
+                let updatedData = await response.json()
+                // Files go straight to storage; each finalize returns the updated profile
+                const uploads: [UploadTarget, File | null][] = [
+                    ['profile_photo', profilePhotoFile],
+                    ['id_image', idImageFile],
+                    ['certificates', certificateFile],
+                ]
+                for (const [target, file] of uploads) {
+                    if (file) {
+                        updatedData = await uploadDirect(fetchWithAuth, target, file)
+                    }
+                }
                 await refreshUser();
                 if (previewUrl) {
                     updateUser({ avatar: previewUrl });
@@ -160,7 +162,7 @@ const ProfessionalProfile: React.FC = () => {
                 setMessage({ type: 'error', text: "Failed to update profile." })
             }
         } catch (error) {
-            setMessage({ type: 'error', text: "An error occurred while saving." })
+            setMessage({ type: 'error', text: error instanceof Error ? error.message : "An error occurred while saving." })
         } finally {
             setSaving(false)
         }
@@ -257,7 +259,7 @@ const ProfessionalProfile: React.FC = () => {
                                     <input
                                         type="file"
                                         ref={fileInputRef}
-                                        accept="image/*"
+                                        accept={IMAGE_ACCEPT}
                                         className="hidden"
                                         onChange={handleAvatarChange}
                                     />
@@ -365,7 +367,7 @@ const ProfessionalProfile: React.FC = () => {
                                                 type="file"
                                                 onChange={handleIdImageChange}
                                                 className={`text-xs p-2 rounded-lg border ${theme === "dark" ? "border-white/10 bg-white/5 text-gray-300" : "border-slate-200 bg-white"}`}
-                                                accept="image/*"
+                                                accept={IMAGE_ACCEPT}
                                             />
                                             {idImageFile && <span className="text-[10px] text-green-500 font-bold">New file selected: {idImageFile.name}</span>}
                                         </div>
@@ -399,7 +401,7 @@ const ProfessionalProfile: React.FC = () => {
                                                 type="file"
                                                 onChange={handleCertificateChange}
                                                 className={`text-xs p-2 rounded-lg border ${theme === "dark" ? "border-white/10 bg-white/5 text-gray-300" : "border-slate-200 bg-white"}`}
-                                                accept=".pdf,image/*"
+                                                accept={`application/pdf,${IMAGE_ACCEPT}`}
                                             />
                                             {certificateFile && <span className="text-[10px] text-green-500 font-bold">New file selected: {certificateFile.name}</span>}
                                         </div>
@@ -106,7 +106,7 @@ const ProfessionalDashboard: React.FC = () => {
         try {
             const notifResponse = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/');
             if (notifResponse.ok) {
-                const data = await notifResponse.json();
+                const data = (await notifResponse.json()).results;
 
                 // Audio alert for brand new live requests
                 if (isAutoRefresh) {
@@ -190,6 +190,16 @@ const ProfessionalDashboard: React.FC = () => {
         }
     }, [user, fetchNotifications, notifications]);
 
+    // Keep presence alive while available; the server drops us after ~90s without a heartbeat
+    useEffect(() => {
+        if (!user || user.type !== 'professional' || !isOnline) return;
+        const heartbeat = setInterval(() => {
+            fetchWithAuth(API_BASE_URL + '/api/auth/professional/heartbeat/', { method: 'POST' })
+                .catch(error => console.error('Error sending heartbeat:', error));
+        }, 30000);
+        return () => clearInterval(heartbeat);
+    }, [user, isOnline, fetchWithAuth]);
+
     // Request notification permission on mount
     useEffect(() => {
         if ("Notification" in window && Notification.permission === "default") {
@@ -450,7 +460,7 @@ const ProfessionalDashboard: React.FC = () => {
                                                                 const notifResponse = await fetchWithAuth(API_BASE_URL + '/api/auth/notifications/');
                                                                 if (notifResponse.ok) {
                                                                     const data = await notifResponse.json();
-                                                                    setNotifications(data);
+                                                                    setNotifications(data.results);
                                                                 }
                                                             } catch (error) {
                                                                 console.error("Error cancelling request:", error);
@@ -64,12 +64,24 @@ const TextChat: React.FC = () => {
     useEffect(() => {
         if (!chatPartnerId) return;
 
+        // After the first page, only ask for messages newer than the latest one we have
+        let latestId: number | null = null;
+
         const loadMessages = async () => {
             try {
-                const res = await fetchWithAuth(`${API_BASE_URL}/api/auth/messages/?user_id=${chatPartnerId}`);
+                const after = latestId !== null ? `&after=${latestId}` : '';
+                const res = await fetchWithAuth(`${API_BASE_URL}/api/auth/messages/?user_id=${chatPartnerId}${after}`);
                 if (res.ok) {
                     const data = await res.json();
-                    setMessages(data);
+                    if (latestId === null) {
+                        setMessages(data.results);
+                    } else if (data.results.length) {
+                        setMessages(prev => {
+                            const known = new Set(prev.map((m: any) => m.id));
+                            return [...prev, ...data.results.filter((m: any) => !known.has(m.id))];
+                        });
+                    }
+                    if (data.latest_id !== null) latestId = data.latest_id;
                 }
             } catch (err) {
                 console.error(err);
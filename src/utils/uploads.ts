@@ -0,0 +1,69 @@
+import { API_BASE_URL } from "../config";
+
+type FetchWithAuth = (url: string, options?: RequestInit) => Promise<Response>;
+
+export type UploadTarget = 'journal_media' | 'profile_photo' | 'id_image' | 'id_image_back' | 'certificates';
+
+// The image types the backend accepts for profile photos, IDs and certificates
+export const IMAGE_ACCEPT = 'image/jpeg,image/png,image/webp,image/gif';
+
+const errorMessage = async (response: Response, fallback: string): Promise<string> => {
+    try {
+        const data = await response.json();
+        return data.error || fallback;
+    } catch {
+        return fallback;
+    }
+};
+
+/**
+ * Upload a file straight to storage and attach it to its model field.
+ * The backend hands out a presigned S3 URL (or one URL per part for large
+ * files, or its local stand-in in development); the bytes never go through
+ * the API. Resolves with the journal entry for journal_media and the
+ * current user for profile files.
+ */
+export const uploadDirect = async (
+    fetchWithAuth: FetchWithAuth,
+    target: UploadTarget,
+    file: Blob,
+    options: { journalEntry?: number } = {}
+) => {
+    const startResponse = await fetchWithAuth(`${API_BASE_URL}/api/auth/uploads/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ target, content_type: file.type, size: file.size }),
+    });
+    if (!startResponse.ok) {
+        throw new Error(await errorMessage(startResponse, 'Could not start the upload.'));
+    }
+    const upload = await startResponse.json();
+
+    let parts: { part_number: number; etag: string }[] | undefined;
+    if (upload.parts) {
+        parts = [];
+        for (const part of upload.parts) {
+            const start = (part.part_number - 1) * upload.part_size;
+            const response = await fetch(part.url, { method: 'PUT', body: file.slice(start, start + upload.part_size) });
+            if (!response.ok) {
+                throw new Error(`Upload failed on part ${part.part_number}.`);
+            }
+            parts.push({ part_number: part.part_number, etag: response.headers.get('ETag') || '' });
+        }
+    } else {
+        const response = await fetch(upload.url, { method: upload.method, headers: upload.headers, body: file });
+        if (!response.ok) {
+            throw new Error('Upload failed.');
+        }
+    }
+
+    const finalizeResponse = await fetchWithAuth(`${API_BASE_URL}/api/auth/uploads/finalize/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ upload_token: upload.upload_token, parts, journal_entry: options.journalEntry }),
+    });
+    if (!finalizeResponse.ok) {
+        throw new Error(await errorMessage(finalizeResponse, 'Could not save the upload.'));
+    }
+    return finalizeResponse.json();
+};